@@ -24,7 +24,7 @@ print_diagnostics() {
 
 regenerate_from_templates() {
   echo "[ai-fix] Regenerating project from updated templates..."
-  python -m backend.cli \
+  python -m backend.cli gen \
     -n "${APP_NAME}" \
     -p "${PKG_NAME}" \
     -r "${PROMPT_TEXT}" \
@@ -64,7 +64,7 @@ while [ $attempt -le $max_attempts ]; do
     # Call AI fixer if GEMINI_API_KEY is present
     if [ -n "${GEMINI_API_KEY:-}" ]; then
       echo "[ai-fix] Invoking Gemini fixer..."
-      python backend/ai_fixer.py --generated "$PROJECT_DIR" --log "$LOG_DIR/build_attempt_${attempt}.log" || true
+      python -m backend.ai_fixer --generated "$PROJECT_DIR" --log "$LOG_DIR/build_attempt_${attempt}.log" || true
       # If templates changed, mark for commit in workflow
       if ! git diff --quiet -- backend/app/templates/android; then
         echo "AI_FIX_APPLIED=1" >> "$GITHUB_ENV" || true
@@ -1,76 +1,286 @@
 import os
 import sys
 import json
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Awaitable, Callable, Dict, Iterable, List, Any, Optional, Sequence, Tuple
 import argparse
-import httpx
+import asyncio
+import hashlib
 import re
-import time
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+
+from backend.app.services.generator import project_outputs
+from backend.app.services.http_clients import aclose_clients, get_async_client
+from backend.app.services.ratelimit import RetryPolicy, get_rate_limiter
+from backend.app.services.templates import create_jinja_env
 
 TEMPLATES_ROOT = Path("backend/app/templates/android")
+TEMPLATE_PREFIX = TEMPLATES_ROOT.as_posix() + "/"
+
+# Fix proposals keyed by error signature; keep this directory in the CI cache
+AI_FIXER_CACHE_DIR = os.getenv("AI_FIXER_CACHE_DIR", ".ai-fixer-cache")
+AI_FIXER_CANDIDATES = int(os.getenv("AI_FIXER_CANDIDATES", "3"))
+# Cap on the log excerpt sent to the model
+AI_FIXER_MAX_LOG_CHARS = int(os.getenv("AI_FIXER_MAX_LOG_CHARS", "6000"))
 
 SYSTEM_MSG = (
-    "You are a senior Android/Gradle engineer. You will receive: (1) a Kotlin/Gradle build error log, "
-    "and (2) current template files used to generate an Android app. "
+    "You are a senior Android/Gradle engineer. You will receive: (1) the error blocks of a Kotlin/Gradle build log, "
+    "and (2) the template files implicated by those errors, used to generate an Android app. "
     "Your job is to propose minimal edits to the template files so that future generated projects build successfully.\n\n"
     "Rules:\n"
     "- Only edit files under backend/app/templates/android/**.\n"
     "- Prefer adding missing imports, dependencies, or adjusting MainActivity template.\n"
+    "- Keep Jinja placeholders such as {{ package_name }} intact.\n"
     "- Output STRICT JSON with key 'edits': a list of { 'path': string, 'new_content': string }. Paths are repository-relative.\n"
     "- Do not include explanations outside JSON."
 )
 
 ALLOWED_COMPOSE_COMPILER_VERSION = "1.5.14"
 
+# Temperatures of the concurrent candidate requests
+CANDIDATE_TEMPERATURES = (0.1, 0.5, 0.8, 0.3, 0.65)
+# CI can afford to wait longer for quota than a web request
+FIXER_RETRY = RetryPolicy(attempts=5, base_delay=1.0, max_delay=8.0, max_wait=120.0)
+
+# Rendered with the candidate templates to validate a fix locally
+SAMPLE_CONTEXT: Dict[str, object] = {
+    "app_name": "FixerCheck",
+    "package_name": "com.example.fixercheck",
+    "package_dir": "com/example/fixercheck",
+    "description": "",
+    "min_sdk": 24,
+    "target_sdk": 34,
+    "compose_content": 'Text("Hello")',
+    "compose_inline": 'Text("Hello")',
+    "compose_imports": (),
+    "llm_provider": "fallback",
+    "screens": (),
+    "navigation": "single",
+}
+# The same project with two screens, for the navigation shell and Screen.kt.j2
+SAMPLE_SCREENS_CONTEXT: Dict[str, object] = {
+    **SAMPLE_CONTEXT,
+    "compose_inline": "",
+    "compose_imports": ("androidx.compose.material.icons.Icons", "androidx.compose.material.icons.filled.Home"),
+    "screens": tuple(
+        {"name": name, "function": f"{name}Screen", "title": name, "icon": "Home", "content": 'Text("Hello")',
+         "inline": 'Text("Hello")', "imports": (), "provider": "fallback"}
+        for name in ("Home", "Settings")
+    ),
+    "navigation": "bottom_bar",
+}
+
+# Error lines worth sending, and how many following lines belong to them
+_ERROR_PATTERNS = (
+    re.compile(r"^e: "),  # Kotlin compiler
+    re.compile(r"\berror: ", re.IGNORECASE),  # javac, AAPT
+    re.compile(r"^ERROR:"),
+    re.compile(r"Manifest merger failed"),
+    re.compile(r"Could not (?:resolve|find|find method|get unknown property)"),
+)
+_WHAT_WENT_WRONG = "* What went wrong:"
+_BLOCK_END = re.compile(r"^\* (?:Try|Get more help|Exception is):|^BUILD FAILED")
+_CONTEXT_LINES = 3
+_MAX_BLOCK_LINES = 20
+
+# Errors without a file path, mapped to the templates that usually cause them
+_KEYWORD_TEMPLATES = (
+    (re.compile(r"Could not resolve|Could not find|dependenc|plugin", re.IGNORECASE),
+     ("app/build.gradle.kts.j2", "root/build.gradle.kts.j2", "root/settings.gradle.kts.j2")),
+    (re.compile(r"Compose Compiler|kotlinCompilerExtensionVersion|Kotlin version", re.IGNORECASE),
+     ("app/build.gradle.kts.j2", "root/build.gradle.kts.j2")),
+    (re.compile(r"AAPT|resource .* not found|style/", re.IGNORECASE),
+     ("app/src/main/res/values/themes.xml.j2", "app/src/main/AndroidManifest.xml.j2")),
+    (re.compile(r"Manifest merger", re.IGNORECASE), ("app/src/main/AndroidManifest.xml.j2",)),
+    (re.compile(r"Unresolved reference|@Composable|Type mismatch", re.IGNORECASE),
+     ("app/src/main/java/MainActivity.kt.j2",)),
+)
+_DEFAULT_TEMPLATES = ("app/src/main/java/MainActivity.kt.j2", "app/build.gradle.kts.j2")
+
+Completion = Callable[[str, float], Awaitable[str]]
+
+
+@dataclass
+class ErrorBlock:
+    text: str
+    templates: List[str] = field(default_factory=list)
+
 
-def call_gemini(api_key: str, prompt: str) -> str:
+@dataclass
+class Candidate:
+    edits: List[Dict[str, Any]]
+    score: Tuple[int, int, int] = (0, 0, 0)
+    problems: List[str] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return bool(self.edits) and not self.problems
+
+
+async def call_gemini(api_key: str, prompt: str, temperature: float = 0.1) -> str:
     model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
+    api_base = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+    url = f"{api_base}/models/{model}:generateContent?key={api_key}"
     payload = {
         "contents": [
             {"role": "user", "parts": [{"text": prompt}]}
         ],
-        "generationConfig": {"temperature": 0.1},
+        "generationConfig": {"temperature": temperature, "responseMimeType": "application/json"},
     }
-    backoffs = [2, 5, 10, 20]
-    for i, delay_s in enumerate(backoffs + [0]):  # final try without extra delay index
-        try:
-            with httpx.Client(timeout=60) as client:
-                r = client.post(url, json=payload)
-                if r.status_code == 429:
-                    raise httpx.HTTPStatusError("rate limit", request=r.request, response=r)
-                r.raise_for_status()
-                data = r.json()
-                candidates = data.get("candidates") or []
-                if not candidates:
-                    return "{}"
-                parts = ((candidates[0].get("content") or {}).get("parts") or [])
-                if not parts:
-                    return "{}"
-                return parts[0].get("text", "{}")
-        except httpx.HTTPStatusError as e:
-            if getattr(e.response, "status_code", None) == 429 and i < len(backoffs):
-                time.sleep(delay_s)
-                continue
-            raise
-        except httpx.RequestError:
-            if i < len(backoffs):
-                time.sleep(delay_s)
-                continue
-            raise
-    return "{}"
+    client = get_async_client()
+
+    async def attempt() -> str:
+        r = await client.post(url, json=payload)
+        r.raise_for_status()
+        data = r.json()
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return "{}"
+        parts = ((candidates[0].get("content") or {}).get("parts") or [])
+        if not parts:
+            return "{}"
+        return parts[0].get("text", "{}")
+
+    # Same limiter as the generator: concurrent candidates share the key's pacing,
+    # and 429s pause all of them until Retry-After instead of retrying in lockstep
+    return await get_rate_limiter().call("gemini", api_key, attempt, FIXER_RETRY)
+
+
+def _output_patterns() -> List[Tuple[re.Pattern, str]]:
+    # Generated path (with any package directory) -> template name
+    marker, screen = "\0", "\1"
+    patterns = []
+    outputs = project_outputs({"package_dir": marker, "screens": ({"function": f"{screen}Screen"},)})
+    for template, out_rel, _ in outputs:
+        regex = re.escape(out_rel).replace(re.escape(marker), r"[\w/]+").replace(re.escape(screen), r"\w+")
+        patterns.append((re.compile(r"(?:^|[/\\\s'\"])" + regex + r"\b"), template))
+    return patterns
+
 
+def _implicated_templates(text: str, patterns: Sequence[Tuple[re.Pattern, str]]) -> List[str]:
+    found = [template for pattern, template in patterns if pattern.search(text)]
+    if not found:
+        for pattern, templates in _KEYWORD_TEMPLATES:
+            if pattern.search(text):
+                found.extend(t for t in templates if t not in found)
+    return found
 
-def gather_template_snapshot() -> str:
+
+def extract_error_blocks(log_text: str) -> List[ErrorBlock]:
+    """Pick the error lines (with a little context) out of a Gradle build log."""
+    lines = log_text.splitlines()
+    patterns = _output_patterns()
+    blocks: List[ErrorBlock] = []
+    seen = set()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith(_WHAT_WENT_WRONG):
+            end = i + 1
+            while end < len(lines) and end - i < _MAX_BLOCK_LINES and not _BLOCK_END.match(lines[end]):
+                end += 1
+        elif any(p.search(line) for p in _ERROR_PATTERNS):
+            end = i + 1
+            while end < len(lines) and end - i <= _CONTEXT_LINES and lines[end].startswith((" ", "\t")):
+                end += 1
+        else:
+            i += 1
+            continue
+        text = "\n".join(lines[i:end]).strip()
+        key = error_signature_line(text)
+        if text and key not in seen:
+            seen.add(key)
+            blocks.append(ErrorBlock(text, _implicated_templates(text, patterns)))
+        i = end
+    return blocks
+
+
+def error_signature_line(text: str) -> str:
+    # Drop what changes between runs: absolute paths, line/column numbers, hashes
+    text = re.sub(r"(?:file://)?(?:/[^\s:'\"]+)+/", "", text)
+    text = re.sub(r"\b[0-9a-f]{12,}\b", "<hash>", text)
+    return re.sub(r"\d+", "N", text)
+
+
+def implicated_templates(blocks: Iterable[ErrorBlock]) -> List[str]:
+    templates: List[str] = []
+    for block in blocks:
+        templates.extend(t for t in block.templates if t not in templates)
+    return templates or list(_DEFAULT_TEMPLATES)
+
+
+def gather_template_snapshot(templates: Optional[Iterable[str]] = None, root: Path = TEMPLATES_ROOT) -> str:
     lines: List[str] = []
-    for p in sorted(TEMPLATES_ROOT.rglob("*.j2")):
-        rel = p.as_posix()
+    paths = sorted(root.rglob("*.j2")) if templates is None else [root / t for t in templates]
+    for p in paths:
+        if not p.exists():
+            continue
+        rel = (TEMPLATES_ROOT / p.relative_to(root)).as_posix()
         content = p.read_text(encoding="utf-8")
         lines.append(f"===== FILE: {rel} =====\n{content}\n")
     return "\n".join(lines)
 
 
+def build_prompt(blocks: Sequence[ErrorBlock], templates: Sequence[str], root: Path = TEMPLATES_ROOT) -> str:
+    errors = "\n\n".join(block.text for block in blocks)[:AI_FIXER_MAX_LOG_CHARS]
+    return (
+        SYSTEM_MSG + "\n\n"
+        "Build errors below. Propose minimal template fixes as JSON per rules.\n\n"
+        f"===== BUILD ERRORS =====\n{errors or '(no error lines found in the log)'}\n\n"
+        f"===== IMPLICATED TEMPLATES =====\n{gather_template_snapshot(templates, root)}\n"
+    )
+
+
+def fix_cache_key(blocks: Sequence[ErrorBlock], templates: Sequence[str], root: Path = TEMPLATES_ROOT) -> str:
+    # The same errors against the same template contents get the same fix
+    digest = hashlib.sha256()
+    for block in blocks:
+        digest.update(error_signature_line(block.text).encode("utf-8") + b"\0")
+    for template in templates:
+        path = root / template
+        digest.update(template.encode("utf-8") + b"\0")
+        digest.update(path.read_bytes() if path.exists() else b"")
+    return digest.hexdigest()
+
+
+class FixCache:
+    def __init__(self, directory: str = AI_FIXER_CACHE_DIR) -> None:
+        self.directory = Path(directory)
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            return json.loads((self.directory / f"{key}.json").read_text(encoding="utf-8"))["edits"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, key: str, edits: List[Dict[str, Any]]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f"{key}.json.tmp"
+        tmp.write_text(json.dumps({"edits": edits}), encoding="utf-8")
+        tmp.replace(self.directory / f"{key}.json")
+
+
+def parse_edits(raw: str) -> List[Dict[str, Any]]:
+    # Extract JSON block if wrapped in fences
+    text = raw.strip()
+    if "```" in text:
+        parts = text.split("```")
+        if len(parts) >= 3:
+            text = parts[1]
+        text = text.replace("json", "", 1).strip()
+    try:
+        data = json.loads(text or "{}")
+    except ValueError:
+        return []
+    edits = data.get("edits") if isinstance(data, dict) else None
+    if not isinstance(edits, list):
+        return []
+    return [e for e in edits if isinstance(e, dict) and isinstance(e.get("path"), str) and isinstance(e.get("new_content"), str)]
+
+
 def sanitize_gradle_content(path: Path, content: str) -> str:
     if path.as_posix().endswith("app/build.gradle.kts.j2"):
         # Force a known-good Compose compiler extension version
@@ -82,17 +292,116 @@ def sanitize_gradle_content(path: Path, content: str) -> str:
     return content
 
 
-def apply_edits(edits: List[Dict[str, Any]]) -> int:
+def _balanced(text: str) -> bool:
+    # Brackets outside string literals and comments
+    pairs = {")": "(", "]": "[", "}": "{"}
+    stack: List[str] = []
+    for token in re.finditer(r'"""[\s\S]*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*[\s\S]*?\*/|[()\[\]{}]', text):
+        char = token.group()
+        if char in "([{":
+            stack.append(char)
+        elif char in pairs:
+            if not stack or stack.pop() != pairs[char]:
+                return False
+    return not stack
+
+
+def validate_candidate(edits: List[Dict[str, Any]], templates: Sequence[str], root: Path = TEMPLATES_ROOT) -> Candidate:
+    """Apply ``edits`` to a scratch copy of the templates, render the project and score the result.
+
+    Scores compare as (renders cleanly, implicated templates touched, -changed lines):
+    a fix that breaks rendering never wins, and among working fixes the one that
+    addresses the reported files with the smallest change does.
+    """
+    candidate = Candidate(edits)
+    if not edits:
+        candidate.problems.append("no edits")
+        return candidate
+    with tempfile.TemporaryDirectory(prefix="ai_fixer_") as tmp:
+        scratch = Path(tmp) / "android"
+        shutil.copytree(root, scratch)
+        changed_lines = 0
+        touched = set()
+        for edit in edits:
+            path = edit["path"]
+            if not path.startswith(TEMPLATE_PREFIX) or ".." in Path(path).parts:
+                candidate.problems.append(f"edit outside templates: {path}")
+                continue
+            rel = path[len(TEMPLATE_PREFIX):]
+            target = scratch / rel
+            old = target.read_text(encoding="utf-8").splitlines() if target.exists() else []
+            new = sanitize_gradle_content(target, edit["new_content"])
+            changed_lines += len(set(new.splitlines()).symmetric_difference(old))
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(new, encoding="utf-8")
+            touched.add(rel)
+
+        env = create_jinja_env(templates_dir=scratch)
+        outputs = [*project_outputs(SAMPLE_CONTEXT), *project_outputs(SAMPLE_SCREENS_CONTEXT)]
+        for template, out_rel, ctx in outputs:
+            try:
+                rendered = env.get_template(template).render(**ctx)
+            except Exception as e:  # noqa: BLE001 - any template error disqualifies the fix
+                candidate.problems.append(f"{template}: {e}")
+                continue
+            if out_rel.endswith(".xml"):
+                try:
+                    ET.fromstring(rendered)
+                except ET.ParseError as e:
+                    candidate.problems.append(f"{out_rel}: {e}")
+            elif out_rel.endswith((".kt", ".kts")) and not _balanced(rendered):
+                candidate.problems.append(f"{out_rel}: unbalanced brackets")
+
+    candidate.score = (0 if candidate.problems else 1, len(touched & set(templates)), -changed_lines)
+    return candidate
+
+
+async def propose_fix(
+    blocks: Sequence[ErrorBlock],
+    complete: Completion,
+    candidates: int = AI_FIXER_CANDIDATES,
+    cache: Optional[FixCache] = None,
+    root: Path = TEMPLATES_ROOT,
+) -> Tuple[Optional[Candidate], bool]:
+    """Best validated fix for ``blocks`` and whether it came from the cache."""
+    templates = implicated_templates(blocks)
+    key = fix_cache_key(blocks, templates, root)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return validate_candidate(cached, templates, root), True
+
+    prompt = build_prompt(blocks, templates, root)
+    temperatures = [CANDIDATE_TEMPERATURES[i % len(CANDIDATE_TEMPERATURES)] for i in range(max(1, candidates))]
+    answers = await asyncio.gather(*(complete(prompt, t) for t in temperatures), return_exceptions=True)
+    scored = [
+        validate_candidate(parse_edits(answer), templates, root)
+        for answer in answers
+        if isinstance(answer, str)
+    ]
+    errors = [a for a in answers if isinstance(a, BaseException)]
+    if errors and not scored:
+        raise errors[0]
+    valid = [c for c in scored if c.valid]
+    if not valid:
+        return (max(scored, key=lambda c: c.score) if scored else None), False
+    best = max(valid, key=lambda c: c.score)
+    if cache is not None:
+        cache.set(key, best.edits)
+    return best, False
+
+
+def apply_edits(edits: List[Dict[str, Any]], repo_root: Path = Path(".")) -> int:
     applied = 0
     for edit in edits:
         path = Path(edit.get("path", ""))
         new_content = edit.get("new_content", None)
         if not path or new_content is None:
             continue
-        if not path.as_posix().startswith("backend/app/templates/android/"):
+        if not path.as_posix().startswith(TEMPLATE_PREFIX) or ".." in path.parts:
             # Only allow edits inside templates
             continue
-        target = Path(path.as_posix())
+        target = repo_root / path.as_posix()
         target.parent.mkdir(parents=True, exist_ok=True)
         sanitized = sanitize_gradle_content(target, new_content)
         target.write_text(sanitized, encoding="utf-8")
@@ -100,10 +409,32 @@ def apply_edits(edits: List[Dict[str, Any]]) -> int:
     return applied
 
 
+async def _fix(log_text: str, api_key: str, candidates: int, cache: Optional[FixCache]) -> int:
+    blocks = extract_error_blocks(log_text)
+    print(f"[ai-fixer] {len(blocks)} error block(s), templates: {', '.join(implicated_templates(blocks))}")
+
+    async def complete(prompt: str, temperature: float) -> str:
+        return await call_gemini(api_key, prompt, temperature)
+
+    try:
+        best, cached = await propose_fix(blocks, complete, candidates, cache)
+    finally:
+        await aclose_clients()
+    if best is None or not best.valid:
+        problems = "; ".join(best.problems) if best else "no usable answer"
+        print(f"[ai-fixer] No valid fix ({problems})", file=sys.stderr)
+        return 0
+    applied = apply_edits(best.edits)
+    print(f"[ai-fixer] Applied {applied} edit(s){' from cache' if cached else ''}, score={best.score}")
+    return applied
+
+
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--generated", required=True, help="Path to generated project directory")
     parser.add_argument("--log", required=True, help="Path to build log file")
+    parser.add_argument("--candidates", type=int, default=AI_FIXER_CANDIDATES, help="Concurrent fix proposals to score")
+    parser.add_argument("--cache-dir", default=AI_FIXER_CACHE_DIR, help="Directory of cached fixes ('' disables)")
     args = parser.parse_args()
 
     api_key = os.getenv("GEMINI_API_KEY", "")
@@ -111,34 +442,11 @@ def main() -> int:
         print("[ai-fixer] GEMINI_API_KEY not set; skipping", file=sys.stderr)
         return 0
 
-    log_text = Path(args.log).read_text(encoding="utf-8") if Path(args.log).exists() else ""
-    snapshot = gather_template_snapshot()
-
-    user_prompt = (
-        f"Build error log below. Propose minimal template fixes as JSON per rules.\n\n"
-        f"===== BUILD LOG =====\n{log_text}\n\n"
-        f"===== TEMPLATE SNAPSHOT (truncated allowed) =====\n{snapshot}\n"
-    )
-
-    raw = call_gemini(api_key, SYSTEM_MSG + "\n\n" + user_prompt)
-    # Extract JSON block if wrapped in fences
-    text = raw.strip()
-    if "```" in text:
-        parts = text.split("```")
-        if len(parts) >= 3:
-            text = parts[1]
-        text = text.replace("json", "", 1).strip()
-    try:
-        data = json.loads(text or "{}")
-    except Exception:
-        print("[ai-fixer] Failed to parse JSON from model", file=sys.stderr)
-        return 0
-
-    edits = data.get("edits") or []
-    applied = apply_edits(edits)
-    print(f"[ai-fixer] Applied {applied} edit(s)")
+    log_text = Path(args.log).read_text(encoding="utf-8", errors="replace") if Path(args.log).exists() else ""
+    cache = FixCache(args.cache_dir) if args.cache_dir else None
+    asyncio.run(_fix(log_text, api_key, args.candidates, cache))
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
\ No newline at end of file
+    raise SystemExit(main())
@@ -1,12 +1,84 @@
+from contextlib import asynccontextmanager
+import logging
+import os
+
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from .routes.generate import router as generate_router
+from .routes.jobs import router as jobs_router
+from .services.admission import get_admission
+from .services.executor import shutdown_executor
+from .services.generator import entry_cache_stats, warm_entry_cache
+from .services.http_clients import aclose_clients, get_async_client
+from .services.jobs import get_job_manager
+from .services.llm import router_stats
+from .services.llm_cache import get_llm_cache
+from .services.metrics import register_collector, render_metrics
+from .services.ratelimit import get_rate_limiter
+from .services.singleflight import flight_stats
+
+logger = logging.getLogger(__name__)
+
+# Seconds to let queued and running jobs finish on shutdown before they are cancelled
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "20"))
+
+
+def _service_metrics():
+    # Counters the services already keep, exposed as-is at scrape time
+    router = router_stats()
+    providers = router["providers"]
+    yield ("generator_router_events_total", "counter", "LLM router requests, hedges and provider fallbacks",
+           [({"event": k}, router[k]) for k in ("requests", "hedged", "hedge_wins", "fallbacks")])
+    yield ("generator_router_provider_requests_total", "counter", "Requests seen by the router per provider",
+           [({"provider": name, "outcome": outcome}, p[key]) for name, p in providers.items()
+            for outcome, key in (("answered", "answered"), ("error", "errors"))])
+    yield ("generator_router_provider_latency_seconds", "gauge", "Rolling provider latency percentiles",
+           [({"provider": name, "quantile": q}, p[key]) for name, p in providers.items()
+            for q, key in (("0.5", "p50"), ("0.95", "p95")) if p[key] is not None])
+    yield ("generator_llm_rate_limit", "gauge", "Current client-side request rate per provider key (absent: unlimited)",
+           [({"key": key}, s["rate"]) for key, s in get_rate_limiter().stats().items() if s["rate"] is not None])
+    yield ("generator_llm_cache_events_total", "counter", "LLM response cache lookups",
+           [({"result": k}, v) for k, v in get_llm_cache().stats.as_dict().items()])
+    yield ("generator_entry_cache_events_total", "counter", "Prebuilt archive entry lookups",
+           [({"result": k}, v) for k, v in entry_cache_stats.items()])
+    yield ("generator_singleflight_calls_total", "counter", "Calls through single-flight groups",
+           [({"group": name, "result": k}, v) for name, s in flight_stats().items()
+            for k, v in s.items() if k != "in_flight"])
+    yield ("generator_admission", "gauge", "Admission pool state",
+           [({"pool": pool, "field": k}, v) for pool, s in get_admission().stats().items() for k, v in s.items()])
+    yield ("generator_jobs", "gauge", "Async generation jobs by state",
+           [({"state": k}, v) for k, v in get_job_manager().stats().items()])
+
+
+register_collector(_service_metrics)
 
-app = FastAPI(title="AI Android Generator App", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared provider connection pool on the server loop and prebuild
+    # the archive entries that are identical for every project
+    get_async_client()
+    warm_entry_cache()
+    app.state.ready = True
+    yield
+    # uvicorn has stopped accepting connections and finished open requests by now;
+    # background jobs are ours to wait for
+    app.state.draining = True
+    manager = get_job_manager()
+    if not await manager.drain(SHUTDOWN_DRAIN_SECONDS):
+        logger.warning("Shutdown drain timed out; cancelling unfinished jobs")
+    await manager.stop()
+    await aclose_clients()
+    shutdown_executor()
+
+
+app = FastAPI(title="AI Android Generator App", version="0.1.0", lifespan=lifespan)
+app.state.ready = False
+app.state.draining = False
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,4 +97,26 @@ templates = Jinja2Templates(directory="backend/app/web/templates")
 async def index(request: Request) -> HTMLResponse:
     return templates.TemplateResponse("index.html", {"request": request})
 
-app.include_router(generate_router)
\ No newline at end of file
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz")
+async def healthz() -> JSONResponse:
+    # Liveness: the worker's event loop answers
+    return JSONResponse({"status": "ok", "pid": os.getpid()})
+
+@app.get("/readyz")
+async def readyz() -> JSONResponse:
+    # Readiness: warmed up and not shutting down
+    if app.state.draining:
+        status = "draining"
+    elif not app.state.ready:
+        status = "starting"
+    else:
+        status = "ready"
+    body = {"status": status, "pid": os.getpid(), "admission": get_admission().stats()}
+    return JSONResponse(body, status_code=200 if status == "ready" else 503)
+
+app.include_router(generate_router)
+app.include_router(jobs_router)
\ No newline at end of file
@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Form
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional
-from io import BytesIO
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import quote
+import re
+import unicodedata
 
-from ..services.generator import AndroidProjectConfig, generate_android_project_zip
+from ..services.admission import QueueFullError, get_admission
+from ..services.archive import ARCHIVE_ZIP, Compression, get_compression
+from ..services.generator import (
+    DEFAULT_COMPRESSION,
+    AndroidProjectConfig,
+    build_project_context,
+    iter_project_archive,
+    shared_project_context,
+)
+from ..services.executor import run_blocking
+from ..services.metrics import stage
+from ..services.project_diff import diff_project, parse_manifest
 
 router = APIRouter()
 
@@ -16,16 +29,44 @@ class GenerateRequest(BaseModel):
     target_sdk: int = Field(default=34)
     prompt: str = Field(...)
 
-@router.post("/generate")
-async def generate(
+def content_disposition(filename: str) -> str:
+    """Attachment header for any file name: a quoted ASCII fallback plus the RFC 5987 UTF-8 form."""
+    fallback = unicodedata.normalize("NFKD", filename.replace("đ", "d").replace("Đ", "D"))
+    fallback = re.sub(r"[^\w.-]+", "_", fallback.encode("ascii", "ignore").decode()).strip("_")
+    if not fallback or fallback.startswith("."):
+        fallback = f"android-project{fallback}"
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def _client_id(request: Request) -> str:
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else "")
+
+
+def _overloaded(error: QueueFullError) -> JSONResponse:
+    return JSONResponse(
+        {"detail": str(error)},
+        status_code=429 if error.per_client else 503,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+async def _render_stream(ctx: Dict[str, object], client: str, compression: Compression) -> AsyncIterator[bytes]:
+    async with get_admission().render.slot(client):
+        # Covers the whole body, including the client reading it
+        with stage("response"):
+            async for chunk in iter_project_archive(ctx, compression):
+                yield chunk
+
+
+def project_config_form(
     app_name: str = Form(...),
     package_name: str = Form(...),
     prompt: str = Form(...),
     description: Optional[str] = Form(None),
     min_sdk: int = Form(24),
     target_sdk: int = Form(34),
-):
-    config = AndroidProjectConfig(
+) -> AndroidProjectConfig:
+    return AndroidProjectConfig(
         app_name=app_name,
         package_name=package_name,
         description=description or "",
@@ -34,7 +75,81 @@ async def generate(
         prompt=prompt,
     )
 
-    zip_bytes = await generate_android_project_zip(config)
-    buffer = BytesIO(zip_bytes)
-    headers = {"Content-Disposition": "attachment; filename=android-project.zip"}
-    return StreamingResponse(buffer, media_type="application/zip", headers=headers)
\ No newline at end of file
+
+def compression_form(compression: str = Form("")) -> Compression:
+    # Empty selects the server default (GENERATOR_COMPRESSION)
+    if not compression:
+        return DEFAULT_COMPRESSION
+    try:
+        return get_compression(compression)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from None
+
+
+@router.post("/generate")
+async def generate(
+    request: Request,
+    config: AndroidProjectConfig = Depends(project_config_form),
+    compression: Compression = Depends(compression_form),
+):
+    # Resolve the LLM content before answering so failures surface as a normal error
+    # response; the archive itself is rendered and compressed while it is being sent.
+    # Identical requests in flight (a CI matrix, a popular Space preset) share the
+    # LLM work; each one still waits for its own admission slots.
+    client = _client_id(request)
+    admission = get_admission()
+    try:
+        async with admission.llm.slot(client):
+            ctx = await shared_project_context(config)
+        # Reject now rather than after the response has started
+        admission.render.check(client)
+    except QueueFullError as e:
+        return _overloaded(e)
+
+    headers = {
+        "Content-Disposition": content_disposition(f"android-project{compression.extension}"),
+        "X-LLM-Provider": str(ctx["llm_provider"]),
+    }
+    return StreamingResponse(_render_stream(ctx, client, compression), media_type=compression.media_type, headers=headers)
+
+
+@router.post("/generate/diff")
+async def generate_diff(
+    request: Request,
+    config: AndroidProjectConfig = Depends(project_config_form),
+    compression: Compression = Depends(compression_form),
+    manifest: str = Form(""),
+    format: str = Form("zip"),
+):
+    # Only files whose rendered content differs from the client's manifest are
+    # returned, as a patch zip or as JSON; an empty manifest returns everything.
+    if format not in ("zip", "json"):
+        raise HTTPException(status_code=422, detail="format must be 'zip' or 'json'")
+    if compression.format != ARCHIVE_ZIP:
+        raise HTTPException(status_code=422, detail="patches are always zip archives")
+    try:
+        previous = parse_manifest(manifest)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"invalid manifest: {e}") from None
+
+    client = _client_id(request)
+    admission = get_admission()
+    try:
+        async with admission.llm.slot(client):
+            ctx = await build_project_context(config)
+        async with admission.render.slot(client):
+            with stage("diff"):
+                diff = await run_blocking(diff_project, ctx, previous)
+                body = None if format == "json" else await run_blocking(diff.patch_zip, compression)
+    except QueueFullError as e:
+        return _overloaded(e)
+
+    headers = {
+        "X-LLM-Provider": str(ctx["llm_provider"]),
+        "X-Changed-Files": str(len(diff.changed)),
+        "X-Removed-Files": str(len(diff.removed)),
+    }
+    if body is None:
+        return JSONResponse(diff.as_json(), headers=headers)
+    headers["Content-Disposition"] = content_disposition("android-project.patch.zip")
+    return Response(body, media_type="application/zip", headers=headers)
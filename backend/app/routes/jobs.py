@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import AsyncIterator, Dict
+import json
+import time
+
+from ..services.admission import QueueFullError
+from ..services.generator import AndroidProjectConfig
+from ..services.jobs import DONE, Job, get_job_manager
+from .generate import content_disposition, project_config_form
+
+router = APIRouter()
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _job_payload(job: Job) -> Dict[str, object]:
+    payload = job.as_dict()
+    payload["status_url"] = f"/jobs/{job.id}"
+    payload["events_url"] = f"/jobs/{job.id}/events"
+    payload["result_url"] = f"/jobs/{job.id}/result"
+    return payload
+
+
+def _get_job(job_id: str) -> Job:
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(config: AndroidProjectConfig = Depends(project_config_form)):
+    try:
+        job = get_job_manager().submit(config)
+    except QueueFullError as e:
+        return JSONResponse({"detail": str(e)}, status_code=503, headers={"Retry-After": str(e.retry_after)})
+    return JSONResponse(_job_payload(job), status_code=202, headers={"Location": f"/jobs/{job.id}"})
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _job_payload(_get_job(job_id))
+
+
+async def _job_events(job: Job) -> AsyncIterator[str]:
+    version = -1
+    quiet_since = time.monotonic()
+    while True:
+        if job.version != version:
+            version = job.version
+            quiet_since = time.monotonic()
+            yield f"event: status\ndata: {json.dumps(_job_payload(job))}\n\n"
+        if job.finished:
+            return
+        if await job.wait_changed(version, SSE_KEEPALIVE_SECONDS):
+            continue
+        if job.remote:
+            # Running in another worker process: pick up its latest snapshot
+            job = get_job_manager().get(job.id) or job
+        if time.monotonic() - quiet_since >= SSE_KEEPALIVE_SECONDS:
+            quiet_since = time.monotonic()
+            yield ": keep-alive\n\n"
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = _get_job(job_id)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_job_events(job), media_type="text/event-stream", headers=headers)
+
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = _get_job(job_id)
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    data = get_job_manager().result(job_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Result expired")
+    headers = {"Content-Disposition": content_disposition(f"{job.config.app_name}.zip")}
+    return Response(data, media_type="application/zip", headers=headers)
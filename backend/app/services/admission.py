@@ -0,0 +1,160 @@
+"""Admission control for the generate endpoint.
+
+LLM calls and render/compression work each get a bounded number of slots. Requests
+that cannot start right away wait in per-client queues that are served round-robin,
+so one busy client cannot starve the others. When the queue is full the caller is
+rejected immediately with a Retry-After estimate instead of piling up work.
+"""
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+import asyncio
+import math
+import os
+import time
+
+GENERATE_LLM_SLOTS = int(os.getenv("GENERATE_LLM_SLOTS", "16"))
+GENERATE_RENDER_SLOTS = int(os.getenv("GENERATE_RENDER_SLOTS", str(os.cpu_count() or 2)))
+GENERATE_MAX_QUEUE = int(os.getenv("GENERATE_MAX_QUEUE", "64"))
+GENERATE_MAX_QUEUE_PER_CLIENT = int(os.getenv("GENERATE_MAX_QUEUE_PER_CLIENT", "8"))
+
+
+class QueueFullError(Exception):
+    def __init__(self, pool: str, retry_after: int, per_client: bool) -> None:
+        scope = "client queue" if per_client else "queue"
+        super().__init__(f"{pool} {scope} is full")
+        self.pool = pool
+        self.retry_after = retry_after
+        # Per-client limits map to 429, a globally full queue to 503
+        self.per_client = per_client
+
+
+class FairLimiter:
+    def __init__(self, name: str, slots: int, max_queue: int, max_queue_per_client: int) -> None:
+        self.name = name
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._hold_seconds = 1.0  # moving average of how long a slot is held
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    def retry_after(self) -> int:
+        backlog = (self.waiting + 1) / self.slots
+        return max(1, min(60, math.ceil(backlog * self._hold_seconds)))
+
+    def check(self, client: str = "") -> None:
+        if self.active < self.slots and self.waiting == 0:
+            return
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.name, self.retry_after(), per_client=False)
+        if len(self._queues.get(client, ())) >= self.max_queue_per_client:
+            self.rejected += 1
+            raise QueueFullError(self.name, self.retry_after(), per_client=True)
+
+    async def acquire(self, client: str = "") -> None:
+        started = time.perf_counter()
+        if self.active < self.slots and self.waiting == 0:
+            self.active += 1
+            self._admit(0.0)
+            return
+        self.check(client)
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(future)
+        self.waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the waiter was cancelled
+                self.release()
+            else:
+                self._discard(client, future)
+            raise
+        self._admit(time.perf_counter() - started)
+
+    def release(self) -> None:
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            self.waiting -= 1
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, client: str = "") -> AsyncIterator[None]:
+        await self.acquire(client)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * (time.perf_counter() - started)
+            self.release()
+
+    def _admit(self, waited: float) -> None:
+        self.admitted += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def _discard(self, client: str, future: asyncio.Future) -> None:
+        queue = self._queues.get(client)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            self.waiting -= 1
+            if not queue:
+                del self._queues[client]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "slots": self.slots,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+class Admission:
+    def __init__(
+        self,
+        llm_slots: int = GENERATE_LLM_SLOTS,
+        render_slots: int = GENERATE_RENDER_SLOTS,
+        max_queue: int = GENERATE_MAX_QUEUE,
+        max_queue_per_client: int = GENERATE_MAX_QUEUE_PER_CLIENT,
+    ) -> None:
+        self.llm = FairLimiter("llm", llm_slots, max_queue, max_queue_per_client)
+        self.render = FairLimiter("render", render_slots, max_queue, max_queue_per_client)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {"llm": self.llm.stats(), "render": self.render.stats()}
+
+
+_admission: Optional[Admission] = None
+
+
+def get_admission() -> Admission:
+    global _admission
+    if _admission is None:
+        _admission = Admission()
+    return _admission
+
+
+def set_admission(admission: Optional[Admission]) -> None:
+    global _admission
+    _admission = admission
@@ -0,0 +1,200 @@
+"""Minimal streaming zip writer.
+
+Each entry is compressed in full before its local header is written, so sizes and
+CRCs are known up front and no data descriptors are needed. The writer only returns
+bytes; callers decide whether to buffer them or send them as they are produced.
+
+:class:`Compression` selects how entries are compressed: the deflate level,
+storing small entries as-is, compressing on a thread pool (zlib releases the GIL)
+or producing a zstd-compressed tarball instead of a zip.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+import io
+import os
+import struct
+import tarfile
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for tar.zst output
+    zstandard = None
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+
+_VERSION = 20  # 2.0: deflate
+_SYSTEM_UNIX = 3
+_FLAG_UTF8 = 0x800
+_ZIP32_LIMIT = 0xFFFFFFFF
+
+ARCHIVE_ZIP = "zip"
+ARCHIVE_TAR_ZST = "tar.zst"
+
+
+@dataclass(frozen=True)
+class Compression:
+    # zlib level for zip entries (0 stores every entry), zstd level for tar.zst
+    level: int = zlib.Z_DEFAULT_COMPRESSION
+    # Entries smaller than this many bytes are stored: deflate barely shrinks them
+    store_below: int = 0
+    # Threads compressing entries concurrently; 0 compresses inline while streaming
+    workers: int = 0
+    format: str = ARCHIVE_ZIP
+
+    @property
+    def extension(self) -> str:
+        return "." + self.format
+
+    @property
+    def media_type(self) -> str:
+        return "application/zip" if self.format == ARCHIVE_ZIP else "application/zstd"
+
+
+COMPRESSION_MODES: Dict[str, Compression] = {
+    "default": Compression(),
+    "fast": Compression(level=1, store_below=128),
+    "small": Compression(level=9),
+    "store": Compression(level=0),
+    "parallel": Compression(store_below=128, workers=min(8, os.cpu_count() or 1)),
+    "tar.zst": Compression(level=3, format=ARCHIVE_TAR_ZST),
+}
+
+
+def get_compression(mode: Optional[str]) -> Compression:
+    try:
+        compression = COMPRESSION_MODES[mode or "default"]
+    except KeyError:
+        raise ValueError(f"unknown compression mode {mode!r}, expected one of {', '.join(COMPRESSION_MODES)}") from None
+    if compression.format == ARCHIVE_TAR_ZST and zstandard is None:
+        raise ValueError("tar.zst output requires the zstandard package")
+    return compression
+
+
+def available_compression_modes() -> List[str]:
+    """The modes :func:`get_compression` accepts here (``tar.zst`` needs zstandard)."""
+    return [
+        mode for mode, compression in COMPRESSION_MODES.items()
+        if compression.format != ARCHIVE_TAR_ZST or zstandard is not None
+    ]
+
+
+@dataclass(frozen=True)
+class ZipEntry:
+    name: str
+    method: int
+    crc: int
+    size: int
+    data: bytes
+    date_time: Tuple[int, int, int, int, int, int]
+    mode: int = 0o644
+
+
+def _dos_date_time(date_time: Tuple[int, ...]) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time[:6]
+    dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_date, dos_time
+
+
+def compress_entry(
+    name: str,
+    payload: bytes,
+    level: int = zlib.Z_DEFAULT_COMPRESSION,
+    date_time: Optional[Tuple[int, ...]] = None,
+    store_below: int = 0,
+) -> ZipEntry:
+    if level == 0 or len(payload) < store_below:
+        method, data = ZIP_STORED, payload
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        method, data = ZIP_DEFLATED, compressor.compress(payload) + compressor.flush()
+    return ZipEntry(
+        name=name,
+        method=method,
+        crc=zlib.crc32(payload),
+        size=len(payload),
+        data=data,
+        date_time=tuple(date_time or time.localtime()[:6]),
+    )
+
+
+class ZipStreamWriter:
+    def __init__(self) -> None:
+        self._offset = 0
+        self._central: List[bytes] = []
+
+    def add(self, entry: ZipEntry) -> bytes:
+        name = entry.name.encode("utf-8")
+        flags = 0 if entry.name.isascii() else _FLAG_UTF8
+        dos_date, dos_time = _dos_date_time(entry.date_time)
+        if self._offset + len(entry.data) > _ZIP32_LIMIT:
+            raise ValueError("archive too large for zip32")
+
+        header = _LOCAL_HEADER.pack(
+            b"PK\003\004", _VERSION, 0, flags, entry.method, dos_time, dos_date,
+            entry.crc, len(entry.data), entry.size, len(name), 0,
+        )
+        self._central.append(
+            _CENTRAL_HEADER.pack(
+                b"PK\001\002", _VERSION, _SYSTEM_UNIX, _VERSION, 0, flags, entry.method,
+                dos_time, dos_date, entry.crc, len(entry.data), entry.size,
+                len(name), 0, 0, 0, 0, (0o100000 | entry.mode) << 16, self._offset,
+            ) + name
+        )
+        chunk = header + name + entry.data
+        self._offset += len(chunk)
+        return chunk
+
+    def close(self) -> bytes:
+        directory = b"".join(self._central)
+        count = len(self._central)
+        end = _END_RECORD.pack(b"PK\005\006", 0, 0, count, count, len(directory), self._offset, 0)
+        return directory + end
+
+
+def build_zip(entries: Iterable[ZipEntry]) -> bytes:
+    writer = ZipStreamWriter()
+    chunks = [writer.add(entry) for entry in entries]
+    chunks.append(writer.close())
+    return b"".join(chunks)
+
+
+_pools: Dict[int, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def compression_pool(workers: int) -> ThreadPoolExecutor:
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zip-compress")
+        return pool
+
+
+def build_tar_zst(
+    files: Iterable[Tuple[str, bytes]],
+    level: int = 3,
+    workers: int = 0,
+    date_time: Optional[Tuple[int, ...]] = None,
+) -> bytes:
+    if zstandard is None:
+        raise RuntimeError("tar.zst output requires the zstandard package")
+    mtime = time.mktime(tuple(date_time or time.localtime()[:6]) + (0, 0, -1))
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        for name, payload in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(payload)
+            info.mtime = int(mtime)
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(payload))
+    return zstandard.ZstdCompressor(level=level, threads=workers).compress(buffer.getvalue())
@@ -0,0 +1,142 @@
+"""Batch generation from a manifest of project configs.
+
+LLM calls fan out with bounded async concurrency while archive rendering and
+compression run in a process pool. Each archive is written as soon as it is
+ready, and a failing entry is recorded without stopping the rest of the batch.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import asyncio
+import csv
+import json
+import re
+import time
+
+from .generator import AndroidProjectConfig, build_project_context, zip_project
+
+_CONFIG_FIELDS = {f.name for f in fields(AndroidProjectConfig)}
+_DEFAULTS: Dict[str, object] = {"description": "", "min_sdk": 24, "target_sdk": 34}
+
+
+@dataclass
+class BatchEntry:
+    index: int
+    name: str
+    out: str
+    config: Optional[AndroidProjectConfig] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    index: int
+    name: str
+    path: Optional[Path]
+    size: int
+    seconds: float
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchSummary:
+    results: List[BatchResult]
+    elapsed: float
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for r in self.results if r.error is None)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.succeeded
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(r.size for r in self.results)
+
+    @property
+    def throughput(self) -> float:
+        return self.succeeded / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _safe_filename(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("._") or "project"
+
+
+def _entry_from_row(index: int, row: Dict[str, object]) -> BatchEntry:
+    name = str(row.get("app_name") or f"entry-{index}")
+    out = str(row.get("out") or f"{index:03d}-{_safe_filename(name)}.zip")
+    try:
+        values = {**_DEFAULTS, **{k: v for k, v in row.items() if k in _CONFIG_FIELDS and v not in (None, "")}}
+        missing = sorted(_CONFIG_FIELDS - values.keys())
+        if missing:
+            raise ValueError(f"missing field(s): {', '.join(missing)}")
+        values["min_sdk"] = int(values["min_sdk"])
+        values["target_sdk"] = int(values["target_sdk"])
+        return BatchEntry(index, name, out, config=AndroidProjectConfig(**values))
+    except (TypeError, ValueError) as e:
+        return BatchEntry(index, name, out, error=str(e))
+
+
+def load_manifest(path: Path) -> List[BatchEntry]:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() == ".csv":
+        return [_entry_from_row(i, row) for i, row in enumerate(csv.DictReader(text.splitlines()))]
+
+    entries = []
+    for i, line in enumerate(line for line in text.splitlines() if line.strip()):
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            entries.append(BatchEntry(i, f"entry-{i}", f"{i:03d}-entry.zip", error=f"invalid JSON: {e}"))
+            continue
+        entries.append(_entry_from_row(i, row))
+    return entries
+
+
+async def run_batch(
+    entries: List[BatchEntry],
+    out_dir: Path,
+    concurrency: int = 4,
+    processes: Optional[int] = None,
+    on_result: Optional[Callable[[BatchResult], None]] = None,
+) -> BatchSummary:
+    """Generate every entry into ``out_dir``; ``processes=0`` compresses in-process."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    pool: Optional[Executor] = ProcessPoolExecutor(processes) if processes != 0 else None
+
+    async def one(entry: BatchEntry) -> BatchResult:
+        t0 = time.perf_counter()
+        name = entry.name
+        try:
+            if entry.config is None:
+                raise ValueError(entry.error)
+            async with semaphore:
+                ctx = await build_project_context(entry.config)
+            if pool is not None:
+                data = await loop.run_in_executor(pool, zip_project, ctx)
+            else:
+                data = zip_project(ctx)
+            path = out_dir / entry.out
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            result = BatchResult(entry.index, name, path, len(data), time.perf_counter() - t0)
+        except Exception as e:
+            result = BatchResult(entry.index, name, None, 0, time.perf_counter() - t0, error=str(e) or type(e).__name__)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    try:
+        results = await asyncio.gather(*(one(entry) for entry in entries))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return BatchSummary(sorted(results, key=lambda r: r.index), time.perf_counter() - started)
@@ -0,0 +1,447 @@
+"""Fast structural checks for generated Compose code, run before packaging.
+
+The LLM returns the body of ``setContent { ... }`` in ``MainActivity.kt.j2``.
+:func:`validate_compose` tokenizes it, checks that strings, comments, brackets
+and lambda arrows are balanced, and resolves every capitalized name (and the
+extension functions that need an import) against what the template imports.
+Cheap, unambiguous problems are repaired in place: stray ``package``/``import``
+lines, a single ``@Composable fun`` wrapper, missing closing brackets at the end
+of truncated output, and names that only lack an import. Anything else is
+reported so the caller can retry or fall back to the placeholder.
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+import re
+
+from .templates import TEMPLATES_DIR
+
+MAIN_ACTIVITY_TEMPLATE = "app/src/main/java/MainActivity.kt.j2"
+
+# Members of the wildcard imports in MainActivity.kt.j2
+WILDCARD_MEMBERS: Dict[str, FrozenSet[str]] = {
+    "androidx.compose.foundation.layout": frozenset({
+        "Arrangement", "Box", "BoxScope", "BoxWithConstraints", "Column", "ColumnScope", "IntrinsicSize",
+        "PaddingValues", "Row", "RowScope", "Spacer", "WindowInsets", "aspectRatio", "defaultMinSize",
+        "fillMaxHeight", "fillMaxSize", "fillMaxWidth", "height", "heightIn", "imePadding", "navigationBarsPadding",
+        "offset", "padding", "requiredHeight", "requiredSize", "requiredWidth", "size", "statusBarsPadding",
+        "width", "widthIn", "wrapContentHeight", "wrapContentSize", "wrapContentWidth",
+    }),
+    "androidx.compose.material3": frozenset({
+        "AlertDialog", "AssistChip", "Badge", "BadgedBox", "BottomAppBar", "Button", "ButtonDefaults", "Card",
+        "CardDefaults", "CenterAlignedTopAppBar", "Checkbox", "CircularProgressIndicator", "ColorScheme",
+        "Divider", "DropdownMenu", "DropdownMenuItem", "ElevatedButton", "ElevatedCard", "ExperimentalMaterial3Api",
+        "ExtendedFloatingActionButton", "FilledTonalButton", "FilterChip", "FloatingActionButton",
+        "FloatingActionButtonDefaults", "HorizontalDivider", "Icon", "IconButton", "InputChip",
+        "LargeTopAppBar", "LinearProgressIndicator", "ListItem", "LocalContentColor", "MaterialTheme",
+        "MediumTopAppBar", "NavigationBar", "NavigationBarItem", "NavigationRail", "NavigationRailItem",
+        "OutlinedButton", "OutlinedCard", "OutlinedTextField", "ProvideTextStyle", "RadioButton", "Scaffold",
+        "ScrollableTabRow", "Slider", "Snackbar", "SnackbarHost", "SnackbarHostState", "SuggestionChip",
+        "Surface", "Switch", "Tab", "TabRow", "Text", "TextButton", "TextField", "TextFieldDefaults",
+        "TopAppBar", "TopAppBarDefaults", "Typography", "VerticalDivider", "darkColorScheme", "lightColorScheme",
+    }),
+}
+
+# Names the generated code commonly uses that only need an import (all artifacts
+# are already dependencies of the generated app)
+IMPORTABLE: Dict[str, str] = {
+    "LazyColumn": "androidx.compose.foundation.lazy.LazyColumn",
+    "LazyRow": "androidx.compose.foundation.lazy.LazyRow",
+    "items": "androidx.compose.foundation.lazy.items",
+    "itemsIndexed": "androidx.compose.foundation.lazy.itemsIndexed",
+    "rememberLazyListState": "androidx.compose.foundation.lazy.rememberLazyListState",
+    "LazyVerticalGrid": "androidx.compose.foundation.lazy.grid.LazyVerticalGrid",
+    "GridCells": "androidx.compose.foundation.lazy.grid.GridCells",
+    "Image": "androidx.compose.foundation.Image",
+    "Canvas": "androidx.compose.foundation.Canvas",
+    "BorderStroke": "androidx.compose.foundation.BorderStroke",
+    "background": "androidx.compose.foundation.background",
+    "border": "androidx.compose.foundation.border",
+    "clickable": "androidx.compose.foundation.clickable",
+    "rememberScrollState": "androidx.compose.foundation.rememberScrollState",
+    "verticalScroll": "androidx.compose.foundation.verticalScroll",
+    "horizontalScroll": "androidx.compose.foundation.horizontalScroll",
+    "RoundedCornerShape": "androidx.compose.foundation.shape.RoundedCornerShape",
+    "CircleShape": "androidx.compose.foundation.shape.CircleShape",
+    "KeyboardOptions": "androidx.compose.foundation.text.KeyboardOptions",
+    "KeyboardActions": "androidx.compose.foundation.text.KeyboardActions",
+    "LaunchedEffect": "androidx.compose.runtime.LaunchedEffect",
+    "DisposableEffect": "androidx.compose.runtime.DisposableEffect",
+    "derivedStateOf": "androidx.compose.runtime.derivedStateOf",
+    "mutableIntStateOf": "androidx.compose.runtime.mutableIntStateOf",
+    "mutableFloatStateOf": "androidx.compose.runtime.mutableFloatStateOf",
+    "mutableStateListOf": "androidx.compose.runtime.mutableStateListOf",
+    "rememberCoroutineScope": "androidx.compose.runtime.rememberCoroutineScope",
+    "rememberSaveable": "androidx.compose.runtime.saveable.rememberSaveable",
+    "Color": "androidx.compose.ui.graphics.Color",
+    "Brush": "androidx.compose.ui.graphics.Brush",
+    "clip": "androidx.compose.ui.draw.clip",
+    "alpha": "androidx.compose.ui.draw.alpha",
+    "shadow": "androidx.compose.ui.draw.shadow",
+    "rotate": "androidx.compose.ui.draw.rotate",
+    "ContentScale": "androidx.compose.ui.layout.ContentScale",
+    "LocalContext": "androidx.compose.ui.platform.LocalContext",
+    "painterResource": "androidx.compose.ui.res.painterResource",
+    "stringResource": "androidx.compose.ui.res.stringResource",
+    "TextStyle": "androidx.compose.ui.text.TextStyle",
+    "FontFamily": "androidx.compose.ui.text.font.FontFamily",
+    "TextOverflow": "androidx.compose.ui.text.style.TextOverflow",
+    "KeyboardType": "androidx.compose.ui.text.input.KeyboardType",
+    "ImeAction": "androidx.compose.ui.text.input.ImeAction",
+    "PasswordVisualTransformation": "androidx.compose.ui.text.input.PasswordVisualTransformation",
+    "TextFieldValue": "androidx.compose.ui.text.input.TextFieldValue",
+    "Offset": "androidx.compose.ui.geometry.Offset",
+    "Dp": "androidx.compose.ui.unit.Dp",
+    "sp": "androidx.compose.ui.unit.sp",
+    "AnimatedVisibility": "androidx.compose.animation.AnimatedVisibility",
+    "animateFloatAsState": "androidx.compose.animation.core.animateFloatAsState",
+    "Icons": "androidx.compose.material.icons.Icons",
+    "Toast": "android.widget.Toast",
+    "Log": "android.util.Log",
+    "launch": "kotlinx.coroutines.launch",
+}
+
+# Icons in material-icons-core (pulled in by material3); extended icons are not a dependency
+CORE_ICONS = frozenset({
+    "AccountBox", "AccountCircle", "Add", "AddCircle", "ArrowBack", "ArrowDropDown", "ArrowForward", "Build",
+    "Call", "Check", "CheckCircle", "Clear", "Close", "Create", "DateRange", "Delete", "Done", "Edit", "Email",
+    "ExitToApp", "Face", "Favorite", "FavoriteBorder", "Home", "Info", "KeyboardArrowDown", "KeyboardArrowLeft",
+    "KeyboardArrowRight", "KeyboardArrowUp", "List", "LocationOn", "Lock", "MailOutline", "Menu", "MoreVert",
+    "Notifications", "Person", "Phone", "Place", "PlayArrow", "Refresh", "Search", "Send", "Settings", "Share",
+    "ShoppingCart", "Star", "ThumbUp", "Warning",
+})
+_ICON_STYLES = {"Default": "filled", "Filled": "filled", "Outlined": "outlined", "Rounded": "rounded",
+                "Sharp": "sharp", "TwoTone": "twotone"}
+
+KOTLIN_NAMES = frozenset({
+    "Any", "Array", "Boolean", "Byte", "Char", "Comparable", "Double", "Exception", "Float",
+    "IllegalArgumentException", "IllegalStateException", "Int", "IntArray", "Iterable", "List", "Long", "Map",
+    "Math", "MutableList", "MutableMap", "MutableSet", "Nothing", "Pair", "R", "Regex", "Result", "Sequence",
+    "Set", "Short", "String", "StringBuilder", "System", "Triple", "Unit",
+})
+_DECLARATION_KEYWORDS = frozenset({"val", "var", "fun", "class", "object", "interface", "typealias"})
+_IMPORTABLE_NAMES = frozenset(IMPORTABLE.values())
+# Extension functions resolved on the right of a dot that still need an import
+_EXTENSIONS = frozenset(name for name in IMPORTABLE if name[0].islower())
+
+_CLOSERS = {"(": ")", "[": "]", "{": "}"}
+_OPENERS = {v: k for k, v in _CLOSERS.items()}
+_SIMPLE = re.compile(
+    r"""(?P<ws>\s+)
+    |(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)
+    |(?P<char>'(?:\\.|[^'\\\n])+')
+    |(?P<number>0[xX][0-9a-fA-F_]+[uUL]*|\d[\d_]*(?:\.\d[\d_]*)?(?:[eE][+-]?\d+)?[fFLuU]?)
+    |(?P<ident>`[^`\n]+`|[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<op>->|::|\?\.|\?:|\.\.<?|&&|\|\||[=!]==?|[<>]=|\+\+|--|[-+*/%]=|[-+*/%=<>!?:.,;@&|^~\#$])
+    |(?P<bracket>[()\[\]{}])""",
+    re.VERBOSE,
+)
+
+
+class ComposeSyntaxError(ValueError):
+    def __init__(self, message: str, line: int) -> None:
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+@dataclass(frozen=True)
+class Token:
+    kind: str
+    text: str
+    start: int
+    line: int
+
+
+@dataclass
+class ComposeCheck:
+    # Source to insert into the template (repaired when repairs were possible)
+    source: str
+    # Extra imports the template must add for this source
+    imports: Tuple[str, ...] = ()
+    errors: List[str] = field(default_factory=list)
+    repairs: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def tokenize(source: str) -> List[Token]:
+    """Kotlin tokens with string templates expanded; raises :class:`ComposeSyntaxError`."""
+    tokens: List[Token] = []
+    _tokenize(source, 0, len(source), tokens, nested=False)
+    return tokens
+
+
+def _line(source: str, pos: int) -> int:
+    return source.count("\n", 0, pos) + 1
+
+
+def _tokenize(source: str, pos: int, end: int, tokens: List[Token], nested: bool) -> int:
+    # Returns the position after the closing brace when tokenizing a ${...} template
+    depth = 0
+    while pos < end:
+        if source.startswith('"', pos):
+            pos = _string(source, pos, end, tokens)
+            continue
+        if source.startswith("/*", pos) and source.find("*/", pos + 2) < 0:
+            raise ComposeSyntaxError("unterminated comment", _line(source, pos))
+        if source.startswith("'", pos) and not re.match(r"'(?:\\.|[^'\\\n])+'", source[pos:end]):
+            raise ComposeSyntaxError("unterminated character literal", _line(source, pos))
+        match = _SIMPLE.match(source, pos, end)
+        if match is None:
+            raise ComposeSyntaxError(f"unexpected character {source[pos]!r}", _line(source, pos))
+        kind, text = match.lastgroup, match.group()
+        if nested and kind == "bracket":
+            if text == "{":
+                depth += 1
+            elif text == "}":
+                if depth == 0:
+                    return match.end()
+                depth -= 1
+        if kind not in ("ws", "comment"):
+            tokens.append(Token(kind, text, pos, _line(source, pos)))
+        pos = match.end()
+    if nested:
+        raise ComposeSyntaxError("unterminated string template", _line(source, pos))
+    return pos
+
+
+def _string(source: str, pos: int, end: int, tokens: List[Token]) -> int:
+    start = pos
+    raw = source.startswith('"""', pos)
+    pos += 3 if raw else 1
+    while pos < end:
+        char = source[pos]
+        if raw and source.startswith('"""', pos):
+            pos += 3
+            while pos < end and source[pos] == '"':
+                pos += 1
+            break
+        if not raw and char == '"':
+            pos += 1
+            break
+        if not raw and char == "\n":
+            raise ComposeSyntaxError("unterminated string", _line(source, start))
+        if not raw and char == "\\":
+            pos += 2
+            continue
+        if source.startswith("${", pos):
+            pos = _tokenize(source, pos + 2, end, tokens, nested=True)
+            continue
+        pos += 1
+    else:
+        raise ComposeSyntaxError("unterminated string", _line(source, start))
+    tokens.append(Token("string", source[start:pos], start, _line(source, start)))
+    return pos
+
+
+@lru_cache(maxsize=4)
+def template_scope(template_path: Optional[str] = None) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Names visible to generated code and the fully qualified imports of the template."""
+    path = Path(template_path) if template_path else TEMPLATES_DIR / MAIN_ACTIVITY_TEMPLATE
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError:
+        text = ""
+    names: Set[str] = set(KOTLIN_NAMES)
+    imports: Set[str] = set()
+    for package in re.findall(r"^import\s+([\w.]+)\.\*\s*$", text, re.MULTILINE):
+        names |= WILDCARD_MEMBERS.get(package, frozenset())
+    for fqname in re.findall(r"^import\s+([\w.]+\w)\s*$", text, re.MULTILINE):
+        imports.add(fqname)
+        names.add(fqname.rsplit(".", 1)[-1])
+    # Composables the template itself declares, such as GeneratedPlaceholder
+    names.update(re.findall(r"^fun\s+([A-Z]\w*)\s*\(", text, re.MULTILINE))
+    names.update(re.findall(r"^class\s+(\w+)", text, re.MULTILINE))
+    return frozenset(names), frozenset(imports)
+
+
+def _strip_header_lines(source: str, check: ComposeCheck) -> Tuple[str, List[str]]:
+    kept, moved = [], []
+    for line in source.splitlines():
+        stripped = line.strip()
+        match = re.match(r"import\s+([\w.]+\w(?:\.\*)?)\s*$", stripped)
+        if match:
+            moved.append(match.group(1))
+            check.repairs.append(f"moved import {match.group(1)}")
+            continue
+        if re.match(r"package\s+[\w.]+\s*$", stripped):
+            check.repairs.append("dropped package line")
+            continue
+        kept.append(line)
+    return "\n".join(kept).strip(), moved
+
+
+def _importable(fqname: str, template_imports: FrozenSet[str]) -> bool:
+    # Only imports from artifacts the generated app already depends on
+    if fqname in template_imports or fqname in _IMPORTABLE_NAMES:
+        return True
+    package, _, name = fqname.rpartition(".")
+    if name == "*":
+        # MainActivity already imports these; members of any other package are unknown here
+        return package in WILDCARD_MEMBERS
+    if package.startswith("androidx.compose.material.icons.") and name in CORE_ICONS:
+        return True
+    return name in WILDCARD_MEMBERS.get(package, ())
+
+
+def _unwrap_composable(source: str, tokens: List[Token], check: ComposeCheck) -> Optional[str]:
+    # "@Composable fun Screen() { body }" and nothing else: keep the body
+    head = [t.text for t in tokens[:7]]
+    if len(head) < 7 or head[:3] != ["@", "Composable", "fun"] or head[4:] != ["(", ")", "{"]:
+        return None
+    depth = 0
+    for index, token in enumerate(tokens[6:], start=6):
+        if token.kind != "bracket":
+            continue
+        depth += 1 if token.text in _CLOSERS else -1
+        if depth == 0:
+            if index != len(tokens) - 1:
+                return None
+            check.repairs.append(f"unwrapped @Composable fun {head[3]}")
+            return source[tokens[6].start + 1:token.start].strip()
+    return None
+
+
+def _balance(source: str, tokens: List[Token], check: ComposeCheck) -> str:
+    stack: List[Token] = []
+    for index, token in enumerate(tokens):
+        if token.kind == "bracket":
+            if token.text in _CLOSERS:
+                stack.append(token)
+            elif not stack or stack[-1].text != _OPENERS[token.text]:
+                if all(t.kind == "bracket" and t.text in _OPENERS for t in tokens[index:]) and not stack:
+                    # Surplus closers at the very end, e.g. the model closed setContent too
+                    check.repairs.append(f"dropped {len(tokens) - index} trailing closing bracket(s)")
+                    return source[:token.start].rstrip()
+                expected = _CLOSERS[stack[-1].text] if stack else "nothing"
+                check.errors.append(f"line {token.line}: unexpected {token.text!r}, expected {expected}")
+                return source
+            else:
+                stack.pop()
+        elif token.text == "->":
+            previous = tokens[index - 1].text if index else ""
+            if not any(t.text == "{" for t in stack) and previous != ")":
+                check.errors.append(f"line {token.line}: '->' outside a lambda or when block")
+    if stack:
+        # Truncated output: close what is still open
+        closers = "".join(_CLOSERS[t.text] for t in reversed(stack))
+        check.repairs.append(f"appended missing {closers!r}")
+        return source + "\n" + "\n".join(closers)
+    return source
+
+
+def _declared(tokens: List[Token]) -> Set[str]:
+    names: Set[str] = set()
+    for index, token in enumerate(tokens):
+        if token.text in _DECLARATION_KEYWORDS and index + 1 < len(tokens):
+            following = tokens[index + 1]
+            if following.kind == "ident":
+                names.add(following.text)
+            elif following.text == "(":
+                # Destructuring: val (a, b) = ...
+                for inner in tokens[index + 2:]:
+                    if inner.text == ")":
+                        break
+                    if inner.kind == "ident":
+                        names.add(inner.text)
+        elif token.text == "->":
+            # Lambda parameters: { a, (b, c): Type -> ... }; not the branches of a when block
+            params: List[str] = []
+            for previous in reversed(tokens[:index]):
+                if previous.text == "{":
+                    names.update(params)
+                    break
+                if previous.kind == "ident":
+                    params.append(previous.text)
+                elif previous.text not in (",", ":", "(", ")", "<", ">", "?", "."):
+                    break
+    return names
+
+
+def _resolve_names(tokens: List[Token], visible: FrozenSet[str], check: ComposeCheck, imports: Set[str]) -> None:
+    declared = _declared(tokens)
+    unknown: Dict[str, int] = {}
+    for index, token in enumerate(tokens):
+        if token.kind != "ident":
+            continue
+        name = token.text
+        previous = tokens[index - 1].text if index else ""
+        after_dot = previous in (".", "?.", "::")
+        if after_dot:
+            if name in _EXTENSIONS and name not in visible:
+                imports.add(IMPORTABLE[name])
+            continue
+        if name == "Icons" and index + 4 < len(tokens) and tokens[index + 1].text == ".":
+            style, icon = tokens[index + 2].text, tokens[index + 4].text
+            if style in _ICON_STYLES and tokens[index + 3].text == ".":
+                if icon not in CORE_ICONS:
+                    unknown.setdefault(f"Icons.{style}.{icon}", token.line)
+                else:
+                    imports.add(f"androidx.compose.material.icons.{_ICON_STYLES[style]}.{icon}")
+        if name in visible or name in declared:
+            continue
+        if name in IMPORTABLE:
+            imports.add(IMPORTABLE[name])
+        elif name[0].isupper() and previous != "@":
+            # Locals, parameters and named arguments are lowercase; capitalized names are types or composables
+            unknown.setdefault(name, token.line)
+    for name, line in unknown.items():
+        check.errors.append(f"line {line}: unknown name {name} (not imported by MainActivity)")
+
+
+def validate_compose(source: str, template_path: Optional[str] = None) -> ComposeCheck:
+    visible, template_imports = template_scope(template_path)
+    check = ComposeCheck(source=(source or "").strip())
+    if not check.source:
+        check.errors.append("empty output")
+        return check
+
+    check.source, moved = _strip_header_lines(check.source, check)
+    imports: Set[str] = set()
+    for fqname in moved:
+        if not _importable(fqname, template_imports):
+            check.errors.append(f"import {fqname} is not available to the generated app")
+        elif not fqname.endswith(".*"):
+            imports.add(fqname)
+            visible = visible | {fqname.rsplit(".", 1)[-1]}
+    if check.errors:
+        return check
+
+    try:
+        tokens = tokenize(check.source)
+        unwrapped = _unwrap_composable(check.source, tokens, check)
+        if unwrapped is not None:
+            check.source = unwrapped
+            tokens = tokenize(check.source)
+    except ComposeSyntaxError as e:
+        check.errors.append(str(e))
+        return check
+
+    for index, token in enumerate(tokens):
+        previous = tokens[index - 1].text if index else ""
+        if token.text == "fun" and previous not in (".", "::"):
+            check.errors.append(f"line {token.line}: function declarations are not allowed in the screen body")
+            return check
+        if token.text == "Composable" and previous == "@":
+            check.errors.append(f"line {token.line}: @Composable declarations are not allowed in the screen body")
+            return check
+
+    repaired = _balance(check.source, tokens, check)
+    if check.errors:
+        return check
+    if repaired != check.source:
+        check.source = repaired
+        tokens = tokenize(repaired)
+
+    _resolve_names(tokens, visible, check, imports)
+    if not any(t.kind == "ident" and t.text[0].isupper() and i + 1 < len(tokens) and tokens[i + 1].text in ("(", "{")
+               for i, t in enumerate(tokens)):
+        check.errors.append("no composable call found")
+
+    check.imports = tuple(sorted(imports - template_imports))
+    if check.imports:
+        check.repairs.append(f"added import(s) {', '.join(check.imports)}")
+    return check
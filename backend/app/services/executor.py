@@ -0,0 +1,52 @@
+"""Thread pool for the blocking parts of a generation.
+
+Jinja rendering, deflate and file writes run here instead of on the event loop,
+so one slow archive does not stall every other request in the worker. The
+caller's context (the current trace span) is carried into the thread.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, Optional, TypeVar
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+
+T = TypeVar("T")
+
+GENERATOR_THREADS = int(os.getenv("GENERATOR_THREADS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_DONE = object()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=GENERATOR_THREADS, thread_name_prefix="generator")
+        return _executor
+
+
+async def run_blocking(fn: Callable[..., T], *args, **kwargs) -> T:
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
+
+
+async def iterate_blocking(iterator: Iterator[T]) -> AsyncIterator[T]:
+    # Each step of a synchronous generator runs in the pool, one at a time
+    while True:
+        item = await run_blocking(next, iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
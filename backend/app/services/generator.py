@@ -1,19 +1,80 @@
-from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import astuple, dataclass, replace
 from pathlib import Path
-from typing import Dict
+from typing import AsyncIterator, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import logging
+import os
 import tempfile
 import shutil
+import threading
+import time
 import zipfile
 
-from jinja2 import Environment, FileSystemLoader, StrictUndefined
+from jinja2 import Environment, Template
 
-from .llm import generate_compose_content_from_prompt
+from .archive import (
+    ARCHIVE_TAR_ZST,
+    Compression,
+    ZipEntry,
+    ZipStreamWriter,
+    build_tar_zst,
+    build_zip,
+    compress_entry,
+    compression_pool,
+    get_compression,
+)
+from .executor import iterate_blocking, run_blocking
+from .compose_validator import ComposeCheck, validate_compose
+from .llm import PLACEHOLDER_COMPOSE, ComposeResult, compose_retry_prompt, generate_compose_result
+from .metrics import ARCHIVE_BYTES, COMPOSE_CHECKS, STAGE_SECONDS, stage
+from .screens import NAV_SINGLE, ScreenSpec, kotlin_string, plan_screens
+from .singleflight import SingleFlight
+from .templates import get_jinja_env, template_variables
+
+logger = logging.getLogger(__name__)
+
+# Render through a temp directory instead of assembling the zip in memory (CI/debugging)
+RENDER_ON_DISK = os.getenv("GENERATOR_RENDER_ON_DISK", "0") == "1"
+
+
+def _default_compression(mode: str) -> Compression:
+    try:
+        return get_compression(mode)
+    except ValueError as e:
+        # A bad setting must not stop the app, the CLI or the daemon from importing this module
+        logger.warning("Ignoring GENERATOR_COMPRESSION: %s; using 'default'", e)
+        return get_compression("default")
 
-TEMPLATES_DIR = Path("backend/app/templates/android")
 
-SAFE_WIDGET_MARKERS = (
-    "Column(", "Row(", "Box(", "Text(", "Button(", "Scaffold(", "LazyColumn(", "LazyRow("
+# Compression mode used when callers do not pick one (see archive.COMPRESSION_MODES)
+DEFAULT_COMPRESSION = _default_compression(os.getenv("GENERATOR_COMPRESSION", "default"))
+
+_zip_flight = SingleFlight("project_zip")
+# The LLM part of a generation, shared by callers that each build their own archive
+_context_flight = SingleFlight("project_context")
+
+# Context keys filled from the LLM response; templates reading them are rendered per request
+DYNAMIC_KEYS = frozenset(
+    {"compose_content", "compose_inline", "compose_imports", "llm_provider", "screens", "screen", "navigation"}
 )
+ENTRY_CACHE_SIZE = int(os.getenv("GENERATOR_ENTRY_CACHE_SIZE", "512"))
+
+# (template name, level, store threshold, values of the keys it reads) -> (template, compressed entry)
+_entry_cache: "OrderedDict[Hashable, Tuple[object, ZipEntry]]" = OrderedDict()
+# Entries are built on executor threads, several generations at a time
+_entry_lock = threading.Lock()
+entry_cache_stats: Dict[str, int] = {"hits": 0, "misses": 0, "dynamic": 0}
+
+# Ask the provider once more when its output fails validation
+COMPOSE_RETRY = os.getenv("GENERATOR_COMPOSE_RETRY", "1") != "0"
+
+# Screens of one multi-screen project generated at the same time (the rate
+# limiter still paces them per provider key)
+SCREEN_CONCURRENCY = int(os.getenv("GENERATOR_SCREEN_CONCURRENCY", "4"))
+# Rendered once per planned screen, next to MainActivity.kt
+SCREEN_TEMPLATE = "app/src/main/java/Screen.kt.j2"
 
 @dataclass
 class AndroidProjectConfig:
@@ -25,59 +86,53 @@ class AndroidProjectConfig:
     prompt: str
 
 
-def _create_jinja_env() -> Environment:
-    env = Environment(
-        loader=FileSystemLoader(str(TEMPLATES_DIR)),
-        undefined=StrictUndefined,
-        trim_blocks=True,
-        lstrip_blocks=True,
-    )
-    return env
-
-
 def _package_to_path(package_name: str) -> str:
     return package_name.replace(".", "/")
 
 
-def _make_safe_inline_compose(raw: str) -> str:
-    content = (raw or "").strip()
-    if not content:
-        return "GeneratedPlaceholder()"
-    lowered = content.lower()
-    if "@composable" in lowered or "fun " in content:
-        return "GeneratedPlaceholder()"
-    if any(marker in content for marker in SAFE_WIDGET_MARKERS):
-        return content
-    return "GeneratedPlaceholder()"
-
+def _check_compose(result: ComposeResult) -> Tuple[str, Tuple[str, ...], ComposeCheck]:
+    # Source to inline and the imports it needs, or the placeholder when the
+    # output cannot compile even after the validator's repairs
+    check = validate_compose(result.content)
+    # An answer the stream guard aborted fails like one the validator rejects
+    check.errors.extend(result.rejected)
+    if check.ok:
+        return check.source, check.imports, check
+    return PLACEHOLDER_COMPOSE, (), check
 
-async def render_project(config: AndroidProjectConfig, output_dir: Path) -> None:
-    env = _create_jinja_env()
 
-    # Generate dynamic Compose content
-    compose_content = await generate_compose_content_from_prompt(config.prompt)
-    compose_inline = _make_safe_inline_compose(compose_content)
+async def _validated_compose(prompt: str) -> Tuple[ComposeResult, str, Tuple[str, ...]]:
+    with stage("llm"):
+        result = await generate_compose_result(prompt)
+    with stage("safety"):
+        inline, imports, check = _check_compose(result)
+    if not check.ok and COMPOSE_RETRY and result.provider != "fallback":
+        # One more provider call with the problems spelled out
+        logger.info("compose output rejected (%s), retrying once", "; ".join(check.errors[:3]))
+        with stage("llm"):
+            retry = await generate_compose_result(compose_retry_prompt(prompt, check.errors))
+        with stage("safety"):
+            retry_inline, retry_imports, retry_check = _check_compose(retry)
+        COMPOSE_CHECKS.inc(outcome="retry_ok" if retry_check.ok else "retry_rejected")
+        if retry_check.ok:
+            return retry, retry_inline, retry_imports
+    outcome = "rejected" if not check.ok else "repaired" if check.repairs else "ok"
+    COMPOSE_CHECKS.inc(outcome=outcome)
+    if not check.ok:
+        logger.warning("compose output rejected, using placeholder: %s", "; ".join(check.errors[:3]))
+    return result, inline, imports
 
-    common_ctx: Dict[str, object] = {
-        "app_name": config.app_name,
-        "package_name": config.package_name,
-        "package_dir": _package_to_path(config.package_name),
-        "description": config.description,
-        "min_sdk": config.min_sdk,
-        "target_sdk": config.target_sdk,
-        "compose_content": compose_content,
-        "compose_inline": compose_inline,
-    }
 
+def _project_files(package_dir: str) -> Dict[str, str]:
     # Map of template path -> output relative path
-    files = {
+    return {
         "root/settings.gradle.kts.j2": "settings.gradle.kts",
         "root/build.gradle.kts.j2": "build.gradle.kts",
         "root/gradle.properties.j2": "gradle.properties",
         "root/.gitignore.j2": ".gitignore",
         "app/build.gradle.kts.j2": "app/build.gradle.kts",
         "app/src/main/AndroidManifest.xml.j2": "app/src/main/AndroidManifest.xml",
-        "app/src/main/java/MainActivity.kt.j2": f"app/src/main/java/{common_ctx['package_dir']}/MainActivity.kt",
+        "app/src/main/java/MainActivity.kt.j2": f"app/src/main/java/{package_dir}/MainActivity.kt",
         "app/src/main/res/values/strings.xml.j2": "app/src/main/res/values/strings.xml",
         "app/src/main/res/values/themes.xml.j2": "app/src/main/res/values/themes.xml",
         "app/src/main/res/values/colors.xml.j2": "app/src/main/res/values/colors.xml",
@@ -88,14 +143,278 @@ async def render_project(config: AndroidProjectConfig, output_dir: Path) -> None
         "app/src/main/res/drawable/ic_launcher_foreground.xml.j2": "app/src/main/res/drawable/ic_launcher_foreground.xml",
     }
 
-    for template_name, out_rel in files.items():
+
+async def _generate_screens(screens: Tuple[ScreenSpec, ...]) -> List[Dict[str, object]]:
+    # One LLM call per screen, SCREEN_CONCURRENCY at a time: the project waits
+    # for its slowest screen rather than for the sum of them. Each screen's prompt
+    # is cached on its own, so screens the edit did not touch come from the cache.
+    limit = asyncio.Semaphore(max(1, SCREEN_CONCURRENCY))
+
+    async def generate(spec: ScreenSpec) -> Dict[str, object]:
+        async with limit:
+            result, inline, imports = await _validated_compose(spec.prompt)
+        return {
+            "name": spec.name,
+            "function": spec.function,
+            "title": kotlin_string(spec.title),
+            "icon": spec.icon,
+            "content": result.content,
+            "inline": inline,
+            "imports": imports,
+            "provider": result.provider,
+        }
+
+    return list(await asyncio.gather(*(generate(spec) for spec in screens)))
+
+
+async def build_project_context(config: AndroidProjectConfig) -> Dict[str, object]:
+    ctx: Dict[str, object] = {
+        "app_name": config.app_name,
+        "package_name": config.package_name,
+        "package_dir": _package_to_path(config.package_name),
+        "description": config.description,
+        "min_sdk": config.min_sdk,
+        "target_sdk": config.target_sdk,
+    }
+    plan = plan_screens(config.prompt)
+    if not plan.multi:
+        # Generate dynamic Compose content
+        result, compose_inline, compose_imports = await _validated_compose(config.prompt)
+        ctx.update(
+            compose_content=result.content,
+            compose_inline=compose_inline,
+            compose_imports=compose_imports,
+            llm_provider=result.provider,
+            screens=(),
+            navigation=NAV_SINGLE,
+        )
+        return ctx
+
+    screens = await _generate_screens(plan.screens)
+    icons = sorted({str(screen["icon"]) for screen in screens})
+    ctx.update(
+        compose_content="\n\n".join(str(screen["content"]) for screen in screens),
+        compose_inline="",
+        # MainActivity only hosts the navigation; the screens import what they use
+        compose_imports=(
+            "androidx.compose.material.icons.Icons",
+            *(f"androidx.compose.material.icons.filled.{icon}" for icon in icons),
+        ),
+        llm_provider=",".join(dict.fromkeys(str(screen["provider"]) for screen in screens)),
+        screens=tuple(screens),
+        navigation=plan.navigation,
+    )
+    return ctx
+
+
+def project_outputs(ctx: Dict[str, object]) -> Iterator[Tuple[str, str, Dict[str, object]]]:
+    """``(template, output path, render context)`` for every file of the project in ``ctx``.
+
+    The fixed project files come first, then one Kotlin file per planned screen.
+    Only ``package_dir`` and ``screens`` are read to build the list.
+    """
+    package_dir = str(ctx["package_dir"])
+    for template_name, out_rel in _project_files(package_dir).items():
+        yield template_name, out_rel, ctx
+    for screen in ctx.get("screens") or ():
+        yield SCREEN_TEMPLATE, f"app/src/main/java/{package_dir}/{screen['function']}.kt", {**ctx, "screen": screen}
+
+
+def _render_files(env: Environment, ctx: Dict[str, object]) -> Iterator[Tuple[str, str]]:
+    for template_name, out_rel, file_ctx in project_outputs(ctx):
+        template = env.get_template(template_name)
+        yield out_rel, template.render(**file_ctx)
+
+
+def render_project_files(ctx: Dict[str, object]) -> Dict[str, bytes]:
+    """Rendered content of every project file, keyed by its path in the archive."""
+    return {out_rel: content.encode("utf-8") for out_rel, content in _render_files(get_jinja_env(), ctx)}
+
+
+def _render(template: Template, ctx: Dict[str, object], timings: List[float]) -> bytes:
+    started = time.perf_counter()
+    payload = template.render(**ctx).encode("utf-8")
+    timings[0] += time.perf_counter() - started
+    return payload
+
+
+def _remember(key: Optional[Hashable], template: Template, entry: ZipEntry) -> None:
+    if key is None:
+        return
+    with _entry_lock:
+        _entry_cache[key] = (template, entry)
+        while len(_entry_cache) > ENTRY_CACHE_SIZE:
+            _entry_cache.popitem(last=False)
+
+
+def _entry_plan(
+    env: Environment, ctx: Dict[str, object], use_cache: bool, compression: Compression
+) -> Iterator[Tuple[str, Optional[ZipEntry], Template, Optional[Hashable], Dict[str, object]]]:
+    # (output path, prebuilt entry or None, template, key to keep the built entry under, render context)
+    for template_name, out_rel, file_ctx in project_outputs(ctx):
         template = env.get_template(template_name)
+        names = template_variables(env, template_name) if use_cache else None
+        if names is None or names & DYNAMIC_KEYS:
+            entry_cache_stats["dynamic"] += 1 if use_cache else 0
+            yield out_rel, None, template, None, file_ctx
+            continue
+
+        key = (template_name, compression.level, compression.store_below, tuple((name, ctx[name]) for name in sorted(names)))
+        with _entry_lock:
+            cached = _entry_cache.get(key)
+            if cached is not None and cached[0] is template:
+                entry_cache_stats["hits"] += 1
+                _entry_cache.move_to_end(key)
+        if cached is not None and cached[0] is template:
+            yield out_rel, cached[1], template, None, file_ctx
+        else:
+            entry_cache_stats["misses"] += 1
+            yield out_rel, None, template, key, file_ctx
+
+
+def _project_entries(
+    env: Environment, ctx: Dict[str, object], use_cache: bool = True, compression: Optional[Compression] = None
+) -> Iterator[ZipEntry]:
+    # Templates that only read config values (or nothing at all) are rendered and
+    # deflated once per distinct input and then copied into every archive; only
+    # templates reading the LLM output are rendered for each request.
+    compression = compression or DEFAULT_COMPRESSION
+    date_time = time.localtime()[:6]
+    plan = _entry_plan(env, ctx, use_cache, compression)
+    # Render and compress alternate per file; their totals are recorded per archive
+    timings = [0.0, 0.0]
+    try:
+        if compression.workers > 1:
+            entries: Iterable[ZipEntry] = _parallel_entries(plan, compression, date_time, timings)
+        else:
+            entries = _inline_entries(plan, compression, date_time, timings)
+        for out_rel, entry in entries:
+            yield entry if entry.name == out_rel else replace(entry, name=out_rel)
+    finally:
+        STAGE_SECONDS.observe(timings[0], stage="render")
+        STAGE_SECONDS.observe(timings[1], stage="compress")
+
+
+def _inline_entries(plan, compression: Compression, date_time, timings: List[float]) -> Iterator[Tuple[str, ZipEntry]]:
+    for out_rel, entry, template, key, file_ctx in plan:
+        if entry is None:
+            payload = _render(template, file_ctx, timings)
+            started = time.perf_counter()
+            entry = compress_entry(out_rel, payload, compression.level, date_time, compression.store_below)
+            timings[1] += time.perf_counter() - started
+            _remember(key, template, entry)
+        yield out_rel, entry
+
+
+def _parallel_entries(plan, compression: Compression, date_time, timings: List[float]) -> Iterator[Tuple[str, ZipEntry]]:
+    # Rendering holds the GIL but deflate does not: entries compress on the pool
+    # while the following templates render. All entries are built before the
+    # first one is returned, so this trades the one-entry memory bound for CPU.
+    pool = compression_pool(compression.workers)
+    pending = []
+    for out_rel, entry, template, key, file_ctx in plan:
+        if entry is None:
+            payload = _render(template, file_ctx, timings)
+            entry = pool.submit(compress_entry, out_rel, payload, compression.level, date_time, compression.store_below)
+        pending.append((out_rel, entry, template, key))
+    started = time.perf_counter()
+    built = []
+    for out_rel, entry, template, key in pending:
+        if isinstance(entry, Future):
+            entry = entry.result()
+            _remember(key, template, entry)
+        built.append((out_rel, entry))
+    timings[1] += time.perf_counter() - started
+    return iter(built)
+
+
+def warm_entry_cache() -> int:
+    """Prebuild the entries of templates that do not read the context at all."""
+    env = get_jinja_env()
+    level, store_below = DEFAULT_COMPRESSION.level, DEFAULT_COMPRESSION.store_below
+    count = 0
+    for template_name, out_rel in _project_files("").items():
+        if template_variables(env, template_name) != frozenset():
+            continue
+        template = env.get_template(template_name)
+        key = (template_name, level, store_below, ())
+        with _entry_lock:
+            cached = _entry_cache.get(key)
+        if cached is None or cached[0] is not template:
+            payload = template.render().encode("utf-8")
+            _remember(key, template, compress_entry(out_rel, payload, level, store_below=store_below))
+        count += 1
+    return count
+
+
+def zip_project(ctx: Dict[str, object], use_cache: bool = True, compression: Optional[Compression] = None) -> bytes:
+    data = build_zip(_project_entries(get_jinja_env(), ctx, use_cache, compression))
+    ARCHIVE_BYTES.observe(len(data))
+    return data
+
+
+def tar_zst_project(ctx: Dict[str, object], compression: Compression) -> bytes:
+    timings = [0.0]
+    env = get_jinja_env()
+    files = [
+        (out_rel, _render(env.get_template(name), file_ctx, timings))
+        for name, out_rel, file_ctx in project_outputs(ctx)
+    ]
+    STAGE_SECONDS.observe(timings[0], stage="render")
+    with stage("compress"):
+        data = build_tar_zst(files, compression.level, compression.workers)
+    ARCHIVE_BYTES.observe(len(data))
+    return data
+
+
+def archive_project(ctx: Dict[str, object], compression: Optional[Compression] = None) -> bytes:
+    compression = compression or DEFAULT_COMPRESSION
+    if compression.format == ARCHIVE_TAR_ZST:
+        return tar_zst_project(ctx, compression)
+    return zip_project(ctx, compression=compression)
+
+
+async def iter_project_zip(ctx: Dict[str, object], compression: Optional[Compression] = None) -> AsyncIterator[bytes]:
+    # One chunk per file: each template is rendered and compressed only when the
+    # previous chunk has been consumed, so at most one entry is held in memory.
+    writer = ZipStreamWriter()
+    size = 0
+    entries = _project_entries(get_jinja_env(), ctx, compression=compression)
+    async for entry in iterate_blocking(entries):
+        chunk = writer.add(entry)
+        size += len(chunk)
+        yield chunk
+    chunk = writer.close()
+    ARCHIVE_BYTES.observe(size + len(chunk))
+    yield chunk
+
+
+async def iter_project_archive(ctx: Dict[str, object], compression: Optional[Compression] = None) -> AsyncIterator[bytes]:
+    compression = compression or DEFAULT_COMPRESSION
+    if compression.format == ARCHIVE_TAR_ZST:
+        # zstd frames are written in one piece
+        yield await run_blocking(tar_zst_project, ctx, compression)
+        return
+    async for chunk in iter_project_zip(ctx, compression):
+        yield chunk
+
+
+async def render_project(config: AndroidProjectConfig, output_dir: Path) -> None:
+    env = get_jinja_env()
+    ctx = await build_project_context(config)
+
+    with stage("disk_write"):
+        await run_blocking(_write_files, env, ctx, output_dir)
+
+
+def _write_files(env: Environment, ctx: Dict[str, object], output_dir: Path) -> None:
+    for out_rel, content in _render_files(env, ctx):
         out_path = output_dir / out_rel
         out_path.parent.mkdir(parents=True, exist_ok=True)
-        out_path.write_text(template.render(**common_ctx), encoding="utf-8")
+        out_path.write_text(content, encoding="utf-8")
 
 
-async def generate_android_project_zip(config: AndroidProjectConfig) -> bytes:
+async def _generate_zip_on_disk(config: AndroidProjectConfig) -> bytes:
     tmp_root = Path(tempfile.mkdtemp(prefix="android_gen_"))
     project_dir = tmp_root / config.app_name
     project_dir.mkdir(parents=True, exist_ok=True)
@@ -103,10 +422,56 @@ async def generate_android_project_zip(config: AndroidProjectConfig) -> bytes:
     try:
         await render_project(config, project_dir)
         zip_path = tmp_root / f"{config.app_name}.zip"
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-            for file in project_dir.rglob("*"):
-                zf.write(file, arcname=str(file.relative_to(project_dir)))
-        data = zip_path.read_bytes()
+        with stage("compress"):
+            data = await run_blocking(_zip_directory, project_dir, zip_path)
+        ARCHIVE_BYTES.observe(len(data))
         return data
     finally:
-        shutil.rmtree(tmp_root, ignore_errors=True)
\ No newline at end of file
+        shutil.rmtree(tmp_root, ignore_errors=True)
+
+
+def _zip_directory(project_dir: Path, zip_path: Path) -> bytes:
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for file in project_dir.rglob("*"):
+            zf.write(file, arcname=str(file.relative_to(project_dir)))
+    return zip_path.read_bytes()
+
+
+async def generate_android_project_zip(
+    config: AndroidProjectConfig, on_disk: Optional[bool] = None, compression: Optional[Compression] = None
+) -> bytes:
+    """Generate the project archive; ``compression`` picks the mode (a tar.zst for ``ARCHIVE_TAR_ZST``)."""
+    if on_disk is None:
+        on_disk = RENDER_ON_DISK
+    compression = compression or DEFAULT_COMPRESSION
+    # The temp-directory path only writes default zips
+    on_disk = on_disk and compression == DEFAULT_COMPRESSION and compression.format != ARCHIVE_TAR_ZST
+    # Concurrent requests for the same project share one generation
+    return await _zip_flight.do(
+        (astuple(config), on_disk, compression),
+        lambda: _generate_android_project_zip(config, on_disk, compression),
+    )
+
+
+async def shared_project_context(config: AndroidProjectConfig) -> Dict[str, object]:
+    """``build_project_context`` shared with identical generations already in flight.
+
+    Callers render their own archive from the returned context, so the bytes they
+    send always match its ``llm_provider``. The context must not be modified.
+    """
+    return await _context_flight.do(astuple(config), lambda: build_project_context(config))
+
+
+async def _generate_android_project_zip(config: AndroidProjectConfig, on_disk: bool, compression: Compression) -> bytes:
+    if on_disk:
+        return await _generate_zip_on_disk(config)
+
+    ctx = await shared_project_context(config)
+    # Rendering and deflate are CPU work; keep them off the event loop
+    return await run_blocking(archive_project, ctx, compression)
+
+
+async def stream_android_project_zip(config: AndroidProjectConfig, compression: Optional[Compression] = None) -> AsyncIterator[bytes]:
+    ctx = await shared_project_context(config)
+    async for chunk in iter_project_archive(ctx, compression):
+        yield chunk
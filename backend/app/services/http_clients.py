@@ -0,0 +1,129 @@
+"""Shared, long-lived HTTP clients for the LLM providers.
+
+Connection pools are reused across requests so each generation does not pay for
+DNS, TCP and TLS setup again. Async clients are bound to the event loop that
+created them; a new loop (e.g. a fresh ``asyncio.run``) gets its own client and
+the previous one is closed. The FastAPI app closes the clients on shutdown, the
+CLI and the Space's ``generate_zip`` when their call ends.
+"""
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+import socket
+
+import httpx
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2", "1") != "0"
+
+logger = logging.getLogger(__name__)
+
+_async_client: Optional[Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = None
+_openai_clients: Dict[Tuple[int, str], object] = {}
+_sync_client: Optional[httpx.Client] = None
+
+
+def _http2() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401  (optional: pip install httpx[http2])
+    except ImportError:
+        return False
+    return True
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _shutdown_sockets(client: httpx.AsyncClient) -> int:
+    # aclose() needs the loop the connections were opened on. Without it, shut the
+    # pooled sockets down directly: the servers see them close, and the file
+    # descriptors are released when that loop's transports are garbage collected.
+    count = 0
+    for transport in (client._transport, *client._mounts.values()):
+        pool = getattr(transport, "_pool", None)
+        for connection in getattr(pool, "connections", ()):
+            stream = getattr(getattr(connection, "_connection", None), "_network_stream", None)
+            sock = stream.get_extra_info("socket") if stream is not None else None
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+                count += 1
+            except OSError:
+                pass
+    return count
+
+
+def _retire(loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> None:
+    # Connections belong to the loop that opened them: close the client there if
+    # that loop is still running, otherwise close its sockets from here
+    if client.is_closed:
+        return
+    if loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    else:
+        count = _shutdown_sockets(client)
+        logger.info("Closed %d connection(s) of an HTTP client whose event loop has stopped", count)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client[0] is not loop or _async_client[1].is_closed:
+        if _async_client is not None and _async_client[0] is not loop:
+            _retire(*_async_client)
+        client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=_limits(), http2=_http2())
+        _async_client = (loop, client)
+        _openai_clients.clear()
+    return _async_client[1]
+
+
+def get_openai_client(api_key: str):
+    from openai import AsyncOpenAI
+
+    http_client = get_async_client()
+    key = (id(http_client), api_key)
+    client = _openai_clients.get(key)
+    if client is None:
+        # Retries are left to services.ratelimit, which also honours Retry-After
+        client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+        _openai_clients[key] = client
+    return client
+
+
+def get_sync_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(timeout=HTTP_TIMEOUT, limits=_limits(), http2=_http2())
+    return _sync_client
+
+
+async def aclose_clients() -> None:
+    global _async_client
+    if _async_client is not None:
+        loop, client = _async_client
+        _async_client = None
+        _openai_clients.clear()
+        if loop is asyncio.get_running_loop():
+            await client.aclose()
+        else:
+            _retire(loop, client)
+    close_sync_client()
+
+
+def close_sync_client() -> None:
+    global _sync_client
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
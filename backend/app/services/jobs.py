@@ -0,0 +1,330 @@
+"""Background generation jobs.
+
+``POST /jobs`` hands a project config to a pool of workers and returns at once.
+Jobs are keyed by a hash of the request, so resubmitting the same config while a
+job is queued, running or finished returns the existing job instead of doing the
+work again. Finished archives are kept in a result store until their TTL expires.
+
+With ``JOB_RESULT_DIR`` set, every job also leaves a JSON snapshot next to its
+archive, so all uvicorn workers sharing the directory can report and serve jobs
+that another worker ran.
+"""
+from dataclasses import asdict, dataclass, field
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import time
+
+from .admission import QueueFullError
+from .generator import AndroidProjectConfig, generate_android_project_zip
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "256"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+JOB_RESULT_DIR = os.getenv("JOB_RESULT_DIR", "")
+# How often JOB_RESULT_DIR is swept for expired files (every worker sweeps all of them)
+JOB_RESULT_SWEEP = float(os.getenv("JOB_RESULT_SWEEP", "60"))
+# How often a worker re-reads the snapshot of a job running in another process
+JOB_REMOTE_POLL = float(os.getenv("JOB_REMOTE_POLL", "1"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def request_hash(config: AndroidProjectConfig) -> str:
+    payload = json.dumps(asdict(config), sort_keys=True, ensure_ascii=False)
+    return sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class Job:
+    id: str
+    config: AndroidProjectConfig
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    size: Optional[int] = None
+    version: int = 0
+    remote: bool = False
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def update(self, status: str, **fields) -> None:
+        self.status = status
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_changed(self, version: int, timeout: float) -> bool:
+        if self.version != version:
+            return True
+        if self.remote:
+            # Updates happen in another process; callers re-read the snapshot
+            await asyncio.sleep(min(timeout, JOB_REMOTE_POLL))
+            return False
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "app_name": self.config.app_name,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "size": self.size,
+        }
+
+    def snapshot(self) -> Dict[str, object]:
+        return {**self.as_dict(), "config": asdict(self.config), "version": self.version}
+
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, object]) -> "Job":
+        fields = {k: data[k] for k in ("id", "status", "created_at", "started_at", "finished_at", "error", "size", "version")}
+        return cls(config=AndroidProjectConfig(**data["config"]), remote=True, **fields)
+
+
+class ResultStore:
+    def __init__(
+        self, ttl: float = JOB_RESULT_TTL, directory: str = JOB_RESULT_DIR, sweep_interval: float = JOB_RESULT_SWEEP
+    ) -> None:
+        self.ttl = ttl
+        self.directory = Path(directory) if directory else None
+        self.sweep_interval = sweep_interval
+        self._memory: Dict[str, bytes] = {}
+        self._expires: Dict[str, float] = {}
+        self._next_sweep = 0.0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def put(self, key: str, data: bytes) -> None:
+        if self.directory is not None:
+            tmp = self.directory / f"{key}.zip.{os.getpid()}.tmp"
+            tmp.write_bytes(data)
+            tmp.replace(self.directory / f"{key}.zip")
+        else:
+            self._memory[key] = data
+        self._expires[key] = time.time() + self.ttl
+
+    def _expires_at(self, key: str) -> float:
+        if key in self._expires or self.directory is None:
+            return self._expires.get(key, 0)
+        # Written by another worker: the file age stands in for the TTL
+        try:
+            return (self.directory / f"{key}.zip").stat().st_mtime + self.ttl
+        except FileNotFoundError:
+            return 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self._expires_at(key) < time.time():
+            self.delete(key)
+            return None
+        if self.directory is not None:
+            path = self.directory / f"{key}.zip"
+            try:
+                return path.read_bytes()
+            except FileNotFoundError:
+                return None
+        return self._memory.get(key)
+
+    def delete(self, key: str) -> None:
+        self._expires.pop(key, None)
+        self._memory.pop(key, None)
+        if self.directory is not None:
+            (self.directory / f"{key}.zip").unlink(missing_ok=True)
+            (self.directory / f"{key}.job.json").unlink(missing_ok=True)
+
+    def put_snapshot(self, key: str, snapshot: Dict[str, object]) -> None:
+        if self.directory is None:
+            return
+        tmp = self.directory / f"{key}.job.json.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(snapshot), encoding="utf-8")
+        tmp.replace(self.directory / f"{key}.job.json")
+
+    def get_snapshot(self, key: str) -> Optional[Dict[str, object]]:
+        if self.directory is None:
+            return None
+        path = self.directory / f"{key}.job.json"
+        try:
+            if path.stat().st_mtime + self.ttl < time.time():
+                return None
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def expired(self) -> List[str]:
+        now = time.time()
+        keys = {key for key, expires_at in self._expires.items() if expires_at < now}
+        if self.directory is not None and now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            keys.update(self._expired_files(now))
+        return sorted(keys)
+
+    def _expired_files(self, now: float) -> List[str]:
+        # Keys whose newest file is past the TTL, whichever worker wrote them
+        newest: Dict[str, float] = {}
+        for path in self.directory.iterdir():
+            if path.name.endswith(".tmp"):
+                # Still being written (or left by a crashed worker)
+                continue
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                # Deleted by another worker's sweep
+                continue
+            key = path.name.split(".", 1)[0]
+            newest[key] = max(newest.get(key, 0.0), mtime)
+        return [key for key, mtime in newest.items() if mtime + self.ttl < now]
+
+
+class JobManager:
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING, store: Optional[ResultStore] = None) -> None:
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.store = store or ResultStore()
+        self.jobs: Dict[str, Job] = {}
+        self.submitted = 0
+        self.reused = 0
+        self.draining = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_workers(self) -> asyncio.Queue:
+        # Started lazily so the manager also works without the app lifespan (CLI, tests)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._queue is None:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+            for job in self.jobs.values():
+                if not job.finished:
+                    job.update(QUEUED)
+                    self._queue.put_nowait(job)
+        return self._queue
+
+    def _purge(self) -> None:
+        for key in self.store.expired():
+            job = self.jobs.get(key)
+            if job is not None and not job.finished:
+                continue
+            self.store.delete(key)
+            if job is not None:
+                del self.jobs[key]
+        now = time.time()
+        for key in [k for k, job in self.jobs.items() if job.status == FAILED and job.finished_at and job.finished_at + self.store.ttl < now]:
+            del self.jobs[key]
+
+    def submit(self, config: AndroidProjectConfig) -> Job:
+        queue = self._ensure_workers()
+        self._purge()
+        key = request_hash(config)
+        job = self.jobs.get(key) or self._remote(key)
+        if job is not None and job.status != FAILED and (not job.finished or self.store.get(key) is not None):
+            self.reused += 1
+            return job
+        if self.draining:
+            raise QueueFullError("jobs", retry_after=1, per_client=False)
+        if queue.qsize() >= self.max_pending:
+            raise QueueFullError("jobs", retry_after=max(1, queue.qsize() // self.workers), per_client=False)
+        job = Job(id=key, config=config)
+        self.jobs[key] = job
+        self.submitted += 1
+        self._persist(job)
+        queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        return self.jobs.get(job_id) or self._remote(job_id)
+
+    def _remote(self, job_id: str) -> Optional[Job]:
+        # A job submitted to another worker process; a fresh copy on every call
+        snapshot = self.store.get_snapshot(job_id)
+        return Job.from_snapshot(snapshot) if snapshot is not None else None
+
+    def _persist(self, job: Job) -> None:
+        try:
+            self.store.put_snapshot(job.id, job.snapshot())
+        except OSError:
+            logger.warning("Could not write snapshot for job %s", job.id, exc_info=True)
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        return self.store.get(job_id)
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            job = await queue.get()
+            try:
+                job.update(RUNNING, started_at=time.time())
+                self._persist(job)
+                data = await generate_android_project_zip(job.config)
+                self.store.put(job.id, data)
+                job.update(DONE, finished_at=time.time(), size=len(data))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Job %s failed", job.id)
+                job.update(FAILED, finished_at=time.time(), error=str(e) or type(e).__name__)
+            finally:
+                if job.finished:
+                    self._persist(job)
+                queue.task_done()
+
+    async def drain(self, timeout: float) -> bool:
+        """Refuse new jobs and wait up to ``timeout`` for queued and running ones."""
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while any(not job.finished for job in self.jobs.values()):
+            if time.monotonic() >= deadline or not self._tasks:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, int]:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return {"submitted": self.submitted, "reused": self.reused, **counts}
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        _manager = JobManager()
+    return _manager
+
+
+def set_job_manager(manager: Optional[JobManager]) -> None:
+    global _manager
+    _manager = manager
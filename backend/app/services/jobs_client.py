@@ -0,0 +1,45 @@
+"""Client for the ``/jobs`` API, used by the CLI and the Space to submit to a shared server."""
+from dataclasses import asdict
+from typing import Dict
+import asyncio
+import os
+import time
+
+from .generator import AndroidProjectConfig
+from .http_clients import get_async_client
+
+GENERATOR_API_URL = os.getenv("GENERATOR_API_URL", "")
+
+
+class JobFailed(Exception):
+    pass
+
+
+async def submit_job(base_url: str, config: AndroidProjectConfig) -> Dict[str, object]:
+    r = await get_async_client().post(f"{base_url.rstrip('/')}/jobs", data=asdict(config))
+    r.raise_for_status()
+    return r.json()
+
+
+async def generate_via_jobs(
+    base_url: str,
+    config: AndroidProjectConfig,
+    poll_interval: float = 1.0,
+    timeout: float = 600.0,
+) -> bytes:
+    base_url = base_url.rstrip("/")
+    client = get_async_client()
+    job = await submit_job(base_url, config)
+    deadline = time.monotonic() + timeout
+    while job["status"] not in ("done", "failed"):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"job {job['id']} did not finish within {timeout:.0f}s")
+        await asyncio.sleep(poll_interval)
+        r = await client.get(f"{base_url}/jobs/{job['id']}")
+        r.raise_for_status()
+        job = r.json()
+    if job["status"] == "failed":
+        raise JobFailed(f"job {job['id']} failed: {job.get('error')}")
+    r = await client.get(f"{base_url}/jobs/{job['id']}/result")
+    r.raise_for_status()
+    return r.content
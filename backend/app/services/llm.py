@@ -1,13 +1,40 @@
 import os
-from typing import Optional
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import Awaitable, Callable, Dict, List, Tuple
+import asyncio
+import logging
+import random
 import re
 import json
 
-import httpx
+from .compose_validator import validate_compose
+from .executor import run_blocking
+from .llm_cache import LLM_CACHE_ENABLED, get_llm_cache, make_cache_key
+from .metrics import LLM_FALLBACKS, LLM_REQUESTS, stage
+from .ratelimit import get_rate_limiter
+from .llm_stream import ComposeStreamGuard, StreamStats, UnusableOutputError
+from .routing import AllProvidersFailed, LLMRouter
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "auto").lower()
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+LLM_TEMPERATURE = 0.3
+LLM_STREAM = os.getenv("LLM_STREAM", "1") != "0"
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "2048"))
+LLM_MAX_OUTPUT_BYTES = int(os.getenv("LLM_MAX_OUTPUT_BYTES", "16384"))
+
+# What the generator shows when the model output cannot be used
+PLACEHOLDER_COMPOSE = "GeneratedPlaceholder()"
+
+_compose_flight = SingleFlight("compose_content")
+_router = LLMRouter()
 
 SYSTEM_PROMPT = (
     "You are an expert Android developer using Jetpack Compose. "
@@ -24,6 +51,15 @@ FALLBACK_TEMPLATE = (
 )
 
 
+def compose_retry_prompt(prompt: str, errors: List[str]) -> str:
+    problems = "\n".join(f"- {error}" for error in errors[:5])
+    return (
+        f"{prompt}\n\nA previous answer for this request was rejected before compiling:\n{problems}\n"
+        "Return only the body of setContent using Compose Material3 and foundation APIs, "
+        "with balanced brackets and no imports or function declarations."
+    )
+
+
 def _strip_code_fences(text: str) -> str:
     if "```" in text:
         # Remove markdown fences and optional language tag
@@ -32,26 +68,67 @@ def _strip_code_fences(text: str) -> str:
     return text.strip()
 
 
+# Provider clients (httpx, the OpenAI SDK) are imported on first use so that
+# fallback and fake-provider runs never load them
+
 async def _call_openai(prompt: str) -> str:
-    from openai import AsyncOpenAI
-
-    client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-    resp = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.3,
+    from .http_clients import get_openai_client
+
+    client = get_openai_client(OPENAI_API_KEY)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+    guard = ComposeStreamGuard(LLM_MAX_OUTPUT_BYTES)
+    if not LLM_STREAM:
+        resp = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_OUTPUT_TOKENS,
+        )
+        guard.feed(resp.choices[0].message.content or "")
+        return guard.result()
+
+    stats = StreamStats("openai")
+    stream = await client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=messages,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=LLM_MAX_OUTPUT_TOKENS,
+        stream=True,
+        stream_options={"include_usage": True},
     )
-    content = resp.choices[0].message.content or ""
-    return _strip_code_fences(content)
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                stats.output_tokens = chunk.usage.completion_tokens
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                stats.on_chunk(text)
+                guard.feed(text)
+        return guard.result()
+    except UnusableOutputError as e:
+        stats.aborted = type(e).__name__
+        raise
+    finally:
+        await stream.close()
+        stats.finish()
+
+
+def _gemini_text(event: dict) -> str:
+    # Expected: candidates[0].content.parts[*].text
+    candidates = event.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = ((candidates[0].get("content") or {}).get("parts") or [])
+    return "".join(part.get("text", "") for part in parts)
 
 
 async def _call_gemini(prompt: str) -> str:
+    from .http_clients import get_async_client
+
     # Gemini 2.5 Flash via Google Generative Language API v1beta
-    model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={GEMINI_API_KEY}"
     payload = {
         "contents": [
             {
@@ -61,38 +138,220 @@ async def _call_gemini(prompt: str) -> str:
                 ],
             }
         ],
-        "generationConfig": {"temperature": 0.3},
+        "generationConfig": {"temperature": LLM_TEMPERATURE, "maxOutputTokens": LLM_MAX_OUTPUT_TOKENS},
     }
-    async with httpx.AsyncClient(timeout=60) as client:
+    client = get_async_client()
+    guard = ComposeStreamGuard(LLM_MAX_OUTPUT_BYTES)
+    if not LLM_STREAM:
+        url = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
         r = await client.post(url, json=payload)
         r.raise_for_status()
-        data = r.json()
-        # Expected: candidates[0].content.parts[0].text
-        candidates = data.get("candidates") or []
-        if candidates:
-            parts = ((candidates[0].get("content") or {}).get("parts") or [])
-            if parts and "text" in parts[0]:
-                return _strip_code_fences(parts[0]["text"])
-        # Fallback to empty
-        return ""
+        guard.feed(_gemini_text(r.json()))
+        return guard.result()
+
+    url = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+    stats = StreamStats("gemini")
+    try:
+        async with client.stream("POST", url, json=payload) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                usage = event.get("usageMetadata") or {}
+                if "candidatesTokenCount" in usage:
+                    stats.output_tokens = usage["candidatesTokenCount"]
+                text = _gemini_text(event)
+                if text:
+                    stats.on_chunk(text)
+                    guard.feed(text)
+        return guard.result()
+    except UnusableOutputError as e:
+        # Leaving the stream context closes the connection and stops generation
+        stats.aborted = type(e).__name__
+        raise
+    finally:
+        stats.finish()
+
+
+@dataclass(frozen=True)
+class FakeProviderSettings:
+    """Offline provider for benchmarks and tests (``LLM_PROVIDER=fake``).
+
+    Latency, jitter and failures are drawn from a generator seeded with the
+    prompt, so a given prompt always behaves the same way.
+    """
+
+    latency: float = 0.05
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    output_bytes: int = 600
+    chunks: int = 8
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeProviderSettings":
+        return cls(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.05")),
+            jitter=float(os.getenv("FAKE_LLM_JITTER", "0")),
+            failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", "0")),
+            output_bytes=int(os.getenv("FAKE_LLM_OUTPUT_BYTES", "600")),
+            chunks=max(1, int(os.getenv("FAKE_LLM_CHUNKS", "8"))),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+        )
+
+
+FAKE_PROVIDER = FakeProviderSettings.from_env()
+
 
+class FakeProviderError(RuntimeError):
+    pass
 
-async def generate_compose_content_from_prompt(prompt: str) -> str:
-    # Provider selection
-    provider = LLM_PROVIDER
-    if provider == "auto":
-        provider = "gemini" if GEMINI_API_KEY else ("openai" if OPENAI_API_KEY else "fallback")
 
+def _fake_compose(prompt: str, size: int) -> str:
+    lines = ["Column(modifier = Modifier.fillMaxSize().padding(16.dp), verticalArrangement = Arrangement.spacedBy(8.dp)) {"]
+    title = re.sub(r"[^\w ]", "", prompt[:40])
+    lines.append(f"  Text(\"{title}\", style = MaterialTheme.typography.headlineSmall)")
+    used = sum(len(line) + 1 for line in lines) + 1
+    i = 0
+    while used < size:
+        line = f'  Text("Item {i}", style = MaterialTheme.typography.bodyMedium)'
+        lines.append(line)
+        used += len(line) + 1
+        i += 1
+    lines.append("}")
+    return "\n".join(lines)
+
+
+async def _call_fake(prompt: str) -> str:
+    settings = FAKE_PROVIDER
+    rng = random.Random(sha256(f"{settings.seed}:{prompt}".encode("utf-8")).digest())
+    delay = max(0.0, settings.latency + rng.uniform(-settings.jitter, settings.jitter))
+    failed = rng.random() < settings.failure_rate
+    text = _fake_compose(prompt, settings.output_bytes)
+
+    # Time to first byte, then the rest spread over the chunks like a streamed answer
+    await asyncio.sleep(delay * 0.3)
+    if failed:
+        raise FakeProviderError("fake provider failure")
+    guard = ComposeStreamGuard(LLM_MAX_OUTPUT_BYTES)
+    stats = StreamStats("fake")
+    step = -(-len(text) // settings.chunks)
     try:
-        if provider == "gemini" and GEMINI_API_KEY:
-            content = await _call_gemini(prompt)
-            if content:
-                return content
-        if provider == "openai" and OPENAI_API_KEY:
-            return await _call_openai(prompt)
-    except Exception:
-        pass
+        for start in range(0, len(text), step):
+            await asyncio.sleep(delay * 0.7 / settings.chunks)
+            chunk = text[start:start + step]
+            stats.on_chunk(chunk)
+            guard.feed(chunk)
+        stats.output_tokens = len(text) // 4
+        return guard.result()
+    finally:
+        stats.finish()
+
+
+@dataclass
+class ComposeResult:
+    content: str
+    # Provider that answered, or "fallback" when no provider could be used
+    provider: str
+    cached: bool = False
+    # Why the provider's answer was discarded before validation (content is then the placeholder)
+    rejected: Tuple[str, ...] = ()
+
+
+def _available_providers() -> List[str]:
+    keys = {"gemini": GEMINI_API_KEY, "openai": OPENAI_API_KEY}
+    if LLM_PROVIDER == "fake":
+        return ["fake"]
+    if LLM_PROVIDER == "auto":
+        return [name for name in ("gemini", "openai") if keys[name]]
+    return [LLM_PROVIDER] if keys.get(LLM_PROVIDER) else []
+
+
+def _provider_call(name: str, prompt: str) -> Callable[[], Awaitable[str]]:
+    call = {"gemini": _call_gemini, "openai": _call_openai, "fake": _call_fake}[name]
+
+    async def counted() -> str:
+        outcome = "error"
+        try:
+            with stage(f"llm_{name}", provider=name):
+                # Paced and retried per provider key; a 429 slows every caller of that key
+                api_key = {"gemini": GEMINI_API_KEY, "openai": OPENAI_API_KEY}.get(name) or ""
+                content = await get_rate_limiter().call(name, api_key, lambda: call(prompt))
+            outcome = "ok"
+            return content
+        except asyncio.CancelledError:
+            # Lost a hedged race
+            outcome = "cancelled"
+            raise
+        except UnusableOutputError:
+            outcome = "unusable"
+            raise
+        finally:
+            LLM_REQUESTS.inc(provider=name, outcome=outcome)
+
+    return counted
+
+
+def _cache_key(prompt: str, provider: str) -> str:
+    model = {"gemini": GEMINI_MODEL, "openai": OPENAI_MODEL}.get(provider, provider)
+    return make_cache_key(prompt, provider, model, SYSTEM_PROMPT, LLM_TEMPERATURE)
+
+
+def router_stats() -> Dict[str, object]:
+    return _router.stats()
+
+
+async def generate_compose_result(prompt: str, use_cache: bool = True) -> ComposeResult:
+    # Identical prompts in flight at the same time share one provider call
+    providers = _available_providers()
+    use_cache = use_cache and LLM_CACHE_ENABLED
+    return await _compose_flight.do(
+        (prompt, tuple(providers), use_cache), lambda: _generate_compose(prompt, providers, use_cache)
+    )
+
+
+async def generate_compose_content_from_prompt(prompt: str, use_cache: bool = True) -> str:
+    return (await generate_compose_result(prompt, use_cache)).content
+
+
+async def _cache_io(fn, *args):
+    # The SQLite tier is shared with other worker processes and may wait on their
+    # write lock; keep that wait off the event loop
+    if get_llm_cache().disk is None:
+        return fn(*args)
+    return await run_blocking(fn, *args)
+
+
+async def _generate_compose(prompt: str, providers: List[str], use_cache: bool) -> ComposeResult:
+    if providers:
+        cache = get_llm_cache()
+        keys = {name: _cache_key(prompt, name) for name in providers}
+        if use_cache:
+            by_key = {keys[name]: name for name in _router.order(providers)}
+            found = await _cache_io(cache.get_any, list(by_key))
+            if found is not None:
+                return ComposeResult(found[1], by_key[found[0]], cached=True)
+        else:
+            cache.stats.bypassed += 1
+
+        try:
+            provider, content = await _router.call({name: _provider_call(name, prompt) for name in providers})
+            # Only keep what the validator accepts: a rejected body served from the
+            # cache would skip the generator's retry on every later request
+            if validate_compose(content).ok:
+                await _cache_io(cache.set, keys[provider], content)
+            return ComposeResult(content, provider)
+        except AllProvidersFailed as e:
+            for name, error in e.errors.items():
+                if isinstance(error, UnusableOutputError):
+                    LLM_FALLBACKS.inc(reason="placeholder")
+                    return ComposeResult(PLACEHOLDER_COMPOSE, name, rejected=(str(error),))
+            LLM_FALLBACKS.inc(reason="providers_failed")
+            logger.warning("All LLM providers failed, using fallback layout: %s", e)
+    else:
+        LLM_FALLBACKS.inc(reason="no_provider")
 
     # Fallback simple UI
     safe_title = prompt[:80].replace("\n", " ")
-    return FALLBACK_TEMPLATE % safe_title
\ No newline at end of file
+    return ComposeResult(FALLBACK_TEMPLATE % safe_title, "fallback")
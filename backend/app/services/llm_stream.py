@@ -0,0 +1,257 @@
+"""Incremental handling of streamed LLM output.
+
+:class:`ComposeStreamGuard` strips markdown code fences as text arrives and
+rejects output the compose validator could never accept (more than the byte
+budget, a closing bracket that matches nothing, a function declared inside the
+body or after another one) so the provider stream can be abandoned early.
+Everything else is left to the validator, which can repair some shapes (such as
+a ``@Composable fun`` wrapper or a truncated body) and asks the provider again
+for the rest.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import logging
+import re
+import time
+
+from .metrics import LLM_OUTPUT_BYTES, LLM_OUTPUT_TOKENS, LLM_TTFB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_FENCE_TAG = re.compile(r"[a-zA-Z]*\n")
+_PARTIAL_TAG = re.compile(r"[a-zA-Z]*")
+_CHAR_LITERAL = re.compile(r"'(?:\\.|[^'\\\n])+'")
+_NAME = re.compile(r"\w+|`[^`\n]*`")
+_CLOSES = {")": "(", "]": "[", "}": "{"}
+
+stream_totals: Dict[str, int] = {"streams": 0, "aborted": 0, "output_tokens": 0, "output_bytes": 0}
+
+
+class UnusableOutputError(Exception):
+    pass
+
+
+class OutputBudgetExceeded(UnusableOutputError):
+    pass
+
+
+class MalformedOutputError(UnusableOutputError):
+    pass
+
+
+@dataclass
+class StreamStats:
+    provider: str
+    started: float = field(default_factory=time.perf_counter)
+    ttfb_ms: Optional[float] = None
+    total_ms: float = 0.0
+    chunks: int = 0
+    output_bytes: int = 0
+    output_tokens: Optional[int] = None
+    aborted: Optional[str] = None
+
+    def on_chunk(self, text: str) -> None:
+        if self.ttfb_ms is None:
+            self.ttfb_ms = (time.perf_counter() - self.started) * 1000
+        self.chunks += 1
+        self.output_bytes += len(text.encode("utf-8"))
+
+    def finish(self) -> None:
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+        if self.output_tokens is None:
+            # Providers only report usage at the end of a completed stream
+            self.output_tokens = (self.output_bytes + 3) // 4
+        stream_totals["streams"] += 1
+        stream_totals["aborted"] += 1 if self.aborted else 0
+        stream_totals["output_tokens"] += self.output_tokens
+        stream_totals["output_bytes"] += self.output_bytes
+        LLM_OUTPUT_TOKENS.inc(self.output_tokens, provider=self.provider)
+        LLM_OUTPUT_BYTES.inc(self.output_bytes, provider=self.provider)
+        if self.ttfb_ms is not None:
+            LLM_TTFB_SECONDS.observe(self.ttfb_ms / 1000, provider=self.provider)
+        logger.info(
+            "llm stream provider=%s ttfb_ms=%s total_ms=%.1f chunks=%d bytes=%d tokens=%d aborted=%s",
+            self.provider,
+            "-" if self.ttfb_ms is None else f"{self.ttfb_ms:.1f}",
+            self.total_ms,
+            self.chunks,
+            self.output_bytes,
+            self.output_tokens,
+            self.aborted or "-",
+        )
+
+
+class ComposeStreamGuard:
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._text = ""
+        self._pending = ""
+        self._size = 0
+        # Scanner state over _text: next index to read, open brackets and string
+        # delimiters ("${" for a template inside a string), the previous token
+        self._pos = 0
+        self._open: List[str] = []
+        self._previous = ""
+        self._functions = 0
+        # A closing bracket matched nothing; only more closing brackets may follow
+        self._surplus = False
+
+    def feed(self, chunk: str) -> None:
+        self._pending += chunk
+        self._append(self._drain())
+
+    def result(self) -> str:
+        tail, self._pending = self._pending, ""
+        if tail.startswith("```"):
+            tail = tail[3:]
+        self._append(tail)
+        return self._text.strip()
+
+    def _drain(self) -> str:
+        out = []
+        while True:
+            idx = self._pending.find("```")
+            if idx == -1:
+                # Hold back trailing backticks that may be the start of a fence
+                keep = len(self._pending) - len(self._pending.rstrip("`"))
+                cut = len(self._pending) - keep
+                out.append(self._pending[:cut])
+                self._pending = self._pending[cut:]
+                break
+            out.append(self._pending[:idx])
+            rest = self._pending[idx + 3:]
+            tag = _FENCE_TAG.match(rest)
+            if tag:
+                self._pending = rest[tag.end():]
+            elif _PARTIAL_TAG.fullmatch(rest):
+                # Fence language tag not complete yet
+                self._pending = self._pending[idx:]
+                break
+            else:
+                self._pending = rest
+        return "".join(out)
+
+    def _append(self, text: str) -> None:
+        if not text:
+            return
+        self._text += text
+        self._size += len(text.encode("utf-8"))
+        if self._size > self.max_bytes:
+            raise OutputBudgetExceeded(f"output exceeded {self.max_bytes} bytes")
+        self._scan()
+
+    def _scan(self) -> None:
+        # Reads as far as the text allows; a token that may continue in the next
+        # chunk (a name, "/", a quote) is left for the next call
+        text, pos, end = self._text, self._pos, len(self._text)
+        while pos < end:
+            inside = self._open[-1] if self._open else ""
+            char = text[pos]
+            if inside in ('"', '"""'):
+                pos = self._string(text, pos, end, inside)
+                if pos < 0:
+                    return
+                continue
+            if inside == "//":
+                if char == "\n":
+                    self._open.pop()
+                pos += 1
+                continue
+            if inside == "/*":
+                close = text.find("*/", pos)
+                if close < 0:
+                    # Keep a trailing "*" for the next chunk
+                    self._pos = max(pos, end - 1)
+                    return
+                self._open.pop()
+                pos = close + 2
+                continue
+            if char.isspace():
+                pos += 1
+                continue
+            if char in "/\"':`" and end - pos < 3:
+                break
+            if text.startswith("//", pos) or text.startswith("/*", pos):
+                self._open.append(text[pos:pos + 2])
+                pos += 2
+                continue
+            if char == "'":
+                literal = _CHAR_LITERAL.match(text, pos)
+                if literal is None and text.find("\n", pos) < 0:
+                    break
+                # Otherwise unterminated: the validator reports it
+                pos = literal.end() if literal else pos + 1
+                self._token("'")
+                continue
+            if char == '"':
+                delimiter = '"""' if text.startswith('"""', pos) else '"'
+                self._token(delimiter)
+                self._open.append(delimiter)
+                pos += len(delimiter)
+                continue
+            name = _NAME.match(text, pos)
+            if name is not None or char == "`":
+                if name is None or name.end() == end:
+                    # A name that may continue, or an unclosed `name`
+                    break
+                word = name.group()
+                if word == "fun" and self._previous not in (".", "::"):
+                    self._function()
+                self._token(word)
+                pos += len(word)
+                continue
+            if char in "([{":
+                self._token(char)
+                self._open.append(char)
+            elif char in _CLOSES:
+                self._close(char)
+            else:
+                self._token("::" if text.startswith("::", pos) else char)
+            pos += 2 if text.startswith("::", pos) else 1
+        self._pos = pos
+
+    def _string(self, text: str, pos: int, end: int, delimiter: str) -> int:
+        # Position after the next string character, or -1 to wait for more text
+        if text.startswith(delimiter, pos):
+            if delimiter == '"""' and end - pos == 3:
+                # Raw strings may end with extra quotes
+                self._pos = pos
+                return -1
+            self._open.pop()
+            pos += len(delimiter)
+            while delimiter == '"""' and pos < end and text[pos] == '"':
+                pos += 1
+            return pos
+        if end - pos < 3 and text[pos] in '"$\\':
+            self._pos = pos
+            return -1
+        if delimiter == '"' and text[pos] == "\\":
+            return pos + 2
+        if text.startswith("${", pos):
+            self._open.append("${")
+            return pos + 2
+        return pos + 1
+
+    def _token(self, text: str) -> None:
+        if self._surplus:
+            raise MalformedOutputError(f"unexpected {text!r} after the closing brackets")
+        self._previous = text
+
+    def _close(self, char: str) -> None:
+        opener = self._open[-1] if self._open else ""
+        if opener == "${" and char == "}" or opener == _CLOSES[char]:
+            self._open.pop()
+            self._previous = char
+        elif opener:
+            raise MalformedOutputError(f"unexpected {char!r}, expected the end of {opener!r}")
+        else:
+            # Possibly the model closing setContent too; the validator drops those
+            self._surplus = True
+
+    def _function(self) -> None:
+        # The validator unwraps one "@Composable fun" around the whole body
+        self._functions += 1
+        if self._open:
+            raise MalformedOutputError("function declared inside the screen body")
+        if self._functions > 1:
+            raise MalformedOutputError("more than one function declared")
@@ -0,0 +1,107 @@
+"""Incremental regeneration against the manifest of a previous generation.
+
+A manifest maps each generated file to the SHA-256 of its content. Given the
+manifest a client already holds, :func:`diff_project` renders the project again
+and keeps only the files that were added or whose content changed, plus the
+paths that are no longer generated. Unchanged files are neither sent nor
+rewritten, so their timestamps survive and Gradle keeps treating the tasks that
+read them as up to date.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+import hashlib
+import json
+
+from .archive import Compression, build_zip, compress_entry
+from .generator import DEFAULT_COMPRESSION, render_project_files
+
+MANIFEST_VERSION = 1
+# Written into patch archives next to the changed files
+PATCH_MANIFEST_NAME = ".generator-patch.json"
+# Kept in a project directory that patches are applied to
+MANIFEST_FILE = ".generator-manifest.json"
+
+
+def file_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def parse_manifest(raw: Optional[str]) -> Dict[str, str]:
+    """Accept ``{"files": {path: sha256}}`` as returned by a previous diff, or a flat mapping."""
+    if not raw or not raw.strip():
+        return {}
+    data = json.loads(raw)
+    files = data.get("files", data) if isinstance(data, dict) else None
+    if not isinstance(files, dict) or not all(isinstance(k, str) and isinstance(v, str) for k, v in files.items()):
+        raise ValueError("manifest must map file paths to sha256 digests")
+    return dict(files)
+
+
+@dataclass
+class ProjectDiff:
+    added: Dict[str, bytes] = field(default_factory=dict)
+    modified: Dict[str, bytes] = field(default_factory=dict)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    # Manifest of the new generation, for the next diff
+    manifest: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def changed(self) -> Dict[str, bytes]:
+        return {**self.added, **self.modified}
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "version": MANIFEST_VERSION,
+            "added": sorted(self.added),
+            "modified": sorted(self.modified),
+            "removed": self.removed,
+            "unchanged": len(self.unchanged),
+            "files": self.manifest,
+        }
+
+    def as_json(self) -> Dict[str, object]:
+        payload = self.summary()
+        payload["contents"] = {path: content.decode("utf-8") for path, content in self.changed.items()}
+        return payload
+
+    def apply(self, project_dir: Path) -> None:
+        """Write changed files into ``project_dir``, delete removed ones and store the new manifest."""
+        for path, content in self.changed.items():
+            target = project_dir / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(content)
+        root = project_dir.resolve()
+        for path in self.removed:
+            target = (project_dir / path).resolve()
+            # Paths come from the client's manifest: never delete outside the project
+            if target.is_relative_to(root):
+                target.unlink(missing_ok=True)
+        manifest = {"version": MANIFEST_VERSION, "files": self.manifest}
+        (project_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+    def patch_zip(self, compression: Optional[Compression] = None) -> bytes:
+        compression = compression or DEFAULT_COMPRESSION
+        entries = [
+            compress_entry(path, content, compression.level, store_below=compression.store_below)
+            for path, content in self.changed.items()
+        ]
+        meta = json.dumps(self.summary(), indent=2, sort_keys=True).encode("utf-8")
+        entries.append(compress_entry(PATCH_MANIFEST_NAME, meta, compression.level))
+        return build_zip(entries)
+
+
+def diff_project(ctx: Dict[str, object], previous: Mapping[str, str]) -> ProjectDiff:
+    diff = ProjectDiff()
+    for path, content in render_project_files(ctx).items():
+        digest = file_digest(content)
+        diff.manifest[path] = digest
+        if path not in previous:
+            diff.added[path] = content
+        elif previous[path] != digest:
+            diff.modified[path] = content
+        else:
+            diff.unchanged.append(path)
+    diff.removed = sorted(path for path in previous if path not in diff.manifest)
+    return diff
@@ -0,0 +1,316 @@
+"""Client-side rate limiting, retries and circuit breaking for provider calls.
+
+Every LLM request (the generator's providers and the CI fixer) goes through
+:class:`RateLimiter`, keyed by provider and API key:
+
+* a token bucket paces requests. Its rate comes from ``LLM_RATE_LIMITS``
+  (``"gemini=5:10,openai=20"``, requests/s and optional burst) or is learned:
+  the first 429 sets it just below the rate the provider was accepting, and it
+  creeps back up by about one request/s per second of clean traffic;
+* a 429 pauses the whole key until its ``Retry-After`` (or a backoff delay) has
+  passed, so waiting callers resume paced instead of retrying in a storm;
+* 5xx and connection errors are retried with jittered exponential backoff;
+* consecutive server failures open a circuit breaker; while open, calls fail at
+  once (the router moves on to the next provider) until a trial call succeeds.
+"""
+from collections import deque
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from hashlib import sha256
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+from .metrics import LLM_CIRCUIT, LLM_RETRIES, LLM_THROTTLE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+# Longest a call may wait for the rate limit before giving up (and falling back)
+LLM_RETRY_MAX_WAIT = float(os.getenv("LLM_RETRY_MAX_WAIT", "20"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+_MIN_RATE = 0.2
+_BACKOFF_ON_429 = 0.8
+# Successes remembered to estimate the rate a provider was accepting
+_RATE_WINDOW = 60.0
+
+
+class RateLimited(Exception):
+    """The provider (or our own limit) would not allow a call within the allowed wait."""
+
+    def __init__(self, provider: str, wait: float) -> None:
+        super().__init__(f"{provider} rate limited for another {wait:.1f}s")
+        self.wait = wait
+
+
+class CircuitOpen(Exception):
+    def __init__(self, provider: str, remaining: float) -> None:
+        super().__init__(f"{provider} circuit open for another {remaining:.1f}s")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = LLM_RETRY_ATTEMPTS
+    base_delay: float = LLM_RETRY_BASE_DELAY
+    max_delay: float = LLM_RETRY_MAX_DELAY
+    max_wait: float = LLM_RETRY_MAX_WAIT
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform over [0, capped exponential]
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        rate, _, burst = value.partition(":")
+        limits[name.strip()] = (float(rate), float(burst) if burst else max(1.0, float(rate)))
+    return limits
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from a ``Retry-After`` header or a Gemini ``retryDelay``, if the error carries one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    try:
+        body = response.text if response is not None else ""
+    except Exception:  # streamed body that was never read
+        body = ""
+    match = re.search(r'"retryDelay"\s*:\s*"(\d+(?:\.\d+)?)s"', body or "")
+    return float(match.group(1)) if match else None
+
+
+def _status(error: BaseException) -> Optional[int]:
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else getattr(error, "status_code", None)
+
+
+def _is_transport_error(error: BaseException) -> bool:
+    # Checked against whichever client library is loaded; neither is imported here
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, openai.APIConnectionError)
+
+
+class TokenBucket:
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None) -> None:
+        # rate None: unlimited until the provider pushes back
+        self.limit = rate
+        self.rate = rate
+        self.burst = burst or max(1.0, rate or 1.0)
+        self.max_burst = self.burst if rate is not None else float("inf")
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._accepted: Deque[float] = deque(maxlen=1024)
+
+    def _refill(self, now: float) -> None:
+        if self.rate is not None and now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def reserve(self, now: float) -> float:
+        """Take a token; returns how long to wait before using it."""
+        if self.rate is None:
+            return 0.0
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def accepted_rate(self, now: float) -> float:
+        while self._accepted and self._accepted[0] < now - _RATE_WINDOW:
+            self._accepted.popleft()
+        if not self._accepted:
+            return _MIN_RATE
+        return len(self._accepted) / max(1.0, now - self._accepted[0])
+
+    def throttle(self, delay: float) -> None:
+        # Stop everyone until the provider is ready again, then resume at a lower rate
+        now = time.monotonic()
+        if self.paused_until <= now:
+            # Once per pause: a burst of 429s from one window lowers the rate once
+            accepted = self.accepted_rate(now)
+            base = min(self.rate, accepted) if self.rate is not None else accepted
+            self.rate = max(_MIN_RATE, base * _BACKOFF_ON_429)
+            self.burst = min(self.max_burst, max(1.0, self.rate))
+        self.paused_until = max(self.paused_until, now + delay)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+    def on_success(self) -> None:
+        self._accepted.append(time.monotonic())
+        # Additive increase: about one request/s per second at the current rate
+        if self.rate is not None:
+            self.rate = self.rate + 1.0 / self.rate
+            if self.limit is not None:
+                self.rate = min(self.rate, self.limit)
+            self.burst = min(self.max_burst, max(1.0, self.rate))
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    def before_call(self, provider: str) -> bool:
+        """Raise if open; returns True when this call is the half-open trial."""
+        if self.opened_at is None:
+            return False
+        remaining = self.opened_at + self.cooldown - time.monotonic()
+        if remaining > 0 or self.trial:
+            LLM_CIRCUIT.inc(provider=provider, event="rejected")
+            raise CircuitOpen(provider, max(remaining, 0.0))
+        self.trial = True
+        return True
+
+    def record(self, provider: str, ok: bool) -> None:
+        if ok:
+            if self.opened_at is not None:
+                LLM_CIRCUIT.inc(provider=provider, event="closed")
+            self.failures, self.opened_at = 0, None
+            return
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning("Opening circuit for %s after %d failures", provider, self.failures)
+            LLM_CIRCUIT.inc(provider=provider, event="opened")
+            self.opened_at = time.monotonic()
+
+
+class _KeyState:
+    def __init__(self, rate: Optional[float], burst: Optional[float]) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+
+
+class RateLimiter:
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float]]] = None) -> None:
+        self.limits = parse_rate_limits(LLM_RATE_LIMITS) if limits is None else limits
+        self._keys: Dict[Tuple[str, str], _KeyState] = {}
+
+    def _state(self, provider: str, api_key: str) -> _KeyState:
+        key = (provider, sha256(api_key.encode("utf-8")).hexdigest()[:16])
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = _KeyState(*self.limits.get(provider, (None, None)))
+        return state
+
+    async def _acquire(self, provider: str, bucket: TokenBucket, deadline: float) -> None:
+        started = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                if bucket.paused_until > now:
+                    if bucket.paused_until > deadline:
+                        raise RateLimited(provider, bucket.paused_until - now)
+                    await asyncio.sleep(bucket.paused_until - now)
+                    continue
+                wait = bucket.reserve(now)
+                if now + wait > deadline:
+                    raise RateLimited(provider, wait)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+                if bucket.paused_until <= time.monotonic():
+                    return
+                # Paused while we waited: the reserved token is void, queue again
+        finally:
+            LLM_THROTTLE_SECONDS.inc(time.monotonic() - started, provider=provider)
+
+    async def call(
+        self, provider: str, api_key: str, fn: Callable[[], Awaitable[T]], policy: Optional[RetryPolicy] = None
+    ) -> T:
+        """Run ``fn`` under the limits of ``(provider, api_key)``, retrying what is worth retrying."""
+        policy = policy or RetryPolicy()
+        state = self._state(provider, api_key or "")
+        deadline = time.monotonic() + policy.max_wait
+        for attempt in range(max(1, policy.attempts)):
+            trial = state.breaker.before_call(provider)
+            try:
+                await self._acquire(provider, state.bucket, deadline)
+                result = await fn()
+            except asyncio.CancelledError:
+                if trial:
+                    state.breaker.trial = False
+                raise
+            except Exception as e:
+                if trial:
+                    state.breaker.trial = False
+                status = _status(e)
+                if status == 429:
+                    delay = retry_after(e)
+                    state.bucket.throttle(delay if delay is not None else policy.backoff(attempt + 1))
+                    reason = "rate_limited"
+                elif (status is not None and status >= 500) or _is_transport_error(e):
+                    state.breaker.record(provider, ok=False)
+                    reason = "error"
+                else:
+                    raise
+                if attempt + 1 >= policy.attempts:
+                    raise
+                LLM_RETRIES.inc(provider=provider, reason=reason)
+                if reason == "error":
+                    pause = policy.backoff(attempt)
+                    if time.monotonic() + pause > deadline:
+                        raise
+                    await asyncio.sleep(pause)
+                continue
+            state.breaker.record(provider, ok=True)
+            if trial:
+                state.breaker.trial = False
+            state.bucket.on_success()
+            return result
+        raise AssertionError("unreachable")
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        now = time.monotonic()
+        return {
+            f"{provider}:{key}": {
+                "rate": state.bucket.rate,
+                "paused_for": max(0.0, state.bucket.paused_until - now),
+                "circuit_open": state.breaker.opened_at is not None,
+            }
+            for (provider, key), state in self._keys.items()
+        }
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
+
+
+def set_rate_limiter(limiter: Optional[RateLimiter]) -> None:
+    global _limiter
+    _limiter = limiter
@@ -0,0 +1,186 @@
+"""Latency-aware routing between LLM providers.
+
+Each provider keeps a rolling window of latencies and failures. Providers are
+tried in order of health and speed; when the first one is slower than its own
+p95 a hedged request goes to the next provider (within a budget), the first
+usable answer wins and the other request is cancelled. Failures fall through to
+the next provider.
+"""
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+LLM_ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "50"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE", "1") != "0"
+# Fraction of requests that may send a hedged second request
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+# Hedge delay used until a provider has enough samples for a p95
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "8"))
+_MIN_SAMPLES = 5
+_HEDGE_TOKENS_MAX = 5.0
+
+
+class AllProvidersFailed(Exception):
+    def __init__(self, errors: Dict[str, BaseException]) -> None:
+        super().__init__("; ".join(f"{name}: {err!r}" for name, err in errors.items()))
+        self.errors = errors
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ProviderStats:
+    def __init__(self, window: int = LLM_ROUTER_WINDOW) -> None:
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.answered = 0
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        self.requests += 1
+        self.outcomes.append(ok)
+        if ok:
+            self.answered += 1
+            if latency is not None:
+                self.latencies.append(latency)
+        else:
+            self.errors += 1
+
+    @property
+    def p50(self) -> Optional[float]:
+        return _percentile(list(self.latencies), 0.5) if self.latencies else None
+
+    @property
+    def p95(self) -> Optional[float]:
+        return _percentile(list(self.latencies), 0.95) if len(self.latencies) >= _MIN_SAMPLES else None
+
+    @property
+    def error_rate(self) -> float:
+        return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "answered": self.answered,
+            "p50": self.p50,
+            "p95": self.p95,
+            "error_rate": self.error_rate,
+        }
+
+
+@dataclass
+class RouterCounters:
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    fallbacks: int = 0
+
+
+class LLMRouter:
+    def __init__(
+        self,
+        hedge: bool = LLM_HEDGE_ENABLED,
+        hedge_budget: float = LLM_HEDGE_BUDGET,
+        hedge_delay: float = LLM_HEDGE_DELAY,
+        window: int = LLM_ROUTER_WINDOW,
+    ) -> None:
+        self.hedge = hedge
+        self.hedge_budget = hedge_budget
+        self.hedge_delay = hedge_delay
+        self.window = window
+        self.providers: Dict[str, ProviderStats] = {}
+        self.counters = RouterCounters()
+        self._hedge_tokens = 1.0
+
+    def _stats(self, name: str) -> ProviderStats:
+        if name not in self.providers:
+            self.providers[name] = ProviderStats(self.window)
+        return self.providers[name]
+
+    def order(self, names: List[str]) -> List[str]:
+        # Unhealthy providers go last; otherwise faster median first. Providers
+        # without samples keep their configured position so they get explored.
+        def rank(item: Tuple[int, str]) -> Tuple[bool, float, int]:
+            position, name = item
+            stats = self._stats(name)
+            return stats.error_rate > 0.5, stats.p50 or 0.0, position
+
+        return [name for _, name in sorted(enumerate(names), key=rank)]
+
+    def _hedge_after(self, name: str) -> Optional[float]:
+        if not self.hedge or self._hedge_tokens < 1:
+            return None
+        p95 = self._stats(name).p95
+        return p95 if p95 is not None else self.hedge_delay
+
+    async def call(self, calls: Dict[str, Callable[[], Awaitable[str]]]) -> Tuple[str, str]:
+        """Run the providers in ``calls`` and return ``(provider, content)`` of the first usable answer."""
+        self.counters.requests += 1
+        self._hedge_tokens = min(_HEDGE_TOKENS_MAX, self._hedge_tokens + self.hedge_budget)
+
+        queue = self.order(list(calls))
+        running: Dict[asyncio.Future, Tuple[str, float]] = {}
+        errors: Dict[str, BaseException] = {}
+        hedged = False
+
+        def launch(name: str) -> None:
+            running[asyncio.ensure_future(calls[name]())] = (name, time.perf_counter())
+
+        primary = queue.pop(0)
+        launch(primary)
+        try:
+            while running:
+                timeout = None
+                if queue and not hedged and len(running) == 1:
+                    timeout = self._hedge_after(next(iter(running.values()))[0])
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self._hedge_tokens -= 1
+                    self.counters.hedged += 1
+                    launch(queue.pop(0))
+                    continue
+                for task in done:
+                    name, started = running.pop(task)
+                    latency = time.perf_counter() - started
+                    error = task.exception()
+                    if error is None and task.result():
+                        self._stats(name).record(latency, ok=True)
+                        if hedged and name != primary:
+                            self.counters.hedge_wins += 1
+                        return name, task.result()
+                    errors[name] = error or ValueError("empty completion")
+                    self._stats(name).record(latency, ok=False)
+                    logger.warning("LLM provider %s failed after %.2fs: %r", name, latency, errors[name])
+                if not running and queue:
+                    self.counters.fallbacks += 1
+                    launch(queue.pop(0))
+        finally:
+            # Cancel the losers; consume errors of requests that finished alongside the winner
+            for task in running:
+                if task.done():
+                    if not task.cancelled():
+                        task.exception()
+                else:
+                    task.cancel()
+        raise AllProvidersFailed(errors)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "requests": self.counters.requests,
+            "hedged": self.counters.hedged,
+            "hedge_wins": self.counters.hedge_wins,
+            "fallbacks": self.counters.fallbacks,
+            "providers": {name: stats.as_dict() for name, stats in self.providers.items()},
+        }
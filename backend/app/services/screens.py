@@ -0,0 +1,182 @@
+"""Screen plans for multi-screen projects.
+
+A prompt asking for navigation ("bottom navigation", "tabs", "Navigation
+Compose"...) or listing screens explicitly is split into screens, each generated
+by its own LLM call. Recognised forms::
+
+    Screens: Home, Search, Profile
+    - Cart: items with quantity steppers and a checkout button
+
+Without a list, well-known screens count only when the prompt names them as
+screens ("home screen", "settings tab", "màn hình cài đặt"); a prompt has to
+name two or more to be split, so "a todo list with a search bar and tabs" stays
+a single screen and a single LLM call. Each screen's prompt is built only from
+its own description plus the prompt lines that mention no screen, so editing
+one screen's line leaves the other screens' prompts (and cache entries) as
+they were.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import os
+import re
+import unicodedata
+
+MAX_SCREENS = int(os.getenv("GENERATOR_MAX_SCREENS", "5"))
+
+NAV_SINGLE, NAV_BOTTOM_BAR, NAV_TABS = "single", "bottom_bar", "tabs"
+
+_TABS = re.compile(r"\btabs?\b", re.IGNORECASE)
+# Navigation Compose maps to the bottom bar: screens switch on state, with no extra dependency
+_NAVIGATION = re.compile(
+    r"bottom\s*(?:navigation|nav|bar)|navigation\s*(?:bar|compose)|thanh điều hướng"
+    r"|multi[- ]screen|multiple screens|nhiều màn hình",
+    re.IGNORECASE,
+)
+_EXPLICIT_LIST = re.compile(r"^\s*(?:screens?|tabs|màn hình)\s*:\s*(.+)$", re.IGNORECASE)
+# Bullet titles that describe the app rather than name a screen
+_DETAIL_TITLE = re.compile(
+    r"^(?:colou?rs?|theme|font|style|language|data|api|storage|icon|logo|animation"
+    r"|màu|giao diện|ngôn ngữ|dữ liệu)\b",
+    re.IGNORECASE,
+)
+_SCREEN_WORD = re.compile(r"\bscreen\b|màn hình", re.IGNORECASE)
+_EXPLICIT_ITEM = re.compile(r"^\s*[-*]\s*([^:\n]{1,40}?)(?:\s+screen)?\s*:\s*(.+)$", re.IGNORECASE)
+
+# (pattern, name, Icons.Default member, what the screen shows)
+_KNOWN_SCREENS = (
+    (r"\bhome\b|trang chủ", "Home", "Home", "the main overview of the app"),
+    (r"\blist\b|danh sách", "List", "List", "a scrollable list of the app's items"),
+    (r"\bsearch\b|tìm kiếm", "Search", "Search", "a search field with matching results below it"),
+    (r"\bgrid\b|mạng lưới|gallery", "Gallery", "Star", "a grid of item cards"),
+    (r"\bform\b|\bcrud\b|editor|thêm/sửa", "Editor", "Edit", "a form to add or edit an item"),
+    (r"\bcart\b|giỏ hàng", "Cart", "ShoppingCart", "the cart with item rows and a checkout button"),
+    (r"\bfavou?rites?\b|yêu thích", "Favorites", "Favorite", "the items the user marked as favorite"),
+    (r"\bchat\b|\bmessages?\b|tin nhắn", "Chat", "Email", "a conversation with a message input"),
+    (r"\bnotifications?\b|thông báo", "Notifications", "Notifications", "a list of recent notifications"),
+    (r"\bprofile\b|\baccount\b|hồ sơ|tài khoản", "Profile", "Person", "the user's profile details"),
+    (r"\bsettings?\b|cài đặt", "Settings", "Settings", "settings rows with switches"),
+    (r"\babout\b|giới thiệu", "About", "Info", "information about the app"),
+)
+_DEFAULT_ICON = "Star"
+
+
+@dataclass(frozen=True)
+class ScreenSpec:
+    name: str
+    title: str
+    icon: str
+    description: str
+    prompt: str
+
+    @property
+    def function(self) -> str:
+        return f"{self.name}Screen"
+
+
+@dataclass(frozen=True)
+class ScreenPlan:
+    navigation: str
+    screens: Tuple[ScreenSpec, ...]
+
+    @property
+    def multi(self) -> bool:
+        return len(self.screens) > 1
+
+
+def _identifier(text: str, fallback: str) -> str:
+    text = text.replace("đ", "d").replace("Đ", "D")
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    name = "".join(part[:1].upper() + part[1:] for part in re.findall(r"[A-Za-z0-9]+", ascii_text))
+    if not name or not name[0].isalpha():
+        return fallback
+    return name[:1].upper() + name[1:]
+
+
+def _known(text: str) -> Optional[Tuple[str, str, str, str]]:
+    for pattern, name, icon, description in _KNOWN_SCREENS:
+        if re.search(pattern, text, re.IGNORECASE):
+            return pattern, name, icon, description
+    return None
+
+
+def _named_screen(pattern: str) -> "re.Pattern[str]":
+    # A well-known name used as a screen, not just a feature of one
+    return re.compile(rf"(?:{pattern})\s+(?:screens?|tabs?|pages?)\b|màn hình\s+(?:{pattern})", re.IGNORECASE)
+
+
+def _screen_prompt(title: str, description: str, shared: List[str]) -> str:
+    context = "\n".join(shared) or "(no further details)"
+    return (
+        f"The {title} screen of a multi-screen Android app: {description}.\n\n"
+        f"App details:\n{context}\n\n"
+        "Generate only this screen's content. Navigation between screens is provided by the app shell."
+    )
+
+
+def plan_screens(prompt: str, max_screens: int = MAX_SCREENS) -> ScreenPlan:
+    lines = [line.strip() for line in prompt.splitlines() if line.strip()]
+    navigation = NAV_TABS if _TABS.search(prompt) else NAV_BOTTOM_BAR if _NAVIGATION.search(prompt) else NAV_SINGLE
+
+    # (name, title, icon, description) in prompt order; lines that define screens are not shared context
+    found: List[Tuple[str, str, str, str]] = []
+    screen_lines = set()
+    for index, line in enumerate(lines):
+        listed = _EXPLICIT_LIST.match(line)
+        item = _EXPLICIT_ITEM.match(line)
+        if listed:
+            screen_lines.add(index)
+            for title in filter(None, (t.strip() for t in re.split(r"[,;]", listed.group(1)))):
+                known = _known(title)
+                description = known[3] if known else f"the {title} part of the app"
+                found.append((_identifier(title, ""), title, known[2] if known else _DEFAULT_ICON, description))
+        elif item and not _DETAIL_TITLE.match(item.group(1)) and (
+            # Without navigation, a bullet is a screen only when it says so
+            navigation != NAV_SINGLE or _SCREEN_WORD.search(line)
+        ):
+            screen_lines.add(index)
+            title, description = item.group(1).strip(), item.group(2).strip().rstrip(".")
+            known = _known(title)
+            found.append((_identifier(title, ""), title, known[2] if known else _DEFAULT_ICON, description))
+    explicit = bool(found)
+
+    if not explicit:
+        # Well-known screens the prompt names as screens, in the order they appear.
+        # A line naming a screen describes that screen only, unless it is the line
+        # asking for navigation, which usually describes the whole app.
+        positions = []
+        for pattern, name, icon, description in _KNOWN_SCREENS:
+            named = _named_screen(pattern)
+            match = named.search(prompt)
+            if not match:
+                continue
+            own = [
+                index for index, line in enumerate(lines)
+                if named.search(line) and not (_NAVIGATION.search(line) or _TABS.search(line))
+            ]
+            screen_lines.update(own)
+            if own:
+                description = f"{description} ({'; '.join(lines[index] for index in own)})"
+            positions.append((match.start(), (name, name, icon, description)))
+        found = [screen for _, screen in sorted(positions)]
+    if navigation == NAV_SINGLE:
+        navigation = NAV_BOTTOM_BAR
+
+    shared = [line for index, line in enumerate(lines) if index not in screen_lines]
+    screens: List[ScreenSpec] = []
+    seen = set()
+    for position, (name, title, icon, description) in enumerate(found):
+        name = name or f"Screen{position + 1}"
+        if name in seen:
+            continue
+        seen.add(name)
+        screens.append(ScreenSpec(name, title, icon, description, _screen_prompt(title, description, shared)))
+        if len(screens) >= max_screens:
+            break
+    if len(screens) < 2:
+        return ScreenPlan(NAV_SINGLE, ())
+    return ScreenPlan(navigation, tuple(screens))
+
+
+def kotlin_string(text: str) -> str:
+    """``text`` escaped for a Kotlin string literal."""
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("$", "\\$").replace("\n", " ")
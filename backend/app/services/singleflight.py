@@ -0,0 +1,66 @@
+"""Coalesce concurrent identical calls into one in-flight execution.
+
+The first caller for a key starts the work as a task; callers that arrive while it
+is running await the same task and receive the same result or exception. A
+cancelled caller only stops waiting; the shared task is cancelled once no caller
+is left waiting for it.
+"""
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+_registry: Dict[str, "SingleFlight"] = {}
+
+
+@dataclass
+class _Call:
+    task: asyncio.Future
+    waiters: int = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.executed = 0
+        self.deduplicated = 0
+        self._inflight: Dict[Hashable, _Call] = {}
+        _registry[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        call = self._inflight.get(key)
+        if call is None or call.task.get_loop() is not asyncio.get_running_loop():
+            call = _Call(asyncio.ensure_future(fn()))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.executed += 1
+        else:
+            self.deduplicated += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+        }
+
+
+def flight_stats() -> Dict[str, Dict[str, int]]:
+    return {name: flight.stats() for name, flight in _registry.items()}
@@ -0,0 +1,135 @@
+"""Process-wide Jinja environment for the Android template tree.
+
+Templates are compiled once per process and recompiled only when their file changes
+(mtime/size first, then a content hash so touched-but-identical files are kept).
+Setting ``TEMPLATES_BUNDLE`` to an archive built by :func:`compile_template_bundle`
+loads precompiled template modules instead of reading the template directory.
+"""
+from hashlib import sha1
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+import json
+import os
+import py_compile
+import tempfile
+import threading
+import zipfile
+
+from jinja2 import BaseLoader, Environment, FileSystemLoader, ModuleLoader, StrictUndefined, Template, meta
+
+# Anchored to this file so the CLI (and its daemon) work from any directory
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates" / "android"
+TEMPLATES_BUNDLE = os.getenv("TEMPLATES_BUNDLE", "")
+
+# Stored next to the compiled modules: precompiled templates have no source to inspect
+VARIABLES_MANIFEST = "variables.json"
+
+_env: Optional[Environment] = None
+_env_lock = threading.Lock()
+_variables: Dict[Tuple[int, str], Tuple[Template, FrozenSet[str]]] = {}
+_bundle_variables: Dict[str, Dict[str, FrozenSet[str]]] = {}
+
+
+class HashCheckingLoader(FileSystemLoader):
+    def get_source(self, environment: Environment, template: str) -> Tuple[str, str, Callable[[], bool]]:
+        source, filename, _ = super().get_source(environment, template)
+        stat = os.stat(filename)
+        state = {"stamp": (stat.st_mtime_ns, stat.st_size), "digest": sha1(source.encode("utf-8")).digest()}
+
+        def uptodate() -> bool:
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                return False
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == state["stamp"]:
+                return True
+            try:
+                with open(filename, "rb") as f:
+                    digest = sha1(f.read()).digest()
+            except OSError:
+                return False
+            if digest != state["digest"]:
+                return False
+            state["stamp"] = stamp
+            return True
+
+        return source, filename, uptodate
+
+
+def create_jinja_env(templates_dir: Path = TEMPLATES_DIR, bundle: Optional[str] = None) -> Environment:
+    loader: BaseLoader
+    if bundle:
+        loader = ModuleLoader(bundle)
+    else:
+        loader = HashCheckingLoader(str(templates_dir))
+    return Environment(
+        loader=loader,
+        undefined=StrictUndefined,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        auto_reload=not bundle,
+    )
+
+
+def get_jinja_env() -> Environment:
+    global _env
+    if _env is None:
+        with _env_lock:
+            if _env is None:
+                bundle = TEMPLATES_BUNDLE if TEMPLATES_BUNDLE and Path(TEMPLATES_BUNDLE).exists() else None
+                _env = create_jinja_env(bundle=bundle)
+    return _env
+
+
+def clear_template_cache() -> None:
+    global _env
+    with _env_lock:
+        _env = None
+        _variables.clear()
+
+
+def _read_bundle_variables(bundle: str) -> Dict[str, FrozenSet[str]]:
+    if bundle not in _bundle_variables:
+        with zipfile.ZipFile(bundle) as zf:
+            data = json.loads(zf.read(VARIABLES_MANIFEST)) if VARIABLES_MANIFEST in zf.namelist() else {}
+        _bundle_variables[bundle] = {name: frozenset(names) for name, names in data.items()}
+    return _bundle_variables[bundle]
+
+
+def template_variables(env: Environment, name: str) -> Optional[FrozenSet[str]]:
+    """Context keys a template reads, or None if they cannot be determined."""
+    template = env.get_template(name)
+    cached = _variables.get((id(env), name))
+    if cached is not None and cached[0] is template:
+        return cached[1]
+
+    loader = env.loader
+    if isinstance(loader, ModuleLoader):
+        paths = list(loader.module.__path__)
+        names = _read_bundle_variables(paths[0]).get(name) if len(paths) == 1 and zipfile.is_zipfile(paths[0]) else None
+    else:
+        assert loader is not None
+        source = loader.get_source(env, name)[0]
+        names = frozenset(meta.find_undeclared_variables(env.parse(source)))
+    if names is not None:
+        _variables[(id(env), name)] = (template, names)
+    return names
+
+
+def compile_template_bundle(target: Path, templates_dir: Path = TEMPLATES_DIR) -> int:
+    # Jinja emits Python source; byte-compile it so loading the bundle skips both
+    # template parsing and Python compilation (the bundle is tied to this interpreter).
+    env = create_jinja_env(templates_dir)
+    names = env.list_templates()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        env.compile_templates(tmp, zip=None, ignore_errors=False)
+        with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as zf:
+            for source in sorted(Path(tmp).glob("*.py")):
+                pyc = source.with_suffix(".pyc")
+                py_compile.compile(str(source), cfile=str(pyc), doraise=True)
+                zf.write(pyc, arcname=pyc.name)
+            variables = {name: sorted(template_variables(env, name) or ()) for name in names}
+            zf.writestr(VARIABLES_MANIFEST, json.dumps(variables, indent=1, sort_keys=True))
+    return len(names)
@@ -0,0 +1,176 @@
+"""Optional request tracing exported as OTLP/HTTP JSON.
+
+Tracing is off unless ``OTEL_EXPORTER_OTLP_ENDPOINT`` points at a collector
+(for example ``http://localhost:4318``). When off, :func:`span` returns a shared
+no-op object so instrumented code pays one function call. When on, finished
+spans are batched and posted from a background thread; spans are dropped
+rather than blocking a request if the collector falls behind.
+"""
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "").rstrip("/")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "ai-android-generator")
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "2048"))
+_BATCH_SIZE = 256
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name: str, attributes: Dict[str, Any]) -> None:
+        parent = _current.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else ""
+        self.attributes = dict(attributes)
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end_ns = time.time_ns()
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Exited in a different context than entered (async generator finalizers)
+            _current.set(None)
+        if _exporter is not None:
+            _exporter.submit(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class OTLPExporter:
+    def __init__(self, endpoint: str, service_name: str = OTEL_SERVICE_NAME) -> None:
+        self.url = f"{endpoint}/v1/traces"
+        self.service_name = service_name
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, timeout: float) -> List[Span]:
+        batch: List[Span] = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < _BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "backend.app"}, "spans": [s.to_otlp() for s in spans]}],
+            }]
+        }
+
+    def _run(self) -> None:
+        from .http_clients import get_sync_client
+
+        while True:
+            batch = self._drain(TRACE_EXPORT_INTERVAL)
+            if not batch:
+                continue
+            try:
+                resp = get_sync_client().post(self.url, json=self.payload(batch))
+                resp.raise_for_status()
+                self.exported += len(batch)
+            except Exception as exc:  # noqa: BLE001 - a missing collector must not affect requests
+                self.dropped += len(batch)
+                logger.debug("trace export to %s failed: %r", self.url, exc)
+
+
+_exporter: Optional[OTLPExporter] = None
+
+
+def configure_tracing(endpoint: str = OTEL_EXPORTER_OTLP_ENDPOINT) -> Optional[OTLPExporter]:
+    global _exporter
+    _exporter = OTLPExporter(endpoint) if endpoint else None
+    return _exporter
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+def span(name: str, **attributes: Any):
+    if _exporter is None:
+        return NOOP_SPAN
+    return Span(name, attributes)
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+configure_tracing()
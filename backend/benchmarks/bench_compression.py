@@ -0,0 +1,51 @@
+"""Archive size against CPU and wall time for each compression mode.
+
+Usage:
+    python -m backend.benchmarks.bench_compression [-n 300]
+
+Every request uses a distinct app name, so only the context-free templates
+come from prebuilt entries and the rest are rendered and compressed. CPU time includes the compression threads
+of the "parallel" mode, so compare its wall time to see what the pool buys.
+"""
+import argparse
+import asyncio
+import time
+
+from backend.app.services.archive import COMPRESSION_MODES, get_compression
+from backend.app.services.generator import AndroidProjectConfig, archive_project, build_project_context
+
+CONFIG = AndroidProjectConfig(
+    app_name="BenchApp",
+    package_name="com.example.bench",
+    description="benchmark",
+    min_sdk=24,
+    target_sdk=34,
+    prompt="Simple screen with a title and a button",
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--iterations", type=int, default=300)
+    args = parser.parse_args()
+
+    ctx = asyncio.run(build_project_context(CONFIG))
+    print(f"{'mode':>9} {'bytes':>8} {'cpu ms/req':>11} {'wall ms/req':>12}")
+    for mode in COMPRESSION_MODES:
+        try:
+            compression = get_compression(mode)
+        except ValueError as e:
+            print(f"{mode:>9} skipped: {e}")
+            continue
+        size = 0
+        cpu, wall = time.process_time(), time.perf_counter()
+        for i in range(args.iterations):
+            size = len(archive_project({**ctx, "app_name": f"BenchApp{i}"}, compression))
+        cpu = (time.process_time() - cpu) * 1000 / args.iterations
+        wall = (time.perf_counter() - wall) * 1000 / args.iterations
+        print(f"{mode:>9} {size:>8} {cpu:>11.3f} {wall:>12.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
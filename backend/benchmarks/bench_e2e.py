@@ -0,0 +1,259 @@
+"""End-to-end latency, throughput and memory with the offline fake LLM provider.
+
+Usage:
+    python -m backend.benchmarks.bench_e2e [-s direct,app,cli] [-c 1,8,32] [-n 200]
+        [--latency 0.05] [--jitter 0.02] [--failure-rate 0] [--output-bytes 600]
+        [--baseline backend/benchmarks/baseline.json] [--save-baseline] [--tolerance 0.25]
+
+Scenarios:
+    direct  generate_android_project_zip() called in-process
+    app     POST /generate through the FastAPI app (in-process ASGI transport)
+    cli     `python -m backend.cli gen` as a subprocess per request
+
+Every request has its own prompt and app name, so nothing is served from the
+LLM cache or a single-flight group. Each scenario/concurrency pair runs in a
+fresh interpreter; peak RSS is that process's (the largest child's for "cli").
+Allocations come from a second, shorter pass under tracemalloc so they do not
+skew the timings: peak traced KiB and blocks still held afterwards.
+
+With a baseline file present, p50/p95/p99 and peak RSS more than --tolerance
+above it, or throughput more than --tolerance below it, are reported as
+regressions and the exit status is 1. Baselines are only compared when the fake
+provider settings match; numbers from another machine are not meaningful.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+PROMPT = "Profile screen with an avatar, a name and a follow button"
+ALLOC_REQUESTS = 20
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def _config(i: int):
+    from backend.app.services.generator import AndroidProjectConfig
+
+    return AndroidProjectConfig(
+        app_name=f"Bench{i}",
+        package_name="com.example.bench",
+        description="benchmark",
+        min_sdk=24,
+        target_sdk=34,
+        prompt=f"{PROMPT} #{i}",
+    )
+
+
+async def _closed_loop(call, first: int, count: int, concurrency: int):
+    # `concurrency` clients issue requests back to back until `count` are done
+    latencies: List[float] = []
+    errors = 0
+    next_index = first
+
+    async def client(n: int) -> None:
+        nonlocal next_index, errors
+        while next_index < first + count:
+            i, next_index = next_index, next_index + 1
+            started = time.perf_counter()
+            try:
+                await call(i, n)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def _run_direct(first: int, count: int, concurrency: int):
+    from backend.app.services.generator import generate_android_project_zip
+
+    async def call(i: int, n: int) -> None:
+        await generate_android_project_zip(_config(i))
+
+    return await _closed_loop(call, first, count, concurrency)
+
+
+async def _run_app(first: int, count: int, concurrency: int):
+    import httpx
+
+    from backend.app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def call(i: int, n: int) -> None:
+            config = _config(i)
+            form = {"app_name": config.app_name, "package_name": config.package_name, "prompt": config.prompt}
+            # One client id per simulated user; admission queues per client
+            resp = await client.post("/generate", data=form, headers={"X-Client-Id": f"bench-{n}"})
+            resp.raise_for_status()
+
+        return await _closed_loop(call, first, count, concurrency)
+
+
+def _run_cli(first: int, count: int, concurrency: int):
+    latencies: List[float] = []
+    with tempfile.TemporaryDirectory(prefix="bench_cli_") as out_dir:
+        def call(i: int) -> Optional[float]:
+            config = _config(i)
+            command = [
+                sys.executable, "-m", "backend.cli", "gen",
+                "-n", config.app_name, "-p", config.package_name, "-r", config.prompt,
+                "-o", os.path.join(out_dir, f"{config.app_name}.zip"),
+            ]
+            started = time.perf_counter()
+            done = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return time.perf_counter() - started if done.returncode == 0 else None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(call, range(first, first + count)))
+        wall = time.perf_counter() - started
+    latencies = [r for r in results if r is not None]
+    return latencies, len(results) - len(latencies), wall
+
+
+def _measure(scenario: str, concurrency: int, requests: int) -> Dict[str, object]:
+    if scenario == "cli":
+        latencies, errors, wall = _run_cli(0, requests, concurrency)
+        rss_kib = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        alloc = {"alloc_peak_kib": None, "retained_blocks": None, "gc_collections": None}
+    else:
+        run = {"direct": _run_direct, "app": _run_app}[scenario]
+        latencies, errors, wall = asyncio.run(run(0, requests, concurrency))
+        rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        gc.collect()
+        collections = sum(s["collections"] for s in gc.get_stats())
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        asyncio.run(run(requests, min(requests, ALLOC_REQUESTS), concurrency))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        gc.collect()
+        alloc = {
+            "alloc_peak_kib": round(peak / 1024, 1),
+            "retained_blocks": sys.getallocatedblocks() - blocks,
+            "gc_collections": sum(s["collections"] for s in gc.get_stats()) - collections,
+        }
+
+    if not latencies:
+        raise SystemExit(f"{scenario}: every request failed")
+    return {
+        "requests": requests,
+        "errors": errors,
+        **{key: round(_percentile(latencies, q) * 1000, 2) for key, q in zip(LATENCY_KEYS, (0.5, 0.95, 0.99))},
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "peak_rss_mib": round(rss_kib / 1024, 1),
+        **alloc,
+    }
+
+
+def _spawn(scenario: str, concurrency: int, requests: int, env: Dict[str, str]) -> Dict[str, object]:
+    command = [sys.executable, "-m", "backend.benchmarks.bench_e2e", "--run", f"{scenario}:{concurrency}", "-n", str(requests)]
+    done = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Describe every metric that moved more than ``tolerance`` the wrong way."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric in (*LATENCY_KEYS, "peak_rss_mib"):
+            if base.get(metric) and current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{key} {metric}: {current[metric]} > {base[metric]}")
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{key} throughput_rps: {current['throughput_rps']} < {base['throughput_rps']}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--scenarios", default="direct,app,cli")
+    parser.add_argument("-c", "--concurrency", default="1,8,32")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="requests per run (cli runs use a tenth)")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--output-bytes", type=int, default=600)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        scenario, concurrency = args.run.split(":")
+        print(json.dumps(_measure(scenario, int(concurrency), args.requests)))
+        return 0
+
+    settings = {
+        "FAKE_LLM_LATENCY": str(args.latency),
+        "FAKE_LLM_JITTER": str(args.jitter),
+        "FAKE_LLM_FAILURE_RATE": str(args.failure_rate),
+        "FAKE_LLM_OUTPUT_BYTES": str(args.output_bytes),
+        "BENCH_REQUESTS": str(args.requests),
+    }
+    env = {k: v for k, v in os.environ.items() if k not in ("LLM_CACHE_PATH", "JOB_RESULT_DIR", "GENERATOR_API_URL")}
+    env.update(settings, LLM_PROVIDER="fake")
+
+    results: Dict[str, Dict] = {}
+    print(f"{'run':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'err':>4} {'rss MiB':>8} {'alloc KiB':>10} {'retained':>9}")
+    for scenario in args.scenarios.split(","):
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            requests = max(concurrency, args.requests // 10) if scenario == "cli" else args.requests
+            r = _spawn(scenario, concurrency, requests, env)
+            key = f"{scenario}@{concurrency}"
+            results[key] = r
+            print(
+                f"{key:>10} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['throughput_rps']:>8} {r['errors']:>4} "
+                f"{r['peak_rss_mib']:>8} {str(r['alloc_peak_kib']):>10} {str(r['retained_blocks']):>9}"
+            )
+
+    machine = {"cpus": os.cpu_count(), "python": platform.python_version(), "platform": platform.platform()}
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({"settings": settings, "machine": machine, "results": results}, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; write one with --save-baseline")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("settings") != settings:
+        print("Baseline was recorded with different fake provider settings; not comparing")
+        return 0
+    if baseline.get("machine", {}).get("cpus") != machine["cpus"]:
+        print(f"Note: baseline was recorded on {baseline['machine'].get('cpus')} cores, this machine has {machine['cpus']}")
+    regressions = compare(results, baseline.get("results", {}), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,59 @@
+"""Per-request CPU time of archive assembly with and without prebuilt entries.
+
+Usage:
+    python -m backend.benchmarks.bench_entry_cache [-n 500]
+
+"uncached" renders and deflates all templates for every request (the old path);
+"cached" copies prebuilt entries for templates that do not read the LLM output.
+The "distinct apps" rows give every request its own app name, so only the
+context-free templates can come from the cache.
+"""
+import argparse
+import asyncio
+import time
+
+from backend.app.services.generator import (
+    AndroidProjectConfig,
+    build_project_context,
+    entry_cache_stats,
+    warm_entry_cache,
+    zip_project,
+)
+
+CONFIG = AndroidProjectConfig(
+    app_name="BenchApp",
+    package_name="com.example.bench",
+    description="benchmark",
+    min_sdk=24,
+    target_sdk=34,
+    prompt="Simple screen with a title and a button",
+)
+
+
+def _cpu_ms_per_request(ctx, iterations: int, use_cache: bool, distinct: bool) -> float:
+    start = time.process_time()
+    for i in range(iterations):
+        if distinct:
+            ctx = {**ctx, "app_name": f"BenchApp{i}"}
+        zip_project(ctx, use_cache=use_cache)
+    return (time.process_time() - start) * 1000 / iterations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    ctx = asyncio.run(build_project_context(CONFIG))
+    print(f"prebuilt static entries: {warm_entry_cache()}")
+    for distinct in (False, True):
+        label = "distinct apps" if distinct else "same app"
+        before = _cpu_ms_per_request(ctx, args.iterations, use_cache=False, distinct=distinct)
+        after = _cpu_ms_per_request(ctx, args.iterations, use_cache=True, distinct=distinct)
+        print(f"{label:>13}: uncached {before:.3f} ms CPU/req, cached {after:.3f} ms CPU/req ({before / after:.1f}x)")
+    print(f"entry cache: {entry_cache_stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+"""Per-request render time with a cold vs warm template cache.
+
+Usage:
+    python -m backend.benchmarks.bench_template_cache [-n 200]
+
+"cold" drops the process-wide environment before every request (the old
+behaviour), "warm" reuses it, and "bundle" starts each request from a fresh
+environment backed by the precompiled template bundle.
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from backend.app.services import templates
+from backend.app.services.generator import AndroidProjectConfig, _render_files, build_project_context
+
+CONFIG = AndroidProjectConfig(
+    app_name="BenchApp",
+    package_name="com.example.bench",
+    description="benchmark",
+    min_sdk=24,
+    target_sdk=34,
+    prompt="Simple screen with a title and a button",
+)
+
+
+def _measure(ctx, iterations: int, make_env) -> list:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        env = make_env()
+        for _ in _render_files(env, ctx):
+            pass
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    ctx = asyncio.run(build_project_context(CONFIG))
+
+    def cold():
+        templates.clear_template_cache()
+        return templates.get_jinja_env()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle = Path(tmp) / "templates.zip"
+        templates.compile_template_bundle(bundle)
+        modes = {
+            "cold": cold,
+            "warm": templates.get_jinja_env,
+            "bundle": lambda: templates.create_jinja_env(bundle=str(bundle)),
+        }
+        for name, make_env in modes.items():
+            samples = _measure(ctx, args.iterations, make_env)
+            print(
+                f"{name:>6}: median {statistics.median(samples):.3f} ms, "
+                f"p95 {sorted(samples)[int(len(samples) * 0.95) - 1]:.3f} ms per request"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
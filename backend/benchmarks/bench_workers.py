@@ -0,0 +1,111 @@
+"""Generation throughput against the number of uvicorn worker processes.
+
+Usage:
+    python -m backend.benchmarks.bench_workers [-w 1,2,4] [-c 32] [-d 10]
+
+For each worker count a server is started on a free port with no LLM keys (the
+fallback layout, so the numbers are render + compression only). Workers share
+one SQLite LLM cache and job directory as in the Docker image. Requests use
+distinct app names so neither the single-flight nor the entry cache can
+collapse them. Throughput should grow with the worker count up to the number of
+cores available.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+FORM = {"package_name": "com.example.bench", "prompt": "Simple screen with a title and a button"}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{url}/readyz")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not become ready")
+
+
+async def _load(url: str, concurrency: int, duration: float) -> int:
+    counter = itertools.count()
+    done = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def user(n: int) -> None:
+            nonlocal done
+            # Distinct client ids so the per-client admission queue does not throttle the run
+            headers = {"X-Client-Id": f"bench-{n}"}
+            while time.monotonic() < deadline:
+                data = {**FORM, "app_name": f"Bench{next(counter)}"}
+                resp = await client.post(f"{url}/generate", data=data, headers=headers)
+                resp.raise_for_status()
+                done += 1
+
+        await asyncio.gather(*(user(n) for n in range(concurrency)))
+    return done
+
+
+def _run(workers: int, concurrency: int, duration: float, cache_dir: str) -> float:
+    port = _free_port()
+    env = {k: v for k, v in os.environ.items() if k not in ("GEMINI_API_KEY", "OPENAI_API_KEY")}
+    env.update(
+        WEB_CONCURRENCY=str(workers),
+        LLM_CACHE_PATH=os.path.join(cache_dir, "llm-cache.sqlite"),
+        JOB_RESULT_DIR=os.path.join(cache_dir, "jobs"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        asyncio.run(_wait_ready(url))
+        started = time.perf_counter()
+        done = asyncio.run(_load(url, concurrency, duration))
+        return done / (time.perf_counter() - started)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main() -> int:
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-w", "--workers", default=",".join(str(n) for n in (1, 2, 4, 8) if n <= cores))
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-d", "--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{cores} cores, {args.concurrency} concurrent clients, {args.duration:.0f}s per run")
+    print(f"{'workers':>8} {'req/s':>9} {'speedup':>8}")
+    base = None
+    with tempfile.TemporaryDirectory(prefix="bench_workers_") as cache_dir:
+        for workers in (int(n) for n in args.workers.split(",")):
+            rate = _run(workers, args.concurrency, args.duration, cache_dir)
+            base = base or rate
+            print(f"{workers:>8} {rate:>9.1f} {rate / base:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
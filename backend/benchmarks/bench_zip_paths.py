@@ -0,0 +1,78 @@
+"""Compare the in-memory and on-disk zip paths of generate_android_project_zip.
+
+Usage:
+    python -m backend.benchmarks.bench_zip_paths [-n 200]
+
+Syscall counts are collected with ``strace -c -f`` when strace is available.
+"""
+import argparse
+import asyncio
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from backend.app.services.generator import AndroidProjectConfig, generate_android_project_zip
+
+CONFIG = AndroidProjectConfig(
+    app_name="BenchApp",
+    package_name="com.example.bench",
+    description="benchmark",
+    min_sdk=24,
+    target_sdk=34,
+    prompt="Simple screen with a title and a button",
+)
+
+
+async def _run(mode: str, iterations: int) -> float:
+    on_disk = mode == "disk"
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await generate_android_project_zip(CONFIG, on_disk=on_disk)
+    return time.perf_counter() - start
+
+
+def _count_syscalls(mode: str, iterations: int) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "strace.txt"
+        cmd = [
+            "strace", "-f", "-c", "-o", str(out),
+            sys.executable, "-m", "backend.benchmarks.bench_zip_paths",
+            "--mode", mode, "-n", str(iterations), "--no-strace",
+        ]
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        total = 0
+        for line in out.read_text().splitlines():
+            cols = line.split()
+            # "% time  seconds  usecs/call  calls  [errors]  syscall"
+            if len(cols) >= 5 and cols[-1] != "total" and cols[3].isdigit():
+                total += int(cols[3])
+        return total
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--mode", choices=["memory", "disk", "both"], default="both")
+    parser.add_argument("--no-strace", action="store_true")
+    args = parser.parse_args()
+
+    modes = ["memory", "disk"] if args.mode == "both" else [args.mode]
+    # Warm up imports and the fallback LLM path
+    asyncio.run(_run("memory", 1))
+
+    for mode in modes:
+        elapsed = asyncio.run(_run(mode, args.iterations))
+        line = f"{mode:>6}: {args.iterations / elapsed:8.1f} req/s ({elapsed * 1000 / args.iterations:.2f} ms/req)"
+        if not args.no_strace and shutil.which("strace"):
+            # Subtract interpreter startup and warm-up by diffing against a single iteration
+            calls = _count_syscalls(mode, args.iterations + 1) - _count_syscalls(mode, 1)
+            line += f", {calls / args.iterations:.0f} syscalls/req"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
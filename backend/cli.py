@@ -1,12 +1,110 @@
+import os
+import sys
+
+if __name__ == "__main__" and os.getenv("GENERATOR_DAEMON_SOCKET") and sys.argv[1:2] != ["daemon"]:
+    # Hand the command to a warm daemon before importing anything heavy
+    from backend.daemon import forward
+
+    _code = forward(os.environ["GENERATOR_DAEMON_SOCKET"], sys.argv[1:])
+    if _code is not None:
+        raise SystemExit(_code)
+
+import time
+
+_started = time.perf_counter()
+
 import asyncio
 from pathlib import Path
 import typer
 
-from backend.app.services.generator import AndroidProjectConfig, generate_android_project_zip
+_typer_seconds = time.perf_counter() - _started
 
+# The generator stack (Jinja, the LLM providers, httpx) is imported inside each
+# command so `--help` and unrelated commands do not pay for it
 app = typer.Typer(add_completion=False, help="AI Android Generator CLI")
 
 
+class _ImportTimer:
+    """Meta path hook timing imports per top-level package, like -X importtime.
+
+    A package's time includes what it imports from other packages; those are
+    listed on their own as well.
+    """
+
+    def __init__(self) -> None:
+        self.seconds = {}
+        self._roots = []
+
+    def find_spec(self, name, path=None, target=None):
+        import importlib.util
+
+        sys.meta_path.remove(self)
+        try:
+            spec = importlib.util.find_spec(name)
+        finally:
+            sys.meta_path.insert(0, self)
+        if spec is None or spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return None
+        loader, timer = spec.loader, self
+        exec_module = loader.exec_module
+
+        class Loader:
+            def __getattr__(self, attr):
+                return getattr(loader, attr)
+
+            def exec_module(self, module):
+                root = name.partition(".")[0]
+                outermost = root not in timer._roots
+                timer._roots.append(root)
+                started = time.perf_counter()
+                try:
+                    exec_module(module)
+                finally:
+                    timer._roots.pop()
+                    if outermost:
+                        timer.seconds[root] = timer.seconds.get(root, 0.0) + time.perf_counter() - started
+
+        spec.loader = Loader()
+        return spec
+
+    def report(self, total: float) -> None:
+        typer.echo(f"startup: typer {_typer_seconds * 1000:.1f} ms", err=True)
+        for root, seconds in sorted(self.seconds.items(), key=lambda item: -item[1])[:15]:
+            typer.echo(f"startup: import {root} {seconds * 1000:.1f} ms", err=True)
+        typer.echo(f"startup: command total {total * 1000:.1f} ms", err=True)
+
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile_startup: bool = typer.Option(False, "--profile-startup", help="In thời gian import từng package (stderr) khi lệnh kết thúc"),
+):
+    if not profile_startup:
+        return
+    timer = _ImportTimer()
+    sys.meta_path.insert(0, timer)
+    started = time.perf_counter()
+
+    def finish() -> None:
+        sys.meta_path.remove(timer)
+        timer.report(time.perf_counter() - started)
+
+    ctx.call_on_close(finish)
+
+
+def _run(coro):
+    async def runner():
+        try:
+            return await coro
+        finally:
+            # Only loaded when a provider or the jobs client was used
+            clients = sys.modules.get("backend.app.services.http_clients")
+            if clients is not None:
+                await clients.aclose_clients()
+
+    return asyncio.run(runner())
+
+
 @app.command("gen")
 def generate(
     app_name: str = typer.Option(..., "-n", "--app-name", help="Tên ứng dụng / Project name"),
@@ -16,7 +114,12 @@ def generate(
     min_sdk: int = typer.Option(24, "--min-sdk", help="Min SDK"),
     target_sdk: int = typer.Option(34, "--target-sdk", help="Target SDK"),
     out: Path = typer.Option(Path("android-project.zip"), "-o", "--out", help="Đường dẫn file zip output"),
+    server: str = typer.Option("", "--server", envvar="GENERATOR_API_URL", help="URL server để gửi job (/jobs) thay vì sinh cục bộ"),
+    compression: str = typer.Option("", "-z", "--compression", help="Chế độ nén: default, fast, small, store, parallel, tar.zst"),
 ):
+    from backend.app.services.archive import get_compression
+    from backend.app.services.generator import AndroidProjectConfig, generate_android_project_zip
+
     config = AndroidProjectConfig(
         app_name=app_name,
         package_name=package_name,
@@ -26,10 +129,152 @@ def generate(
         prompt=prompt,
     )
 
-    zip_bytes = asyncio.run(generate_android_project_zip(config))
+    try:
+        mode = get_compression(compression) if compression else None
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--compression") from None
+
+    if server:
+        if mode is not None:
+            raise typer.BadParameter("jobs on the server always return the default zip", param_hint="--compression")
+        from backend.app.services.jobs_client import generate_via_jobs
+
+        zip_bytes = _run(generate_via_jobs(server, config))
+    else:
+        zip_bytes = _run(generate_android_project_zip(config, compression=mode))
     out.write_bytes(zip_bytes)
     typer.echo(f"Wrote {out.resolve()} ({len(zip_bytes)} bytes)")
 
 
+@app.command("gen-diff")
+def generate_diff(
+    app_name: str = typer.Option(..., "-n", "--app-name", help="Tên ứng dụng / Project name"),
+    package_name: str = typer.Option(..., "-p", "--package-name", help="Android package name, ví dụ com.example.app"),
+    prompt: str = typer.Option(..., "-r", "--prompt", help="Yêu cầu UI/Chức năng"),
+    description: str = typer.Option("", "-d", "--description", help="Mô tả"),
+    min_sdk: int = typer.Option(24, "--min-sdk", help="Min SDK"),
+    target_sdk: int = typer.Option(34, "--target-sdk", help="Target SDK"),
+    manifest: Path = typer.Option(None, "-m", "--manifest", dir_okay=False, help="Manifest hash của lần sinh trước (mặc định: <apply>/.generator-manifest.json)"),
+    fmt: str = typer.Option("zip", "--format", help="Định dạng patch: zip hoặc json"),
+    out: Path = typer.Option(None, "-o", "--out", help="Đường dẫn file patch output"),
+    apply_dir: Path = typer.Option(None, "--apply", file_okay=False, help="Ghi trực tiếp các file thay đổi vào thư mục dự án đã giải nén"),
+):
+    import json
+
+    from backend.app.services.generator import AndroidProjectConfig, build_project_context
+    from backend.app.services.project_diff import MANIFEST_FILE, diff_project, parse_manifest
+
+    if fmt not in ("zip", "json"):
+        raise typer.BadParameter("expected zip or json", param_hint="--format")
+    if manifest is None and apply_dir is not None and (apply_dir / MANIFEST_FILE).exists():
+        manifest = apply_dir / MANIFEST_FILE
+    try:
+        previous = parse_manifest(manifest.read_text(encoding="utf-8") if manifest else "")
+    except (OSError, ValueError) as e:
+        raise typer.BadParameter(str(e), param_hint="--manifest") from None
+
+    config = AndroidProjectConfig(
+        app_name=app_name,
+        package_name=package_name,
+        description=description,
+        min_sdk=min_sdk,
+        target_sdk=target_sdk,
+        prompt=prompt,
+    )
+    diff = diff_project(_run(build_project_context(config)), previous)
+    typer.echo(
+        f"{len(diff.added)} added, {len(diff.modified)} modified, {len(diff.removed)} removed, "
+        f"{len(diff.unchanged)} unchanged"
+    )
+
+    if apply_dir is not None:
+        # Only changed files are rewritten so unchanged ones keep their timestamps
+        diff.apply(apply_dir)
+        typer.echo(f"Applied to {apply_dir.resolve()}")
+    if out is not None or apply_dir is None:
+        out = out or Path(f"android-project.patch.{fmt}")
+        if fmt == "json":
+            out.write_text(json.dumps(diff.as_json(), indent=2), encoding="utf-8")
+        else:
+            out.write_bytes(diff.patch_zip())
+        typer.echo(f"Wrote {out.resolve()}")
+
+
+@app.command("gen-batch")
+def generate_batch(
+    manifest: Path = typer.Argument(..., exists=True, dir_okay=False, help="File JSONL hoặc CSV, mỗi dòng một cấu hình dự án"),
+    out_dir: Path = typer.Option(Path("generated-projects"), "-o", "--out-dir", help="Thư mục chứa các file zip"),
+    concurrency: int = typer.Option(4, "-c", "--concurrency", help="Số lời gọi LLM chạy song song"),
+    processes: int = typer.Option(None, "-j", "--processes", help="Số process nén zip (0 = nén trong process chính)"),
+):
+    from backend.app.services.batch import load_manifest, run_batch
+
+    entries = load_manifest(manifest)
+
+    def report(result):
+        if result.error is None:
+            typer.echo(f"[ok]   #{result.index} {result.name} -> {result.path} ({result.size} bytes, {result.seconds:.2f}s)")
+        else:
+            typer.echo(f"[fail] #{result.index} {result.name}: {result.error}", err=True)
+
+    summary = _run(run_batch(entries, out_dir, concurrency=concurrency, processes=processes, on_result=report))
+    typer.echo(
+        f"Generated {summary.succeeded}/{len(summary.results)} projects in {summary.elapsed:.2f}s "
+        f"({summary.throughput:.2f} projects/s, {summary.total_bytes} bytes), {summary.failed} failed"
+    )
+    if summary.failed:
+        raise typer.Exit(code=1)
+
+
+@app.command("compile-templates")
+def compile_templates(
+    out: Path = typer.Option(Path("templates.bundle.zip"), "-o", "--out", help="Đường dẫn bundle template đã biên dịch"),
+):
+    from backend.app.services.templates import compile_template_bundle
+
+    count = compile_template_bundle(out)
+    typer.echo(f"Compiled {count} templates into {out.resolve()} (set TEMPLATES_BUNDLE to use it)")
+
+
+@app.command("daemon")
+def daemon(
+    socket_path: Path = typer.Option(None, "--socket", envvar="GENERATOR_DAEMON_SOCKET", help="Unix socket để lắng nghe (mặc định trong thư mục tmp)"),
+    idle_timeout: float = typer.Option(0, "--idle-timeout", help="Tự thoát sau N giây không có lệnh (0 = chạy mãi)"),
+    stop: bool = typer.Option(False, "--stop", help="Dừng daemon đang chạy"),
+):
+    """Giữ một process đã nạp sẵn generator; đặt GENERATOR_DAEMON_SOCKET để các lệnh khác chạy qua nó."""
+    from backend import daemon as warm
+
+    socket_path = socket_path or warm.default_socket_path()
+    if stop:
+        if not warm.stop(str(socket_path)):
+            typer.echo(f"No daemon on {socket_path}", err=True)
+            raise typer.Exit(code=1)
+        typer.echo(f"Stopped daemon on {socket_path}")
+        return
+
+    from backend.app.services.compose_validator import template_scope
+    from backend.app.services.generator import warm_entry_cache
+
+    started = time.perf_counter()
+    entries = warm_entry_cache()
+    template_scope()
+
+    def run(argv):
+        return app(args=argv, prog_name="backend.cli", standalone_mode=True)
+
+    def ready():
+        typer.echo(
+            f"Warm daemon on {socket_path} ({entries} prebuilt entries, {time.perf_counter() - started:.2f}s); "
+            f"export GENERATOR_DAEMON_SOCKET={socket_path}"
+        )
+
+    try:
+        served = warm.serve(socket_path, run, idle_timeout=idle_timeout, on_ready=ready)
+    except RuntimeError as e:
+        raise typer.BadParameter(str(e), param_hint="--socket") from None
+    typer.echo(f"Daemon exiting after {served} commands")
+
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
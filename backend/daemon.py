@@ -0,0 +1,141 @@
+"""Warm CLI daemon.
+
+``python -m backend.cli daemon`` imports the generator stack once, warms the
+template and entry caches and then serves CLI invocations over a Unix socket.
+With ``GENERATOR_DAEMON_SOCKET`` pointing at that socket, ``python -m
+backend.cli ...`` forwards its arguments and working directory to the daemon
+before importing anything heavy, and prints what the command printed there.
+Commands run one at a time, in the daemon's environment (API keys included).
+
+This module is imported by the forwarding client, so it must stay cheap.
+"""
+from pathlib import Path
+from typing import Callable, List, Optional
+import json
+import os
+import socket
+import tempfile
+
+DAEMON_SOCKET_ENV = "GENERATOR_DAEMON_SOCKET"
+
+
+def default_socket_path() -> Path:
+    return Path(tempfile.gettempdir()) / f"android-generator-{os.getuid()}.sock"
+
+
+def _read_message(sock: socket.socket) -> Optional[dict]:
+    buffer = bytearray()
+    while not buffer.endswith(b"\n"):
+        chunk = sock.recv(65536)
+        if not chunk:
+            return None
+        buffer += chunk
+    return json.loads(buffer)
+
+
+def _send_message(sock: socket.socket, message: dict) -> None:
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def forward(socket_path: str, argv: List[str]) -> Optional[int]:
+    """Run ``argv`` in the daemon; ``None`` when no daemon is listening."""
+    import sys
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    with sock:
+        _send_message(sock, {"argv": argv, "cwd": os.getcwd()})
+        reply = _read_message(sock)
+    if reply is None:
+        print(f"daemon at {socket_path} closed the connection", file=sys.stderr)
+        return 1
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    return int(reply["exit"])
+
+
+def stop(socket_path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return False
+    with sock:
+        _send_message(sock, {"stop": True})
+        return _read_message(sock) is not None
+
+
+def _run_command(run: Callable[[List[str]], int], argv: List[str], cwd: str) -> dict:
+    import contextlib
+    import io
+    import traceback
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    previous = os.getcwd()
+    try:
+        os.chdir(cwd)
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                code = run(argv)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    finally:
+        os.chdir(previous)
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "exit": code}
+
+
+def serve(socket_path: Path, run: Callable[[List[str]], int], idle_timeout: float = 0, on_ready: Callable[[], None] = None) -> int:
+    """Serve commands until idle for ``idle_timeout`` seconds (0 = forever); returns the count served."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(socket_path))
+    except OSError:
+        socket_path.unlink(missing_ok=True)
+    else:
+        raise RuntimeError(f"a daemon is already listening on {socket_path}")
+    finally:
+        probe.close()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o077)  # only this user may connect
+    try:
+        server.bind(str(socket_path))
+    finally:
+        os.umask(old_umask)
+    server.listen(16)
+    server.settimeout(idle_timeout or None)
+    if on_ready is not None:
+        on_ready()
+
+    served = 0
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                return served
+            with conn:
+                conn.settimeout(None)
+                request = _read_message(conn)
+                if request is None:
+                    continue
+                if request.get("stop"):
+                    _send_message(conn, {"stopped": True, "served": served})
+                    return served
+                reply = _run_command(run, request["argv"], request["cwd"])
+                try:
+                    _send_message(conn, reply)
+                except OSError:
+                    pass
+                served += 1
+    finally:
+        server.close()
+        socket_path.unlink(missing_ok=True)
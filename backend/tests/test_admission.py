@@ -0,0 +1,69 @@
+import asyncio
+import io
+import zipfile
+
+import httpx
+
+from backend.app.main import app
+from backend.app.services import generator
+from backend.app.services.admission import Admission, FairLimiter, set_admission
+from backend.app.services.llm import ComposeResult
+
+
+def test_fair_limiter_serves_clients_round_robin():
+    limiter = FairLimiter("test", slots=1, max_queue=10, max_queue_per_client=10)
+    order = []
+
+    async def job(client, tag):
+        async with limiter.slot(client):
+            order.append(tag)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        holder = asyncio.ensure_future(job("a", "a0"))
+        await asyncio.sleep(0)
+        jobs = [asyncio.ensure_future(job("a", f"a{i}")) for i in range(1, 4)]
+        await asyncio.sleep(0)
+        jobs.append(asyncio.ensure_future(job("b", "b1")))
+        await asyncio.gather(holder, *jobs)
+
+    asyncio.run(run())
+    assert order == ["a0", "a1", "b1", "a2", "a3"]
+    assert limiter.stats()["queue_depth"] == 0 and limiter.stats()["active"] == 0
+
+
+def test_generate_load_sheds_excess_requests(monkeypatch):
+    state = {"running": 0, "peak": 0}
+
+    async def stub_llm(prompt, use_cache=True):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.05)
+        state["running"] -= 1
+        return ComposeResult('Column { Text("stub") }', "stub")
+
+    monkeypatch.setattr(generator, "generate_compose_result", stub_llm)
+    set_admission(Admission(llm_slots=2, render_slots=1, max_queue=4, max_queue_per_client=10))
+
+    async def one(client, i):
+        form = {"app_name": "Load", "package_name": "com.example.load", "prompt": f"screen {i}"}
+        return await client.post("/generate", data=form)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(one(client, i) for i in range(12)))
+
+    try:
+        responses = asyncio.run(run())
+    finally:
+        set_admission(None)
+
+    ok = [r for r in responses if r.status_code == 200]
+    shed = [r for r in responses if r.status_code == 503]
+    assert len(ok) + len(shed) == len(responses)
+    assert len(ok) == 6  # 2 running + 4 queued
+    assert all(int(r.headers["Retry-After"]) >= 1 for r in shed)
+    assert state["peak"] == 2
+    for r in ok:
+        assert zipfile.ZipFile(io.BytesIO(r.content)).testzip() is None
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import shutil
+from pathlib import Path
+
+from backend.ai_fixer import (
+    TEMPLATE_PREFIX,
+    TEMPLATES_ROOT,
+    FixCache,
+    build_prompt,
+    extract_error_blocks,
+    implicated_templates,
+    propose_fix,
+)
+
+MAIN = "app/src/main/java/MainActivity.kt.j2"
+
+LOG = """> Task :app:compileDebugKotlin FAILED
+e: file:///home/runner/work/app/generated/app/src/main/java/com/example/app/MainActivity.kt:12:5 Unresolved reference: LazyVerticalGrid
+e: file:///home/runner/work/app/generated/app/src/main/java/com/example/app/MainActivity.kt:12:5 Unresolved reference: LazyVerticalGrid
+Downloading https://services.gradle.org/distributions/gradle-8.7-bin.zip
+.....................................................................
+FAILURE: Build failed with an exception.
+
+* What went wrong:
+Execution failed for task ':app:compileDebugKotlin'.
+> Compilation error. See log for more details
+
+* Try:
+> Run with --stacktrace option to get the stack trace.
+"""
+
+
+def _templates(tmp_path: Path) -> Path:
+    root = tmp_path / "android"
+    shutil.copytree(TEMPLATES_ROOT, root)
+    return root
+
+
+def _answer(content: str) -> str:
+    return json.dumps({"edits": [{"path": TEMPLATE_PREFIX + MAIN, "new_content": content}]})
+
+
+def test_extracts_error_blocks_and_sends_only_implicated_templates():
+    blocks = extract_error_blocks(LOG)
+    assert len(blocks) == 2
+    assert "Unresolved reference: LazyVerticalGrid" in blocks[0].text
+    assert blocks[0].templates == [MAIN]
+    assert implicated_templates(blocks) == [MAIN]
+
+    prompt = build_prompt(blocks, implicated_templates(blocks))
+    assert "MainActivity.kt.j2" in prompt
+    assert "settings.gradle.kts.j2" not in prompt
+    assert "Downloading" not in prompt
+
+
+def test_best_valid_candidate_wins_and_is_cached(tmp_path):
+    root = _templates(tmp_path)
+    original = (root / MAIN).read_text()
+    fixed = original.replace("import", "import androidx.compose.foundation.lazy.grid.LazyVerticalGrid\nimport", 1)
+    answers = {
+        0.1: _answer(original.replace("{{ package_name }}", "{{ missing_variable }}")),  # breaks rendering
+        0.5: _answer(fixed),
+        0.8: "not json",
+    }
+    calls = []
+
+    async def stub(prompt, temperature):
+        calls.append(temperature)
+        await asyncio.sleep(0.01)
+        return answers[temperature]
+
+    blocks = extract_error_blocks(LOG)
+    cache = FixCache(str(tmp_path / "cache"))
+    best, cached = asyncio.run(propose_fix(blocks, stub, candidates=3, cache=cache, root=root))
+    assert not cached and best.valid
+    assert best.edits[0]["new_content"] == fixed
+    assert sorted(calls) == [0.1, 0.5, 0.8]
+
+    # The same errors against the same templates are answered from the cache
+    again, cached = asyncio.run(propose_fix(blocks, stub, candidates=3, cache=cache, root=root))
+    assert cached and again.edits == best.edits
+    assert len(calls) == 3
+
+
+def test_no_valid_candidate_is_not_cached(tmp_path):
+    root = _templates(tmp_path)
+
+    async def stub(prompt, temperature):
+        return _answer("fun broken( {")
+
+    cache = FixCache(str(tmp_path / "cache"))
+    best, _ = asyncio.run(propose_fix(extract_error_blocks(LOG), stub, candidates=2, cache=cache, root=root))
+    assert not best.valid and best.problems
+    assert not (tmp_path / "cache").exists()
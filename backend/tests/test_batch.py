@@ -0,0 +1,44 @@
+import asyncio
+import io
+import zipfile
+from pathlib import Path
+
+from backend.app.services.batch import load_manifest, run_batch
+
+
+def test_load_manifest_reads_jsonl_and_csv(tmp_path: Path):
+    jsonl = tmp_path / "apps.jsonl"
+    jsonl.write_text(
+        '{"app_name": "One", "package_name": "com.example.one", "prompt": "list", "min_sdk": "26"}\n'
+        "\n"
+        '{"app_name": "Broken"}\n',
+        encoding="utf-8",
+    )
+    entries = load_manifest(jsonl)
+    assert entries[0].config.min_sdk == 26 and entries[0].config.target_sdk == 34
+    assert entries[1].config is None and "package_name" in entries[1].error
+
+    csv_file = tmp_path / "apps.csv"
+    csv_file.write_text("app_name,package_name,prompt,out\nTwo,com.example.two,grid,two.zip\n", encoding="utf-8")
+    (entry,) = load_manifest(csv_file)
+    assert entry.config.app_name == "Two" and entry.out == "two.zip"
+
+
+def test_run_batch_isolates_failures(tmp_path: Path):
+    manifest = tmp_path / "apps.jsonl"
+    manifest.write_text(
+        '{"app_name": "One", "package_name": "com.example.one", "prompt": "list"}\n'
+        "not json\n"
+        '{"app_name": "Two", "package_name": "com.example.two", "prompt": "grid"}\n',
+        encoding="utf-8",
+    )
+    seen = []
+    summary = asyncio.run(
+        run_batch(load_manifest(manifest), tmp_path / "out", concurrency=2, processes=0, on_result=seen.append)
+    )
+
+    assert (summary.succeeded, summary.failed) == (2, 1)
+    assert len(seen) == 3
+    for result in summary.results:
+        if result.error is None:
+            assert zipfile.ZipFile(io.BytesIO(result.path.read_bytes())).testzip() is None
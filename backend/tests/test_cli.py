@@ -0,0 +1,53 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import threading
+
+from backend import daemon
+
+
+def test_cli_import_does_not_load_generator_stack():
+    code = (
+        "import sys, backend.cli; "
+        "print(sorted(m for m in ('jinja2', 'httpx', 'openai', 'backend.app.services.generator') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+
+def test_daemon_runs_forwarded_commands_in_client_directory(tmp_path):
+    socket_path = tmp_path / "cli.sock"
+    seen = []
+
+    def run(argv):
+        seen.append((argv, os.getcwd()))
+        print("ran", *argv)
+        raise SystemExit(3 if argv == ["fail"] else 0)
+
+    ready = threading.Event()
+    server = threading.Thread(target=daemon.serve, args=(socket_path, run), kwargs={"on_ready": ready.set}, daemon=True)
+    server.start()
+    assert ready.wait(5)
+
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    out = io.StringIO()
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(out):
+            ok = daemon.forward(str(socket_path), ["gen", "-n", "A"])
+            failed = daemon.forward(str(socket_path), ["fail"])
+    finally:
+        os.chdir(previous)
+    assert daemon.stop(str(socket_path))
+    server.join(5)
+
+    assert (ok, failed) == (0, 3)
+    assert out.getvalue() == "ran gen -n A\nran fail\n"
+    assert seen[0] == (["gen", "-n", "A"], str(workdir))
+    assert not socket_path.exists()
+    # Nobody listening: the caller runs the command itself
+    assert daemon.forward(str(socket_path), ["gen"]) is None
@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+from backend.app.services import generator
+from backend.app.services.compose_validator import validate_compose
+from backend.app.services.llm import FALLBACK_TEMPLATE, PLACEHOLDER_COMPOSE, ComposeResult
+
+LIST_SCREEN = """import androidx.compose.foundation.lazy.LazyColumn
+val todos = remember { mutableStateListOf("a", "b") }
+LazyColumn(modifier = Modifier.fillMaxSize().background(Color.White)) {
+    items(todos) { todo ->
+        Row(Modifier.clickable { todos.remove(todo) }.padding(8.dp)) {
+            Icon(Icons.Default.Delete, contentDescription = null)
+            Text("$todo ${todo.length}", fontSize = 16.sp)
+        }
+    }
+}"""
+
+
+def test_known_good_output_passes_unchanged():
+    for source in (FALLBACK_TEMPLATE % "Title", PLACEHOLDER_COMPOSE):
+        check = validate_compose(source)
+        assert check.ok and not check.repairs and check.imports == ()
+
+
+def test_missing_imports_are_added():
+    check = validate_compose(LIST_SCREEN)
+    assert check.ok
+    assert not check.source.startswith("import")
+    assert set(check.imports) >= {
+        "androidx.compose.foundation.lazy.LazyColumn",
+        "androidx.compose.foundation.lazy.items",
+        "androidx.compose.foundation.clickable",
+        "androidx.compose.material.icons.filled.Delete",
+        "androidx.compose.ui.graphics.Color",
+        "androidx.compose.ui.unit.sp",
+    }
+
+
+def test_truncated_and_wrapped_output_is_repaired():
+    truncated = validate_compose('Column {\n  Button(onClick = {}) { Text("b")')
+    assert truncated.ok
+    assert validate_compose(truncated.source).repairs == []
+
+    wrapped = validate_compose('@Composable\nfun Screen() {\n  Column { Text("x") }\n}')
+    assert wrapped.ok and wrapped.source == 'Column { Text("x") }'
+
+
+def test_wildcard_imports_leave_the_screen_body():
+    check = validate_compose('import androidx.compose.material3.*\nColumn { Text("x") }')
+    assert check.ok and check.source == 'Column { Text("x") }'
+    assert check.imports == () and "moved import androidx.compose.material3.*" in check.repairs
+
+
+def test_uncompilable_output_is_rejected():
+    rejected = {
+        'Text("abc)': "unterminated string",
+        'Column { Text("a") )': "unexpected ')'",
+        'Column { AsyncImage(model = "x") }': "unknown name AsyncImage",
+        "import coil.compose.AsyncImage\nAsyncImage(model = 1)": "not available",
+        "import androidx.compose.foundation.lazy.*\nLazyColumn { }": "not available",
+        'fun helper() {}\nText("x")': "function declarations",
+        "Icon(Icons.Filled.Pets, null)": "Icons.Filled.Pets",
+        "val x = 1 -> 2": "outside a lambda",
+        "": "empty output",
+    }
+    for source, message in rejected.items():
+        check = validate_compose(source)
+        assert not check.ok, source
+        assert any(message in error for error in check.errors), (source, check.errors)
+
+
+def test_rejected_output_is_retried_once(monkeypatch):
+    prompts = []
+
+    async def stub_llm(prompt, use_cache=True):
+        prompts.append(prompt)
+        return ComposeResult('Column { AsyncImage(model = "x") }' if len(prompts) == 1 else LIST_SCREEN, "gemini")
+
+    monkeypatch.setattr(generator, "generate_compose_result", stub_llm)
+    config = generator.AndroidProjectConfig("RetryApp", "com.example.retry", "", 24, 34, "A todo list")
+    ctx = asyncio.run(generator.build_project_context(config))
+    assert len(prompts) == 2 and "unknown name AsyncImage" in prompts[1]
+    assert ctx["compose_inline"].startswith("val todos")
+    main = generator.render_project_files(ctx)["app/src/main/java/com/example/retry/MainActivity.kt"].decode()
+    assert "import androidx.compose.foundation.lazy.items\n" in main
+
+
+def test_output_aborted_for_its_size_is_retried(monkeypatch):
+    prompts = []
+
+    async def stub_llm(prompt, use_cache=True):
+        prompts.append(prompt)
+        if len(prompts) == 1:
+            return ComposeResult(PLACEHOLDER_COMPOSE, "gemini", rejected=("output exceeded 16384 bytes",))
+        return ComposeResult(LIST_SCREEN, "gemini")
+
+    monkeypatch.setattr(generator, "generate_compose_result", stub_llm)
+    config = generator.AndroidProjectConfig("RetryApp", "com.example.retry", "", 24, 34, "A todo list")
+    ctx = asyncio.run(generator.build_project_context(config))
+    assert len(prompts) == 2 and "output exceeded 16384 bytes" in prompts[1]
+    assert ctx["compose_inline"].startswith("val todos")
+
+
+def test_placeholder_when_retry_also_fails(monkeypatch):
+    async def stub_llm(prompt, use_cache=True):
+        return ComposeResult("Column { Broken(", "gemini")
+
+    monkeypatch.setattr(generator, "generate_compose_result", stub_llm)
+    config = generator.AndroidProjectConfig("RetryApp", "com.example.retry", "", 24, 34, "A todo list")
+    ctx = asyncio.run(generator.build_project_context(config))
+    assert ctx["compose_inline"] == PLACEHOLDER_COMPOSE and ctx["compose_imports"] == ()
+
+
+def _fake_provider(monkeypatch, respond):
+    from backend.app.services import llm
+    from backend.app.services.llm_cache import MemoryLRUCache, TieredCache, set_llm_cache
+
+    calls = []
+
+    async def fake(prompt):
+        calls.append(prompt)
+        return respond(prompt)
+
+    set_llm_cache(TieredCache(MemoryLRUCache()))
+    monkeypatch.setattr(llm, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(llm, "_call_fake", fake)
+    return calls
+
+
+def test_wrapped_composable_from_provider_is_unwrapped(monkeypatch, stub_server):
+    # Streamed through the real provider path: the stream guard must leave the
+    # wrapper to the validator instead of aborting into the placeholder
+    from backend.app.services import llm
+    from backend.app.services.http_clients import aclose_clients
+    from backend.app.services.llm_cache import MemoryLRUCache, TieredCache, set_llm_cache
+
+    body = '@Composable\nfun Body() {\n    Text("hi")\n}'
+    event = json.dumps({"candidates": [{"content": {"parts": [{"text": body}]}}]})
+    server = stub_server(lambda path, _: (200, {"Content-Type": "text/event-stream"}, f"data: {event}\r\n\r\n".encode()))
+    monkeypatch.setattr(llm, "GEMINI_API_BASE", server.url)
+    monkeypatch.setattr(llm, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "LLM_PROVIDER", "gemini")
+
+    async def run():
+        try:
+            return [await generator._validated_compose("Greeting") for _ in range(2)]
+        finally:
+            await aclose_clients()
+
+    set_llm_cache(TieredCache(MemoryLRUCache()))
+    try:
+        (result, inline, imports), (cached, _, _) = asyncio.run(run())
+    finally:
+        set_llm_cache(None)
+    assert (result.provider, inline, imports) == ("gemini", 'Text("hi")', ())
+    assert len(server.requests) == 1 and cached.cached
+
+
+def test_rejected_output_is_not_cached(monkeypatch):
+    from backend.app.services.llm_cache import set_llm_cache
+
+    def respond(prompt):
+        return LIST_SCREEN if "AsyncImage" in prompt else 'Column { AsyncImage(model = "x") }'
+
+    calls = _fake_provider(monkeypatch, respond)
+    try:
+        first = asyncio.run(generator._validated_compose("Photos"))
+        second = asyncio.run(generator._validated_compose("Photos"))
+    finally:
+        set_llm_cache(None)
+    assert first[1].startswith("val todos") and second[1].startswith("val todos")
+    # The rejected answer is asked for again; only the accepted retry comes from the cache
+    assert len(calls) == 3 and calls[2] == "Photos" and second[0].cached
@@ -0,0 +1,25 @@
+import asyncio
+
+from backend.app.services import llm
+from backend.app.services.compose_validator import validate_compose
+from backend.app.services.llm import FakeProviderSettings
+
+
+def test_fake_provider_is_deterministic_and_valid_compose(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(llm, "FAKE_PROVIDER", FakeProviderSettings(latency=0.01, output_bytes=900))
+
+    first = asyncio.run(llm.generate_compose_result("Settings screen $with symbols", use_cache=False))
+    second = asyncio.run(llm.generate_compose_result("Settings screen $with symbols", use_cache=False))
+
+    assert first.provider == "fake" and first.content == second.content
+    assert 900 <= len(first.content) < 1000
+    assert validate_compose(first.content).ok
+
+
+def test_fake_provider_failures_fall_back_to_template(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(llm, "FAKE_PROVIDER", FakeProviderSettings(latency=0.0, failure_rate=1.0))
+
+    result = asyncio.run(llm.generate_compose_result("Anything", use_cache=False))
+    assert result.provider == "fallback"
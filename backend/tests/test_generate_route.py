@@ -0,0 +1,128 @@
+import asyncio
+import io
+import zipfile
+
+import httpx
+
+from backend.app.main import app
+from backend.app.services.generator import (
+    AndroidProjectConfig,
+    build_project_context,
+    generate_android_project_zip,
+    iter_project_zip,
+)
+
+FORM = {
+    "app_name": "DemoApp",
+    "package_name": "com.example.demo",
+    "prompt": "Simple screen with a title and a button",
+    "description": "desc",
+    "min_sdk": "24",
+    "target_sdk": "34",
+}
+
+
+async def _stream_generate():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async with client.stream("POST", "/generate", data=FORM) as resp:
+            assert resp.status_code == 200
+            assert resp.headers["content-type"] == "application/zip"
+            return [chunk async for chunk in resp.aiter_raw()]
+
+
+def test_generate_streams_valid_zip_matching_buffered_output():
+    chunks = asyncio.run(_stream_generate())
+    streamed = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert streamed.testzip() is None
+
+    config = AndroidProjectConfig(
+        app_name=FORM["app_name"],
+        package_name=FORM["package_name"],
+        description=FORM["description"],
+        min_sdk=24,
+        target_sdk=34,
+        prompt=FORM["prompt"],
+    )
+    buffered = zipfile.ZipFile(io.BytesIO(asyncio.run(generate_android_project_zip(config))))
+    assert streamed.namelist() == buffered.namelist()
+    for name in buffered.namelist():
+        assert streamed.read(name) == buffered.read(name)
+
+
+def test_identical_concurrent_generate_requests_share_one_context(monkeypatch):
+    from backend.app.services import generator
+
+    builds = []
+
+    async def slow_context(config):
+        builds.append(config.app_name)
+        await asyncio.sleep(0.2)
+        return await build_project_context(config)
+
+    monkeypatch.setattr(generator, "build_project_context", slow_context)
+    form = {**FORM, "app_name": "SharedApp"}
+
+    async def _post_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *(client.post("/generate", data=form, headers={"X-Client-Id": f"ci-{n}"}) for n in range(2))
+            )
+
+    first, second = asyncio.run(_post_twice())
+    assert first.status_code == second.status_code == 200
+    assert first.headers["x-llm-provider"] == second.headers["x-llm-provider"]
+    a, b = (zipfile.ZipFile(io.BytesIO(resp.content)) for resp in (first, second))
+    assert a.namelist() == b.namelist()
+    assert all(a.read(name) == b.read(name) for name in a.namelist())
+    assert builds == ["SharedApp"]
+
+
+def test_iter_project_zip_yields_one_chunk_per_file():
+    async def _collect():
+        config = AndroidProjectConfig(
+            app_name="DemoApp",
+            package_name="com.example.demo",
+            description="",
+            min_sdk=24,
+            target_sdk=34,
+            prompt="Simple screen",
+        )
+        ctx = await build_project_context(config)
+        return [chunk async for chunk in iter_project_zip(ctx)]
+
+    chunks = asyncio.run(_collect())
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    # Every file is emitted on its own, followed by the central directory
+    assert len(chunks) == len(archive.namelist()) + 1
+
+
+def test_generate_rejects_unknown_compression_mode():
+    async def _post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/generate", data={**FORM, "compression": "rar"})
+
+    resp = asyncio.run(_post())
+    assert resp.status_code == 422
+    assert "unknown compression mode" in resp.json()["detail"]
+
+
+async def _probe_health():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        app.state.ready, app.state.draining = True, False
+        ready = await client.get("/readyz")
+        app.state.draining = True
+        draining = await client.get("/readyz")
+        live = await client.get("/healthz")
+        app.state.ready, app.state.draining = False, False
+        return ready, draining, live
+
+
+def test_readiness_flips_while_draining_and_liveness_stays_up():
+    ready, draining, live = asyncio.run(_probe_health())
+    assert ready.status_code == 200 and ready.json()["status"] == "ready"
+    assert draining.status_code == 503 and draining.json()["status"] == "draining"
+    assert live.status_code == 200
@@ -22,4 +22,142 @@ def test_render_project_writes_files(tmp_path: Path):
     assert (base / "build.gradle.kts").exists()
     assert (base / "app" / "build.gradle.kts").exists()
     assert (base / "app" / "src" / "main" / "AndroidManifest.xml").exists()
-    assert (base / "app" / "src" / "main" / "res" / "values" / "strings.xml").exists()
\ No newline at end of file
+    assert (base / "app" / "src" / "main" / "res" / "values" / "strings.xml").exists()
+
+def test_in_memory_zip_matches_on_disk():
+    import io
+    import zipfile
+    from backend.app.services.generator import generate_android_project_zip
+
+    config = AndroidProjectConfig(
+        app_name="DemoApp",
+        package_name="com.example.demo",
+        description="desc",
+        min_sdk=24,
+        target_sdk=34,
+        prompt="Simple screen with a title and a button",
+    )
+    in_memory = zipfile.ZipFile(io.BytesIO(asyncio.run(generate_android_project_zip(config))))
+    on_disk = zipfile.ZipFile(io.BytesIO(asyncio.run(generate_android_project_zip(config, on_disk=True))))
+
+    disk_files = {i.filename: on_disk.read(i) for i in on_disk.infolist() if not i.is_dir()}
+    mem_files = {i.filename: in_memory.read(i) for i in in_memory.infolist()}
+    assert mem_files == disk_files
+    assert "app/src/main/java/com/example/demo/MainActivity.kt" in mem_files
+
+
+def test_cached_entries_match_fresh_render():
+    import io
+    import zipfile
+    from backend.app.services.generator import build_project_context, entry_cache_stats, zip_project
+
+    def contents(data):
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        return {name: archive.read(name) for name in archive.namelist()}
+
+    config = AndroidProjectConfig(
+        app_name="CacheApp",
+        package_name="com.example.cache",
+        description="",
+        min_sdk=24,
+        target_sdk=34,
+        prompt="Simple screen",
+    )
+    ctx = asyncio.run(build_project_context(config))
+    zip_project(ctx)
+    hits = entry_cache_stats["hits"]
+    cached = zip_project(ctx)
+    # Everything except MainActivity.kt comes from the entry cache the second time
+    assert entry_cache_stats["hits"] - hits == 13
+    assert contents(cached) == contents(zip_project(ctx, use_cache=False))
+
+
+def test_compression_modes_produce_same_files():
+    import io
+    import tarfile
+    import zipfile
+
+    import pytest
+    from backend.app.services.archive import COMPRESSION_MODES, ZIP_STORED, get_compression
+    from backend.app.services.generator import archive_project, build_project_context
+
+    zstandard = pytest.importorskip("zstandard")
+    config = AndroidProjectConfig(
+        app_name="ModesApp",
+        package_name="com.example.modes",
+        description="",
+        min_sdk=24,
+        target_sdk=34,
+        prompt="Simple screen",
+    )
+    ctx = asyncio.run(build_project_context(config))
+    reference = zipfile.ZipFile(io.BytesIO(archive_project(ctx)))
+    expected = {name: reference.read(name) for name in reference.namelist()}
+
+    for mode in COMPRESSION_MODES:
+        data = archive_project(ctx, get_compression(mode))
+        if mode == "tar.zst":
+            raw = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+            with tarfile.open(fileobj=io.BytesIO(raw)) as tar:
+                files = {m.name: tar.extractfile(m).read() for m in tar.getmembers()}
+        else:
+            archive = zipfile.ZipFile(io.BytesIO(data))
+            assert archive.testzip() is None
+            files = {name: archive.read(name) for name in archive.namelist()}
+            if mode == "store":
+                assert {i.compress_type for i in archive.infolist()} == {ZIP_STORED}
+            if mode == "fast":
+                small = [i for i in archive.infolist() if i.file_size < 128]
+                assert small and all(i.compress_type == ZIP_STORED for i in small)
+        assert list(files) == list(expected), mode
+        assert files == expected, mode
+
+
+def test_available_compression_modes_depend_on_zstandard(monkeypatch):
+    from backend.app.services import archive
+
+    assert "tar.zst" in archive.available_compression_modes() or archive.zstandard is None
+    monkeypatch.setattr(archive, "zstandard", None)
+    modes = archive.available_compression_modes()
+    assert "tar.zst" not in modes and "default" in modes
+    for mode in modes:
+        archive.get_compression(mode)
+
+
+def test_archive_is_built_off_the_event_loop(monkeypatch):
+    import threading
+    from backend.app.services import generator
+
+    threads = []
+    build = generator.archive_project
+
+    def recording(ctx, compression=None):
+        threads.append(threading.current_thread())
+        return build(ctx, compression)
+
+    monkeypatch.setattr(generator, "archive_project", recording)
+    config = AndroidProjectConfig(
+        app_name="Offloaded",
+        package_name="com.example.offloaded",
+        description="",
+        min_sdk=24,
+        target_sdk=34,
+        prompt="Simple screen",
+    )
+    asyncio.run(generator.generate_android_project_zip(config))
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_bad_compression_setting_falls_back_to_default():
+    import os
+    import subprocess
+    import sys
+
+    code = (
+        "from backend.app.services import archive, generator; "
+        "print(generator.DEFAULT_COMPRESSION == archive.get_compression('default'))"
+    )
+    env = {**os.environ, "GENERATOR_COMPRESSION": "bogus"}
+    done = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, cwd=Path(__file__).parents[2])
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.strip() == "True" and "Ignoring GENERATOR_COMPRESSION" in done.stderr
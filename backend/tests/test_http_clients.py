@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+from backend.app.services import llm
+from backend.app.services.http_clients import aclose_clients, get_sync_client, close_sync_client
+
+
+def _gemini_reply(path, body):
+    payload = {"candidates": [{"content": {"parts": [{"text": "Column { Text(\"hi\") }"}]}}]}
+    return 200, {"Content-Type": "text/event-stream"}, f"data: {json.dumps(payload)}\n\n".encode()
+
+
+def test_gemini_calls_reuse_pooled_connection(stub_server, monkeypatch):
+    server = stub_server(_gemini_reply)
+    monkeypatch.setattr(llm, "GEMINI_API_BASE", server.url)
+    monkeypatch.setattr(llm, "GEMINI_API_KEY", "test-key")
+
+    async def run():
+        try:
+            return [await llm._call_gemini(f"prompt {i}") for i in range(3)]
+        finally:
+            await aclose_clients()
+
+    results = asyncio.run(run())
+    assert results == ["Column { Text(\"hi\") }"] * 3
+    assert len(server.requests) == 3
+    assert server.connections == 1
+
+
+def test_sync_client_reuses_connection(stub_server):
+    server = stub_server(_gemini_reply)
+    try:
+        for _ in range(3):
+            get_sync_client().post(server.url + "/x", json={}).raise_for_status()
+    finally:
+        close_sync_client()
+    assert server.connections == 1
+
+
+def test_clients_from_other_loops_are_closed(stub_server):
+    import threading
+    import time
+
+    from backend.app.services import http_clients
+
+    async def make_client():
+        return http_clients.get_async_client()
+
+    # A loop still running in another thread closes its own client
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+    try:
+        running = asyncio.run_coroutine_threadsafe(make_client(), other).result(5)
+        asyncio.run(aclose_clients())
+        for _ in range(100):
+            if running.is_closed:
+                break
+            time.sleep(0.01)
+        assert running.is_closed
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(5)
+        other.close()
+
+    # A finished loop cannot run aclose(); its pooled connections are closed anyway
+    server = stub_server(_gemini_reply)
+
+    async def request():
+        (await http_clients.get_async_client().post(server.url + "/x", json={})).raise_for_status()
+
+    asyncio.run(request())
+    assert server.connections == 1 and server.closed == 0
+    asyncio.run(aclose_clients())
+    for _ in range(100):
+        if server.closed:
+            break
+        time.sleep(0.01)
+    assert server.closed == 1
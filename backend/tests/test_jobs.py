@@ -0,0 +1,119 @@
+import asyncio
+import io
+import zipfile
+
+import httpx
+
+from backend.app.main import app
+from backend.app.services.generator import AndroidProjectConfig
+from backend.app.services.jobs import JobManager, ResultStore, set_job_manager
+
+FORM = {"app_name": "JobApp", "package_name": "com.example.job", "prompt": "Simple screen"}
+
+
+async def _run_job_flow():
+    manager = JobManager(workers=2)
+    set_job_manager(manager)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/jobs", data=FORM)
+            again = await client.post("/jobs", data=FORM)
+            job_id = first.json()["id"]
+
+            status = first.json()
+            while status["status"] not in ("done", "failed"):
+                await asyncio.sleep(0.01)
+                status = (await client.get(f"/jobs/{job_id}")).json()
+
+            events = (await client.get(f"/jobs/{job_id}/events")).text
+            result = await client.get(f"/jobs/{job_id}/result")
+            resubmitted = await client.post("/jobs", data=FORM)
+            missing = await client.get("/jobs/unknown")
+            return first, again, status, events, result, resubmitted, missing, manager.stats()
+    finally:
+        await manager.stop()
+        set_job_manager(None)
+
+
+def test_job_lifecycle_and_idempotent_submission():
+    first, again, status, events, result, resubmitted, missing, stats = asyncio.run(_run_job_flow())
+
+    assert first.status_code == 202
+    assert again.json()["id"] == first.json()["id"]
+    assert status["status"] == "done"
+    assert "event: status" in events and '"status": "done"' in events
+    assert result.headers["content-type"] == "application/zip"
+    assert zipfile.ZipFile(io.BytesIO(result.content)).testzip() is None
+    # A finished job is served from the result store instead of being regenerated
+    assert resubmitted.json()["status"] == "done"
+    assert missing.status_code == 404
+    assert stats["submitted"] == 1 and stats["reused"] == 2
+
+
+async def _run_shared_directory(tmp_path):
+    # Two managers over one result directory stand in for two uvicorn workers
+    first = JobManager(workers=1, store=ResultStore(directory=str(tmp_path)))
+    second = JobManager(workers=1, store=ResultStore(directory=str(tmp_path)))
+    try:
+        config = AndroidProjectConfig(
+            app_name="Shared", package_name="com.example.shared", description="", min_sdk=24, target_sdk=34, prompt="x"
+        )
+        job = first.submit(config)
+        assert await first.drain(5)
+        seen = second.get(job.id)
+        again = second.submit(config)
+        return job, seen, again, second.result(job.id), second.stats()
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+def test_jobs_are_visible_to_workers_sharing_the_result_directory(tmp_path):
+    job, seen, again, data, stats = asyncio.run(_run_shared_directory(tmp_path))
+
+    assert seen is not None and seen.remote and seen.status == "done"
+    assert again.id == job.id and again.remote
+    assert zipfile.ZipFile(io.BytesIO(data)).testzip() is None
+    assert stats["submitted"] == 0 and stats["reused"] == 1
+
+
+def test_every_worker_sweeps_expired_files_from_the_shared_directory(tmp_path):
+    import os
+    import time
+
+    writer = ResultStore(ttl=60, directory=str(tmp_path))
+    writer.put("old", b"zip")
+    writer.put_snapshot("old", {"id": "old"})
+    writer.put("new", b"zip")
+    stale = time.time() - 120
+    for name in ("old.zip", "old.job.json"):
+        os.utime(tmp_path / name, (stale, stale))
+
+    # The other worker never wrote these keys but still removes the expired one
+    sweeper = JobManager(workers=1, store=ResultStore(ttl=60, directory=str(tmp_path), sweep_interval=0))
+    assert sweeper.get("old") is None
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["new.zip"]
+
+
+async def _fetch_result(form):
+    manager = JobManager(workers=1)
+    set_job_manager(manager)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            job_id = (await client.post("/jobs", data=form)).json()["id"]
+            assert await manager.drain(10)
+            return await client.get(f"/jobs/{job_id}/result")
+    finally:
+        await manager.stop()
+        set_job_manager(None)
+
+
+def test_job_result_with_non_ascii_app_name():
+    result = asyncio.run(_fetch_result({**FORM, "app_name": "Ứng dụng Tôi; v2"}))
+
+    assert result.status_code == 200
+    assert result.headers["content-disposition"] == (
+        "attachment; filename=\"Ung_dung_Toi_v2.zip\"; filename*=UTF-8''%E1%BB%A8ng%20d%E1%BB%A5ng%20T%C3%B4i%3B%20v2.zip"
+    )
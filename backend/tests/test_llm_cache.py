@@ -0,0 +1,54 @@
+import asyncio
+import time
+from pathlib import Path
+
+from backend.app.services import llm
+from backend.app.services.llm_cache import MemoryLRUCache, SQLiteCache, TieredCache, make_cache_key, set_llm_cache
+
+
+def test_cache_key_normalizes_prompt_whitespace():
+    key = make_cache_key("Todo  list\n app", "gemini", "m", "sys", 0.3)
+    assert key == make_cache_key(" Todo list app ", "gemini", "m", "sys", 0.3)
+    assert key != make_cache_key("Todo list app", "openai", "m", "sys", 0.3)
+    assert key != make_cache_key("Todo list app", "gemini", "m", "sys", 0.7)
+
+
+def test_generate_compose_content_hits_cache(monkeypatch):
+    calls = []
+
+    async def fake_gemini(prompt: str) -> str:
+        calls.append(prompt)
+        return "Column { Text(\"hi\") }"
+
+    cache = TieredCache(MemoryLRUCache())
+    set_llm_cache(cache)
+    monkeypatch.setattr(llm, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "LLM_PROVIDER", "gemini")
+    monkeypatch.setattr(llm, "_call_gemini", fake_gemini)
+    try:
+        first = asyncio.run(llm.generate_compose_content_from_prompt("A todo list"))
+        second = asyncio.run(llm.generate_compose_content_from_prompt("A  todo list"))
+        asyncio.run(llm.generate_compose_content_from_prompt("A todo list", use_cache=False))
+    finally:
+        set_llm_cache(None)
+
+    assert first == second
+    assert len(calls) == 2
+    assert cache.stats.as_dict() == {"hits": 1, "misses": 1, "bypassed": 1}
+
+
+def test_sqlite_cache_ttl_and_size_eviction(tmp_path: Path):
+    cache = SQLiteCache(str(tmp_path / "llm.sqlite"), ttl=60, max_bytes=10)
+    cache.set("a", "12345")
+    time.sleep(0.01)
+    cache.set("b", "67890")
+    assert cache.get("a") == "12345"
+    time.sleep(0.01)
+    # "b" is now the least recently used entry and gets evicted
+    cache.set("c", "abcde")
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345"
+
+    expired = SQLiteCache(str(tmp_path / "expired.sqlite"), ttl=-1)
+    expired.set("a", "value")
+    assert expired.get("a") is None
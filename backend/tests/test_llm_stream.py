@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from backend.app.services import llm
+from backend.app.services.http_clients import aclose_clients
+from backend.app.services.llm_stream import (
+    ComposeStreamGuard,
+    MalformedOutputError,
+    OutputBudgetExceeded,
+    stream_totals,
+)
+
+
+def _sse(text, usage=None):
+    event = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+    if usage is not None:
+        event["usageMetadata"] = {"candidatesTokenCount": usage}
+    return f"data: {json.dumps(event)}\r\n\r\n".encode()
+
+
+def _serve(chunks, delay=0.0):
+    def respond(path, body):
+        def events():
+            for chunk in chunks:
+                yield chunk
+                time.sleep(delay)
+        return 200, {"Content-Type": "text/event-stream"}, events()
+    return respond
+
+
+async def _call(prompt):
+    try:
+        return await llm.generate_compose_result(prompt, use_cache=False)
+    finally:
+        await aclose_clients()
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    def use(server):
+        monkeypatch.setattr(llm, "GEMINI_API_BASE", server.url)
+        monkeypatch.setattr(llm, "GEMINI_API_KEY", "test-key")
+        monkeypatch.setattr(llm, "LLM_PROVIDER", "gemini")
+    return use
+
+
+def test_guard_strips_fences_split_across_chunks():
+    guard = ComposeStreamGuard(max_bytes=1000)
+    for chunk in ["Here:\n`", "``kot", "lin\nColumn {", " Text(\"a\") }\n`", "``"]:
+        guard.feed(chunk)
+    assert guard.result() == llm._strip_code_fences("Here:\n```kotlin\nColumn { Text(\"a\") }\n```")
+
+
+def test_guard_keeps_declarations_for_the_validator_and_rejects_oversized_output():
+    # A @Composable wrapper is the validator's to unwrap, not a reason to abort
+    guard = ComposeStreamGuard(max_bytes=1000)
+    for chunk in ["@Compos", "able\nfun Body() {", " Text(\"a\") }"]:
+        guard.feed(chunk)
+    assert guard.result() == "@Composable\nfun Body() { Text(\"a\") }"
+    guard = ComposeStreamGuard(max_bytes=8)
+    with pytest.raises(OutputBudgetExceeded):
+        guard.feed("Column { Text(\"too long\") }")
+
+
+def _feed(source, chunk_size):
+    guard = ComposeStreamGuard(max_bytes=1000)
+    for start in range(0, len(source), chunk_size):
+        guard.feed(source[start:start + chunk_size])
+    return guard.result()
+
+
+def test_guard_aborts_output_the_validator_cannot_repair():
+    accepted = (
+        'Column { Text("a) ${if (x) "}" else "]"}") /* ) */ }\n// ]\nval c = \'}\'',
+        '@Composable\nfun Body() { Row { Text(""" ) ""\"") }',
+        # Truncated, or closing setContent as well: both repaired by the validator
+        "Column { Row { Text(\"a\")",
+        "Column { Text(\"a\") }\n}\n)",
+        "items.forEach(::println)\nlist.fun()",
+    )
+    for source in accepted:
+        for chunk_size in (1, len(source)):
+            assert _feed(source, chunk_size) == source.strip(), (source, chunk_size)
+
+    rejected = {
+        'Column { Text("a") )': "expected the end of '{'",
+        "Column { }\n}\nText(\"after\")": "after the closing brackets",
+        "@Composable\nfun A() { Text(\"a\") }\n@Composable\nfun B() {": "more than one function",
+        "Column {\n  fun helper() = 1": "inside the screen body",
+    }
+    for source, message in rejected.items():
+        for chunk_size in (1, len(source)):
+            with pytest.raises(MalformedOutputError, match=message):
+                _feed(source + "\n", chunk_size)
+
+
+def test_streamed_gemini_output_is_assembled(stub_server, gemini):
+    server = stub_server(_serve([_sse("```kotlin\nColumn {"), _sse(" Text(\"hi\") }\n```", usage=7)]))
+    gemini(server)
+    tokens_before = stream_totals["output_tokens"]
+    assert asyncio.run(_call("hello")).content == "Column { Text(\"hi\") }"
+    assert stream_totals["output_tokens"] - tokens_before == 7
+    assert b"streamGenerateContent?alt=sse" in server.requests[0][0].encode()
+
+
+def test_oversized_stream_is_aborted_early(stub_server, gemini, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_OUTPUT_BYTES", 32)
+    chunks = [_sse("Column { Text(\"a long first chunk\")")] + [_sse(" Text(\"x\")")] * 5
+    gemini(stub_server(_serve(chunks, delay=0.5)))
+    start = time.perf_counter()
+    result = asyncio.run(_call("hello"))
+    # Reported as rejected so the generator spends its retry on it
+    assert result.content == llm.PLACEHOLDER_COMPOSE and result.rejected == ("output exceeded 32 bytes",)
+    # The remaining events would take 2.5s to arrive
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from backend.app.main import app
+from backend.app.services import tracing
+from backend.app.services.metrics import LLM_FALLBACKS, STAGE_SECONDS, Histogram, render_metrics
+
+FORM = {"app_name": "DemoApp", "package_name": "com.example.demo", "prompt": "A counter screen"}
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("test_render_seconds", "test histogram", labels=("stage",), buckets=(0.1, 1))
+    hist.observe(0.05, stage="a")
+    hist.observe(0.5, stage="a")
+    hist.observe(3, stage="a")
+    text = render_metrics()
+    assert 'test_render_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'test_render_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'test_render_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'test_render_seconds_count{stage="a"} 3' in text
+
+
+def test_metrics_endpoint_reports_stages_and_fallbacks():
+    fallbacks = LLM_FALLBACKS.value(reason="no_provider")
+    renders = STAGE_SECONDS.count(stage="render")
+
+    async def _run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert (await client.post("/generate", data=FORM)).status_code == 200
+            return await client.get("/metrics")
+
+    resp = asyncio.run(_run())
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    # No provider keys in tests: the fallback layout is counted instead of hidden
+    assert LLM_FALLBACKS.value(reason="no_provider") == fallbacks + 1
+    assert STAGE_SECONDS.count(stage="render") == renders + 1
+    for name in ("llm", "safety", "compress", "response"):
+        assert f'generator_stage_duration_seconds_count{{stage="{name}"}}' in resp.text
+    assert "generator_archive_bytes_bucket" in resp.text
+    assert 'generator_entry_cache_events_total{result="hits"}' in resp.text
+
+
+def test_spans_are_noop_without_collector():
+    assert not tracing.tracing_enabled()
+    assert tracing.span("render") is tracing.NOOP_SPAN
+
+
+def test_spans_export_to_collector(stub_server):
+    server = stub_server(lambda path, body: (200, {"Content-Type": "application/json"}, b"{}"))
+    exporter = tracing.configure_tracing(server.url)
+    try:
+        with tracing.span("generate", app="DemoApp"):
+            with tracing.span("render"):
+                pass
+        deadline = time.monotonic() + 10
+        while exporter.exported < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        tracing.configure_tracing("")
+
+    assert exporter.exported == 2
+    spans = [s for path, body in server.requests
+             for rs in json.loads(body)["resourceSpans"] for ss in rs["scopeSpans"] for s in ss["spans"]]
+    assert server.requests[0][0] == "/v1/traces"
+    by_name = {s["name"]: s for s in spans}
+    assert by_name["render"]["parentSpanId"] == by_name["generate"]["spanId"]
+    assert by_name["render"]["traceId"] == by_name["generate"]["traceId"]
@@ -0,0 +1,67 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import httpx
+
+from backend.app.main import app
+from backend.app.services.generator import AndroidProjectConfig, build_project_context
+from backend.app.services.project_diff import MANIFEST_FILE, PATCH_MANIFEST_NAME, diff_project, parse_manifest
+
+FORM = {"app_name": "DiffApp", "package_name": "com.example.diff", "prompt": "A list of notes"}
+MAIN_ACTIVITY = "app/src/main/java/com/example/diff/MainActivity.kt"
+
+
+def _ctx(**overrides):
+    config = AndroidProjectConfig(
+        app_name="DiffApp", package_name="com.example.diff", description="", min_sdk=24, target_sdk=34,
+        prompt="A list of notes",
+    )
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return asyncio.run(build_project_context(config))
+
+
+def test_prompt_change_only_touches_generated_screen():
+    first = diff_project(_ctx(), {})
+    assert first.modified == {} and len(first.added) == 14
+
+    second = diff_project(_ctx(prompt="A grid of photos"), first.manifest)
+    assert list(second.modified) == [MAIN_ACTIVITY]
+    assert not second.added and not second.removed
+    assert "app/build.gradle.kts" in second.unchanged
+
+
+def test_package_rename_reports_moved_file(tmp_path):
+    first = diff_project(_ctx(), {})
+    first.apply(tmp_path)
+    second = diff_project(_ctx(package_name="com.example.renamed"), parse_manifest((tmp_path / MANIFEST_FILE).read_text()))
+    assert second.removed == [MAIN_ACTIVITY]
+    assert "app/src/main/java/com/example/renamed/MainActivity.kt" in second.added
+
+    before = (tmp_path / "build.gradle.kts").stat().st_mtime_ns
+    second.apply(tmp_path)
+    assert not (tmp_path / MAIN_ACTIVITY).exists()
+    assert (tmp_path / "build.gradle.kts").stat().st_mtime_ns == before
+
+
+def test_diff_endpoint_returns_patch_and_json():
+    async def _run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            full = await client.post("/generate/diff", data={**FORM, "format": "json"})
+            manifest = json.dumps(full.json())
+            patch = await client.post("/generate/diff", data={**FORM, "prompt": "A settings screen", "manifest": manifest})
+            bad = await client.post("/generate/diff", data={**FORM, "manifest": "[1]"})
+            return full, patch, bad
+
+    full, patch, bad = asyncio.run(_run())
+    assert full.status_code == 200 and full.headers["x-changed-files"] == "14"
+    assert MAIN_ACTIVITY in full.json()["contents"]
+
+    assert patch.headers["x-changed-files"] == "1"
+    archive = zipfile.ZipFile(io.BytesIO(patch.content))
+    assert sorted(archive.namelist()) == sorted([MAIN_ACTIVITY, PATCH_MANIFEST_NAME])
+    assert json.loads(archive.read(PATCH_MANIFEST_NAME))["modified"] == [MAIN_ACTIVITY]
+    assert bad.status_code == 422
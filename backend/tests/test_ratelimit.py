@@ -0,0 +1,120 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+
+from backend.app.services import llm
+from backend.app.services.ratelimit import RateLimiter, RetryPolicy, set_rate_limiter
+
+OK = json.dumps({"candidates": [{"content": {"parts": [{"text": "Text(\"hi\")"}]}}]}).encode()
+
+
+def _quota_stub(per_window: int, window: float):
+    # Accepts `per_window` requests per fixed window, 429 with Retry-After otherwise
+    lock = threading.Lock()
+    state = {"start": time.monotonic(), "used": 0, "ok": 0, "limited": 0}
+
+    def respond(path, body):
+        with lock:
+            now = time.monotonic()
+            if now - state["start"] >= window:
+                state["start"], state["used"] = now, 0
+            if state["used"] >= per_window:
+                state["limited"] += 1
+                wait = window - (now - state["start"])
+                return 429, {"Retry-After": f"{wait:.3f}"}, b"{}"
+            state["used"] += 1
+            state["ok"] += 1
+        return 200, {"Content-Type": "application/json"}, OK
+
+    return respond, state
+
+
+async def _burst(url: str, limiter: RateLimiter, calls: int):
+    async with httpx.AsyncClient() as client:
+        async def one():
+            async def attempt():
+                r = await client.post(f"{url}/generate")
+                r.raise_for_status()
+                return r.status_code
+
+            return await limiter.call("gemini", "key", attempt, RetryPolicy(attempts=8, base_delay=0.05, max_wait=30))
+
+        return await asyncio.gather(*(one() for _ in range(calls)))
+
+
+def test_bursts_converge_on_the_quota_instead_of_retry_storms(stub_server):
+    respond, state = _quota_stub(per_window=10, window=0.5)
+    server = stub_server(respond)
+    limiter = RateLimiter(limits={})
+
+    started = time.monotonic()
+    results = asyncio.run(_burst(server.url, limiter, 40))
+    elapsed = time.monotonic() - started
+
+    assert results == [200] * 40
+    # The first burst is rejected once; after that callers are paced, not retried in lockstep
+    assert state["limited"] <= 40
+    assert elapsed < 8
+
+
+def test_retry_after_is_honoured(stub_server):
+    calls = []
+
+    def respond(path, body):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return 429, {"Retry-After": "0.3"}, b"{}"
+        return 200, {}, OK
+
+    server = stub_server(respond)
+    asyncio.run(_burst(server.url, RateLimiter(limits={}), 1))
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.3
+
+
+def test_circuit_opens_after_repeated_server_errors(stub_server):
+    server = stub_server(lambda path, body: (503, {}, b"{}"))
+    limiter = RateLimiter(limits={})
+    policy = RetryPolicy(attempts=1)
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            async def attempt():
+                (await client.post(server.url)).raise_for_status()
+
+            outcomes = []
+            for _ in range(6):
+                try:
+                    await limiter.call("gemini", "key", attempt, policy)
+                except Exception as e:
+                    outcomes.append(type(e).__name__)
+            return outcomes
+
+    outcomes = asyncio.run(run())
+    assert outcomes == ["HTTPStatusError"] * 5 + ["CircuitOpen"]
+    assert len(server.requests) == 5
+
+
+def test_gemini_provider_retries_429_instead_of_falling_back(stub_server, monkeypatch):
+    attempts = []
+
+    def respond(path, body):
+        attempts.append(path)
+        if len(attempts) == 1:
+            return 429, {"Retry-After": "0"}, b"{}"
+        event = b"data: " + OK + b"\n\n"
+        return 200, {"Content-Type": "text/event-stream"}, [event]
+
+    server = stub_server(respond)
+    monkeypatch.setattr(llm, "GEMINI_API_BASE", server.url)
+    monkeypatch.setattr(llm, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "LLM_PROVIDER", "gemini")
+    set_rate_limiter(RateLimiter(limits={}))
+    try:
+        result = asyncio.run(llm.generate_compose_result("retry me", use_cache=False))
+    finally:
+        set_rate_limiter(None)
+    assert result.provider == "gemini" and result.content == 'Text("hi")'
+    assert len(attempts) == 2
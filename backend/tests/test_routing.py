@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from backend.app.services.routing import AllProvidersFailed, LLMRouter
+
+
+def _provider(result, delay=0.0, log=None, name=None):
+    async def call():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(f"{name} cancelled")
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return call
+
+
+def test_slow_primary_is_hedged_and_loser_cancelled():
+    router = LLMRouter(hedge_budget=1.0, hedge_delay=0.05)
+    log = []
+    calls = {
+        "gemini": _provider("slow", delay=1.0, log=log, name="gemini"),
+        "openai": _provider("fast", delay=0.01),
+    }
+
+    async def run():
+        result = await router.call(calls)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == ("openai", "fast")
+    assert log == ["gemini cancelled"]
+    assert router.stats()["hedged"] == 1
+    assert router.stats()["hedge_wins"] == 1
+
+
+def test_hedging_respects_budget():
+    router = LLMRouter(hedge_budget=0.0, hedge_delay=0.01)
+    router._hedge_tokens = 0
+    calls = {"gemini": _provider("slow", delay=0.1), "openai": _provider("fast")}
+    assert asyncio.run(router.call(calls)) == ("gemini", "slow")
+    assert router.stats()["hedged"] == 0
+
+
+def test_errors_fall_back_and_reorder_providers():
+    router = LLMRouter(hedge=False)
+    calls = {"gemini": _provider(RuntimeError("down")), "openai": _provider("ok")}
+    for _ in range(3):
+        assert asyncio.run(router.call(calls)) == ("openai", "ok")
+    assert router.stats()["fallbacks"] >= 1
+    assert router.order(["gemini", "openai"]) == ["openai", "gemini"]
+    assert router.stats()["providers"]["gemini"]["error_rate"] == 1.0
+
+
+def test_all_providers_failing_raises():
+    router = LLMRouter(hedge=False)
+    calls = {"gemini": _provider(RuntimeError("a")), "openai": _provider("")}
+    with pytest.raises(AllProvidersFailed) as info:
+        asyncio.run(router.call(calls))
+    assert set(info.value.errors) == {"gemini", "openai"}
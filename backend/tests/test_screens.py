@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+from backend.app.services import generator, llm
+from backend.app.services.generator import AndroidProjectConfig, build_project_context, render_project_files
+from backend.app.services.llm_cache import MemoryLRUCache, TieredCache, set_llm_cache
+from backend.app.services.screens import NAV_BOTTOM_BAR, NAV_SINGLE, NAV_TABS, plan_screens
+
+SHOP_PROMPT = """Shop app with bottom navigation
+- Catalog: a grid of products with prices
+- Cart screen: item rows and a checkout button
+- Account: order history
+Use a blue theme."""
+
+
+def _config(prompt: str) -> AndroidProjectConfig:
+    return AndroidProjectConfig("Shop", "com.example.shop", "", 24, 34, prompt)
+
+
+def test_plan_screens_from_lists_bullets_and_known_names():
+    assert plan_screens("Profile screen with an avatar and a follow button").screens == ()
+    assert plan_screens("Recipe app\n- Color: blue\n- Font: serif").navigation == NAV_SINGLE
+
+    listed = plan_screens("Notes app with tabs\nScreens: Notes, Settings")
+    assert listed.navigation == NAV_TABS
+    assert [(s.function, s.icon) for s in listed.screens] == [("NotesScreen", "Star"), ("SettingsScreen", "Settings")]
+
+    bullets = plan_screens(SHOP_PROMPT + "\n- Color: blue")
+    assert bullets.navigation == NAV_BOTTOM_BAR
+    assert [s.name for s in bullets.screens] == ["Catalog", "Cart", "Account"]
+    assert "checkout button" in bullets.screens[1].prompt and "checkout" not in bullets.screens[0].prompt
+    assert all("Use a blue theme." in s.prompt for s in bullets.screens)
+
+    known = plan_screens("Todo app with a bottom bar: home screen, settings tab, about page\nSettings screen has a dark mode")
+    assert [s.name for s in known.screens] == ["Home", "Settings", "About"]
+    assert "dark mode" in known.screens[1].prompt and "dark mode" not in known.screens[0].prompt
+    assert len(plan_screens("multi-screen\nScreens: A1, B2, C3, D4, E5, F6", max_screens=3).screens) == 3
+
+
+def test_single_screen_prompts_mentioning_tabs_or_search_are_not_split():
+    for prompt in (
+        "todo list with a search bar and tabs",
+        "Notes app with bottom navigation\nSearch field above the list, settings in the menu",
+        "Search screen with tabs for recent and popular results",
+        "Ứng dụng ghi chú có tabs: danh sách, cài đặt",
+    ):
+        assert plan_screens(prompt).screens == (), prompt
+
+
+def test_screens_generate_concurrently_under_the_cap(monkeypatch):
+    active, peak = 0, 0
+
+    async def slow_fake(prompt: str) -> str:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.2)
+        active -= 1
+        return 'Text("screen")'
+
+    monkeypatch.setattr(llm, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(llm, "_call_fake", slow_fake)
+    monkeypatch.setattr(generator, "SCREEN_CONCURRENCY", 2)
+    prompt = "Mail app with tabs\nScreens: Inbox, Sent, Drafts, Spam"
+
+    started = time.perf_counter()
+    ctx = asyncio.run(build_project_context(_config(prompt)))
+    elapsed = time.perf_counter() - started
+
+    assert peak == 2
+    # Two rounds of two screens, not four calls in a row
+    assert 0.4 <= elapsed < 0.75
+    files = render_project_files(ctx)
+    main = files["app/src/main/java/com/example/shop/MainActivity.kt"].decode()
+    assert "TabRow(selectedTabIndex = selectedScreen)" in main and "3 -> SpamScreen()" in main
+    assert "import androidx.compose.material.icons.filled.Star" in main
+    spam = files["app/src/main/java/com/example/shop/SpamScreen.kt"].decode()
+    assert "package com.example.shop" in spam and "fun SpamScreen() {\n    Text(\"screen\")\n}" in spam
+
+
+def test_editing_one_screen_reuses_the_others_from_cache(monkeypatch):
+    calls = []
+
+    async def counting_fake(prompt: str) -> str:
+        calls.append(prompt)
+        return 'Text("screen")'
+
+    set_llm_cache(TieredCache(MemoryLRUCache()))
+    monkeypatch.setattr(llm, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(llm, "_call_fake", counting_fake)
+    try:
+        first = asyncio.run(build_project_context(_config(SHOP_PROMPT)))
+        assert len(calls) == 3
+        edited = SHOP_PROMPT.replace("order history", "order history and saved addresses")
+        second = asyncio.run(build_project_context(_config(edited)))
+    finally:
+        set_llm_cache(None)
+
+    assert len(calls) == 4 and "saved addresses" in calls[-1]
+    assert [s["function"] for s in second["screens"]] == [s["function"] for s in first["screens"]]
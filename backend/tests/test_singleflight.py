@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from backend.app.services.singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight("test_share")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(5)), flight.do("other", work))
+
+    results = asyncio.run(run())
+    assert results == ["result"] * 6
+    assert len(calls) == 2
+    assert flight.stats() == {"calls": 6, "executed": 2, "deduplicated": 4, "in_flight": 0}
+
+
+def test_errors_propagate_to_every_waiter():
+    flight = SingleFlight("test_errors")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.stats()["executed"] == 1
+
+
+def test_cancelling_one_waiter_keeps_shared_call_running():
+    flight = SingleFlight("test_cancel")
+    started = []
+
+    async def work():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
+    assert len(started) == 1
+
+
+def test_shared_call_is_cancelled_when_all_waiters_leave():
+    flight = SingleFlight("test_cancel_all")
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        waiter = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert cancelled == [1]
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,54 @@
+import os
+from pathlib import Path
+
+from backend.app.services.templates import TEMPLATES_DIR, compile_template_bundle, create_jinja_env
+
+CTX = {
+    "app_name": "DemoApp",
+    "package_name": "com.example.demo",
+    "package_dir": "com/example/demo",
+    "description": "",
+    "min_sdk": 24,
+    "target_sdk": 34,
+    "compose_content": "",
+    "compose_inline": "GeneratedPlaceholder()",
+    # Read by the per-screen template only
+    "screen": {"function": "HomeScreen", "title": "Home", "inline": "GeneratedPlaceholder()", "imports": ()},
+}
+
+
+def test_template_cache_reuses_compiled_template_until_content_changes(tmp_path: Path):
+    (tmp_path / "hello.j2").write_text("Hello {{ app_name }}", encoding="utf-8")
+    env = create_jinja_env(tmp_path)
+    first = env.get_template("hello.j2")
+    assert env.get_template("hello.j2") is first
+
+    # Touching the file without changing it keeps the compiled template
+    stat = os.stat(tmp_path / "hello.j2")
+    os.utime(tmp_path / "hello.j2", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert env.get_template("hello.j2") is first
+
+    (tmp_path / "hello.j2").write_text("Bye {{ app_name }}", encoding="utf-8")
+    assert env.get_template("hello.j2").render(app_name="X") == "Bye X"
+
+
+def test_compiled_bundle_renders_like_source_templates(tmp_path: Path):
+    bundle = tmp_path / "templates.zip"
+    count = compile_template_bundle(bundle)
+    assert count == len(list(TEMPLATES_DIR.rglob("*.j2")))
+
+    source_env = create_jinja_env()
+    bundle_env = create_jinja_env(bundle=str(bundle))
+    for name in source_env.list_templates():
+        assert bundle_env.get_template(name).render(**CTX) == source_env.get_template(name).render(**CTX)
+
+
+def test_template_variables_from_source_and_bundle(tmp_path: Path):
+    from backend.app.services.templates import template_variables
+
+    bundle = tmp_path / "templates.zip"
+    compile_template_bundle(bundle)
+    for env in (create_jinja_env(), create_jinja_env(bundle=str(bundle))):
+        assert template_variables(env, "root/.gitignore.j2") == frozenset()
+        assert template_variables(env, "app/src/main/res/values/strings.xml.j2") == {"app_name"}
+        assert "compose_inline" in template_variables(env, "app/src/main/java/MainActivity.kt.j2")
@@ -1,11 +1,27 @@
 import asyncio
 import os
-import gradio as gr
+import sys
 
-from backend.app.services.generator import AndroidProjectConfig, generate_android_project_zip
+# Gradio, the generator stack and the HTTP clients are imported on first use:
+# scripts calling generate_zip() never load Gradio, and the UI is only built
+# when the app is launched (or `demo` is first accessed).
+GENERATOR_API_URL = os.getenv("GENERATOR_API_URL", "")
 
 # ---------- Core generate helpers ----------
-async def _generate_zip_async(app_name, package_name, min_sdk, target_sdk, description, prompt):
+async def _generate_zip_async(app_name, package_name, min_sdk, target_sdk, description, prompt, compression="default", close_clients=True):
+    try:
+        return await _write_zip(app_name, package_name, min_sdk, target_sdk, description, prompt, compression)
+    finally:
+        # Only loaded when a provider or the jobs client was used
+        clients = sys.modules.get("backend.app.services.http_clients")
+        if close_clients and clients is not None:
+            await clients.aclose_clients()
+
+
+async def _write_zip(app_name, package_name, min_sdk, target_sdk, description, prompt, compression):
+    from backend.app.services.archive import get_compression
+    from backend.app.services.generator import AndroidProjectConfig, generate_android_project_zip
+
     cfg = AndroidProjectConfig(
         app_name=(app_name or "GeneratedApp").strip(),
         package_name=(package_name or "com.example.generatedapp").strip(),
@@ -14,14 +30,26 @@ async def _generate_zip_async(app_name, package_name, min_sdk, target_sdk, descr
         target_sdk=int(target_sdk or 34),
         prompt=(prompt or "").strip(),
     )
-    data = await generate_android_project_zip(cfg)
-    out_path = f"/tmp/{cfg.app_name}.zip"
+    mode = get_compression(compression)
+    if GENERATOR_API_URL:
+        if mode != get_compression("default"):
+            # Like the CLI's --server: do not hand back a different archive than the one asked for
+            raise ValueError("jobs on the server always return the default zip")
+        # Submit to the shared backend job queue instead of generating in the Space
+        from backend.app.services.jobs_client import generate_via_jobs
+
+        data = await generate_via_jobs(GENERATOR_API_URL, cfg)
+    else:
+        data = await generate_android_project_zip(cfg, compression=mode)
+    out_path = f"/tmp/{cfg.app_name}{mode.extension}"
     with open(out_path, "wb") as f:
         f.write(data)
     return out_path
 
-def generate_zip(app_name, package_name, min_sdk, target_sdk, description, prompt):
-    return asyncio.run(_generate_zip_async(app_name, package_name, min_sdk, target_sdk, description, prompt))
+def generate_zip(app_name, package_name, min_sdk, target_sdk, description, prompt, compression="default"):
+    # For scripts: each call runs on a new loop and closes its clients. The UI
+    # handler below runs on Gradio's loop and keeps them, so the pool is reused.
+    return asyncio.run(_generate_zip_async(app_name, package_name, min_sdk, target_sdk, description, prompt, compression))
 
 # ---------- Prompt builder ----------
 def build_prompt(base_desc, presets, arch, data, ui, theme):
@@ -42,59 +70,90 @@ def build_prompt(base_desc, presets, arch, data, ui, theme):
     return "\n".join(lines)
 
 # Compose the UI
-with gr.Blocks(title="AI Android Generator (Space)") as demo:
-    gr.Markdown("""
-    # AI Android Generator
-    Tạo file .zip dự án Android (Gradle + Jetpack Compose) từ yêu cầu của bạn. Chỉ là giao diện tạo zip; build APK/AAB nên thực hiện bằng GitHub Actions trong repo.
-    """)
-
-    with gr.Row():
-        with gr.Column():
-            gr.Markdown("### Cấu hình dự án")
-            app_name = gr.Textbox(label="Tên ứng dụng", value="GeneratedApp")
-            package_name = gr.Textbox(label="Package name", value="com.example.generatedapp")
-            with gr.Row():
-                min_sdk = gr.Number(label="Min SDK", value=24, precision=0)
-                target_sdk = gr.Number(label="Target SDK", value=34, precision=0)
-            description = gr.Textbox(label="Mô tả", value="")
-
-            gr.Markdown("### Prompt")
-            base_desc = gr.Textbox(label="Mô tả yêu cầu (tự do)", lines=6, placeholder="Ví dụ: ToDo app với Compose, danh sách + thêm/sửa/xóa")
-
-            generate_btn = gr.Button("Sinh dự án (.zip)", variant="primary")
-            zip_out = gr.File(label="Tải xuống zip")
+def build_demo():
+    import gradio as gr
+
+    from backend.app.services.archive import available_compression_modes
+
+    with gr.Blocks(title="AI Android Generator (Space)") as demo:
+        gr.Markdown("""
+        # AI Android Generator
+        Tạo file .zip dự án Android (Gradle + Jetpack Compose) từ yêu cầu của bạn. Chỉ là giao diện tạo zip; build APK/AAB nên thực hiện bằng GitHub Actions trong repo.
+        """)
+
+        with gr.Row():
+            with gr.Column():
+                gr.Markdown("### Cấu hình dự án")
+                app_name = gr.Textbox(label="Tên ứng dụng", value="GeneratedApp")
+                package_name = gr.Textbox(label="Package name", value="com.example.generatedapp")
+                with gr.Row():
+                    min_sdk = gr.Number(label="Min SDK", value=24, precision=0)
+                    target_sdk = gr.Number(label="Target SDK", value=34, precision=0)
+                description = gr.Textbox(label="Mô tả", value="")
+                # Jobs on the shared backend always return the default zip
+                compression = gr.Dropdown(
+                    ["default"] if GENERATOR_API_URL else available_compression_modes(),
+                    label="Chế độ nén",
+                    value="default",
+                    interactive=not GENERATOR_API_URL,
+                )
+
+                gr.Markdown("### Prompt")
+                base_desc = gr.Textbox(label="Mô tả yêu cầu (tự do)", lines=6, placeholder="Ví dụ: ToDo app với Compose, danh sách + thêm/sửa/xóa")
+
+                generate_btn = gr.Button("Sinh dự án (.zip)", variant="primary")
+                zip_out = gr.File(label="Tải xuống zip")
         
-        with gr.Column():
-            gr.Markdown("### Preset & Tùy chọn (hệ thống sẽ tự tổng hợp vào prompt)")
-            presets = gr.CheckboxGroup(["ToDo", "News", "Chat", "Shop"], label="Loại app", value=["ToDo"]) 
-            arch = gr.CheckboxGroup(["MVVM", "Hilt DI", "Navigation Compose"], label="Kiến trúc", value=["MVVM", "Hilt DI", "Navigation Compose"]) 
-            data = gr.CheckboxGroup(["Room", "Datastore", "Retrofit API + caching"], label="Data layer")
-            ui = gr.CheckboxGroup(["danh sách", "mạng lưới", "thanh tìm kiếm", "form CRUD", "bottom navigation", "tabs", "settings"], label="Thành phần UI")
-            theme = gr.CheckboxGroup(["Material3", "Dark mode"], label="Theme", value=["Material3", "Dark mode"]) 
-
-            gr.Markdown("### Live Prompt Preview")
-            prompt_preview = gr.Code(label="Prompt", language="markdown", interactive=False)
-            build_btn = gr.Button("Gợi ý prompt từ tùy chọn")
-
-    # Events
-    def _update_preview(base_desc, presets, arch, data, ui, theme):
-        return build_prompt(base_desc, presets, arch, data, ui, theme)
-
-    for src in (base_desc, presets, arch, data, ui, theme):
-        src.change(_update_preview, inputs=[base_desc, presets, arch, data, ui, theme], outputs=prompt_preview)
-    build_btn.click(_update_preview, inputs=[base_desc, presets, arch, data, ui, theme], outputs=prompt_preview)
-
-    def _on_generate(app_name, package_name, min_sdk, target_sdk, description, base_desc, presets, arch, data, ui, theme, preview_text):
-        prompt_text = (base_desc or "").strip()
-        if not prompt_text:
-            prompt_text = build_prompt(base_desc, presets, arch, data, ui, theme)
-        if not prompt_text:
-            prompt_text = "Màn hình danh sách đơn giản với Material3"
-        return generate_zip(app_name, package_name, min_sdk, target_sdk, description, prompt_text)
-
-    generate_btn.click(_on_generate,
-        inputs=[app_name, package_name, min_sdk, target_sdk, description, base_desc, presets, arch, data, ui, theme, prompt_preview],
-        outputs=zip_out)
+            with gr.Column():
+                gr.Markdown("### Preset & Tùy chọn (hệ thống sẽ tự tổng hợp vào prompt)")
+                presets = gr.CheckboxGroup(["ToDo", "News", "Chat", "Shop"], label="Loại app", value=["ToDo"]) 
+                arch = gr.CheckboxGroup(["MVVM", "Hilt DI", "Navigation Compose"], label="Kiến trúc", value=["MVVM", "Hilt DI", "Navigation Compose"]) 
+                data = gr.CheckboxGroup(["Room", "Datastore", "Retrofit API + caching"], label="Data layer")
+                ui = gr.CheckboxGroup(["danh sách", "mạng lưới", "thanh tìm kiếm", "form CRUD", "bottom navigation", "tabs", "settings"], label="Thành phần UI")
+                theme = gr.CheckboxGroup(["Material3", "Dark mode"], label="Theme", value=["Material3", "Dark mode"]) 
+
+                gr.Markdown("### Live Prompt Preview")
+                prompt_preview = gr.Code(label="Prompt", language="markdown", interactive=False)
+                build_btn = gr.Button("Gợi ý prompt từ tùy chọn")
+
+        # Events
+        def _update_preview(base_desc, presets, arch, data, ui, theme):
+            return build_prompt(base_desc, presets, arch, data, ui, theme)
+
+        for src in (base_desc, presets, arch, data, ui, theme):
+            src.change(_update_preview, inputs=[base_desc, presets, arch, data, ui, theme], outputs=prompt_preview)
+        build_btn.click(_update_preview, inputs=[base_desc, presets, arch, data, ui, theme], outputs=prompt_preview)
+
+        async def _on_generate(app_name, package_name, min_sdk, target_sdk, description, compression, base_desc, presets, arch, data, ui, theme, preview_text):
+            prompt_text = (base_desc or "").strip()
+            if not prompt_text:
+                prompt_text = build_prompt(base_desc, presets, arch, data, ui, theme)
+            if not prompt_text:
+                prompt_text = "Màn hình danh sách đơn giản với Material3"
+            try:
+                return await _generate_zip_async(
+                    app_name, package_name, min_sdk, target_sdk, description, prompt_text, compression, close_clients=False
+                )
+            except ValueError as e:
+                raise gr.Error(str(e)) from None
+
+        generate_btn.click(_on_generate,
+            inputs=[app_name, package_name, min_sdk, target_sdk, description, compression, base_desc, presets, arch, data, ui, theme, prompt_preview],
+            outputs=zip_out)
+    return demo
+
+
+_demo = None
+
+
+def __getattr__(name):
+    # `demo` is built on first access (hosting runtimes look it up by name)
+    global _demo
+    if name == "demo":
+        if _demo is None:
+            _demo = build_demo()
+        return _demo
+    raise AttributeError(name)
 
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    build_demo().launch()
\ No newline at end of file